@@ -1,27 +1,179 @@
-from flask import Flask, request, jsonify, send_from_directory
+import time
+_boot_started = time.perf_counter()
+
+from flask import Flask, request, jsonify, send_from_directory, Response, session
 from flask_cors import CORS
-import pandas as pd
+import numpy as np
+import functools
+import io
 import os
-from database_manager import DatabaseManager
+import threading
+from collections import deque
+from datetime import datetime
+from itertools import islice
+from database_manager import DatabaseManager, SHEETS
+import bulk_io
+import metrics
+import structured_log
+from profiler import profiler, install_flask as install_profiler
+from live_feed import broker
+from http_cache import ResponseCache
+from static_assets import StaticAssets
+from frame_json import frame_response
+_imports_s = time.perf_counter() - _boot_started
 
 app = Flask(__name__, static_url_path='')
+# Signs the admin session cookie. Set FLUX_SECRET_KEY when running more than one worker,
+# otherwise a session from one worker is rejected by the others.
+app.secret_key = os.environ.get('FLUX_SECRET_KEY') or os.urandom(32)
 CORS(app) # Enable Cross-Origin requests for local development
+metrics.install_flask(app) # Per-route latency histograms, see /api/admin/metrics
+install_profiler(app) # Opt-in sampled profiles, see /api/admin/profiler
+log = structured_log.get_logger('flux.api')
 
-# Initialize DB
-db = DatabaseManager()
+def safe_float(val):
+    try:
+        return float(val) if str(val).strip() != '' else 0.0
+    except:
+        return 0.0
+
+# --- ADMIN LIVE FEED ---
+# Storage writes are pushed to connected admins over /api/admin/stream as
+# "transaction" events plus "stats" deltas to apply on top of /api/admin/stats.
+_blocked_accounts = None
+
+# transaction_volume and flagged_transactions in /api/admin/stats cover only the latest
+# transactions, so a new row also pushes an old one out. While someone is listening the
+# stream keeps that window itself, loaded when the first client connects, and updates
+# the two figures from each appended row and the row it pushes out, rather than
+# re-querying the window on every write.
+WINDOW = 1000          # rows in transaction_volume
+FLAGGED_WINDOW = 200   # rows in flagged_transactions
+_window_lock = threading.Lock()
+_window = None  # deque of (credit amount, AccountID, risk score), newest first
+
+def _blocked():
+    global _blocked_accounts
+    if _blocked_accounts is None:
+        _blocked_accounts = {str(u.get('AccountID')) for u in db.get_all_users() if u.get('Status') == 'Blocked'}
+    return _blocked_accounts
+
+def _is_blocked(account_id):
+    return str(account_id) in _blocked()
+
+def _window_row(t):
+    credit = safe_float(t.get('TransactionAmount', 0)) if t.get('TransactionType') == 'Credit' else 0.0
+    return credit, str(t.get('AccountID')), safe_float(t.get('CyberRiskScore', 0))
+
+def _flagged(entry, blocked):
+    return entry[2] > 75 and entry[1] not in blocked
+
+def window_stats(blocked):
+    rows = [_window_row(t) for t in db.get_all_transactions(limit=WINDOW)]
+    return {"transaction_volume": sum(r[0] for r in rows),
+            "flagged_transactions": sum(_flagged(r, blocked) for r in rows[:FLAGGED_WINDOW])}
+
+def _window_start():
+    global _window
+    with _window_lock:
+        if _window is None:
+            _blocked()
+            _window = deque(_window_row(t) for t in db.get_all_transactions(limit=WINDOW))
+
+def _window_tracked():
+    # With _window_lock held: whether the window is being kept, dropping it once the
+    # last client has gone
+    global _window
+    if not broker.subscriber_count:
+        _window = None
+    return _window is not None
+
+def _window_append(t):
+    # Change in the windowed stats from one appended activity row
+    with _window_lock:
+        if not _window_tracked():
+            return {}
+        blocked = _blocked()
+        entry = _window_row(t)
+        _window.appendleft(entry)
+        volume, flagged = entry[0], int(_flagged(entry, blocked))
+        if len(_window) > FLAGGED_WINDOW:
+            flagged -= _flagged(_window[FLAGGED_WINDOW], blocked)
+        if len(_window) > WINDOW:
+            volume -= _window.pop()[0]
+    delta = {}
+    if volume:
+        delta["transaction_volume"] = volume
+    if flagged:
+        delta["flagged_transactions"] = flagged
+    return delta
+
+def _window_block(account_id, blocked):
+    # flagged_transactions leaves out blocked users' rows
+    with _window_lock:
+        if not _window_tracked():
+            return {}
+        rows = sum(1 for r in islice(_window, FLAGGED_WINDOW) if r[1] == account_id and r[2] > 75)
+    return {"flagged_transactions": -rows if blocked else rows} if rows else {}
+
+def publish_live_event(event, data):
+    delta = {}
+    if event == 'activity':
+        row = dict(data)
+        if _is_blocked(row.get('AccountID')):
+            row['CyberRiskScore'] = 0
+            row['Description'] = "[BLOCKED] " + str(row.get('Description', ''))
+        delta = _window_append(data)
+        broker.publish('transaction', row)
+    elif event == 'user_created':
+        delta = {"total_users": 1, "active_users": 1}
+    elif event == 'balance':
+        delta = {"total_balance": data['delta']}
+    elif event == 'kyc' and data.get('pending_delta'):
+        delta = {"pending_kyc": data['pending_delta']}
+    elif event == 'user_status':
+        account_id, blocked = str(data['AccountID']), data['status'] == 'Blocked'
+        if _blocked_accounts is not None and (account_id in _blocked_accounts) != blocked:
+            if blocked:
+                _blocked_accounts.add(account_id)
+            else:
+                _blocked_accounts.discard(account_id)
+            delta = _window_block(account_id, blocked)
+        broker.publish('user_status', data)
+    if delta:
+        broker.publish('stats', delta)
+
+def use_database(new_db):
+    # Swap the storage backend (the load and replay tools point this at fake_sheets)
+    global db, _blocked_accounts, _window
+    db = new_db
+    _blocked_accounts = None
+    _window = None
+    db.listeners.append(publish_live_event)
+
+# Initialize DB. Connecting to Sheets runs in the background (FLUX_DB_CONNECT), so the
+# worker starts accepting requests right away; see /api/admin/startup for the timings.
+use_database(DatabaseManager())
+_app_ready_s = time.perf_counter() - _boot_started
+
+# ETag / 304 handling and rendered-body cache for polled GET routes
+response_cache = ResponseCache(lambda: db)
 
 # ML Model Loading has been removed. Risk scoring will be mock.
 risk_model = None
 schema_features = None
 
 # --- SERVE STATIC FILES (Frontend) ---
+# Portal pages are held in memory with gzip/br variants; anything else falls through
+static_assets = StaticAssets(app.root_path, reload=os.environ.get('FLUX_STATIC_RELOAD') == '1')
+
 @app.route('/')
 def index():
-    return send_from_directory('', 'index.html')
+    return static_assets.serve('index.html') or send_from_directory('', 'index.html')
 
 @app.route('/user/<path:path>')
 def serve_user(path):
-    return send_from_directory('user', path)
+    return static_assets.serve(f'user/{path}') or send_from_directory('user', path)
 
 
 # --- API: AUTHENTICATION ---
@@ -45,18 +197,16 @@ def login():
     username = data.get('username')
     password = data.get('password')
     
-    print(f"DEBUG: Login Attempt for '{username}'")
+    log.debug("login_attempt", username=username)
     
     user = db.get_user(username)
     
     if user:
-        # Debug Compare
         stored_pass = str(user['Password'])
         input_pass = str(password)
-        print(f"DEBUG: Comparing Password '{input_pass}' vs Stored '{stored_pass}'")
         
         if stored_pass == input_pass:
-            print("DEBUG: Password Match Success")
+            log.debug("login_success", account_id=user['AccountID'])
             return jsonify({
                 "status": "success",
                 "account_id": user['AccountID'],
@@ -64,7 +214,7 @@ def login():
                 "role": "user" # Simple role
             })
         else:
-            print("DEBUG: Password Mismatch")
+            log.debug("login_password_mismatch", account_id=user['AccountID'])
             # Log failed login attempt
             db.log_activity(user['AccountID'], {
                 "FailedLoginCount": 1, 
@@ -75,7 +225,7 @@ def login():
         return jsonify({"status": "error", "message": "Invalid credentials"}), 401
     
     # Username not found
-    print(f"DEBUG: Username '{username}' Not Found")
+    log.debug("login_unknown_user", username=username)
     db.log_activity("UNKNOWN", {
         "FailedLoginCount": 1, 
         "Description": f"Failed login attempt (Unknown user: {username})",
@@ -103,6 +253,7 @@ def change_password():
         return jsonify({"status": "success", "message": msg})
     return jsonify({"status": "error", "message": msg}), 400
 @app.route('/api/user/dashboard/<account_id>', methods=['GET'])
+@response_cache.conditional('Users', 'ActivityLogs')
 def get_dashboard_data(account_id):
     user = db.get_user_by_id(account_id)
     if not user:
@@ -119,6 +270,13 @@ def get_dashboard_data(account_id):
     })
 
 # --- API: TRANSACTIONS (WITH ML RISK SCORING) ---
+BATCH_TRANSFER_LIMIT = int(os.environ.get('FLUX_BATCH_TRANSFER_LIMIT', 500))
+
+def mock_risk_scores(amounts):
+    # Mock amount rules over a whole array: >50k high (75), >10k medium (40), else low (10)
+    amounts = np.asarray(amounts, dtype=float)
+    return np.select([amounts > 50000, amounts > 10000], [75, 40], 10)
+
 @app.route('/api/transaction/transfer', methods=['POST'])
 def transfer():
     data = request.json
@@ -141,17 +299,14 @@ def transfer():
     db.update_balance(recipient_id_or_msg, amount)
 
     # 2. Calculate Risk (Using Mock Logic)
-    risk_score = 10 # Default Low
-    
-    # Simple Mock Risk based solely on amount
-    if amount > 50000:
-        risk_score = 75
-        print(f"--- MOCK RISK PREDICTION ---")
-        print(f"High Amount Detected: {amount}, Risk Flagged")
-    elif amount > 10000:
-        risk_score = 40
-        print(f"--- MOCK RISK PREDICTION ---")
-        print(f"Medium Amount Detected: {amount}")
+    with metrics.timer('flux_model_inference_seconds', model='mock_amount_rules'):
+        # Simple Mock Risk based solely on amount. A model with behavioral inputs would
+        # read them from db.get_risk_features(sender_id) (running profile, no history scan)
+        risk_score = int(mock_risk_scores([amount])[0])
+        if risk_score == 75:
+            log.debug("mock_risk_high_amount", amount=amount, risk_score=risk_score)
+        elif risk_score == 40:
+            log.debug("mock_risk_medium_amount", amount=amount, risk_score=risk_score)
     
     # 3. Log Activity for Sender (Debit)
     log_data_sender = {
@@ -187,6 +342,70 @@ def transfer():
         "risk_score": risk_score
     })
 
+@app.route('/api/transaction/batch-transfer', methods=['POST'])
+def batch_transfer():
+    # {"sender_id", "mode": "all_or_nothing" | "best_effort",
+    #  "transfers": [{"recipient_account", "recipient_ifsc", "amount"}, ...]}
+    data = request.json or {}
+    sender_id = data.get('sender_id')
+    legs = data.get('transfers')
+    mode = data.get('mode', 'all_or_nothing')
+    if mode not in ('all_or_nothing', 'best_effort'):
+        return jsonify({"status": "error", "message": "mode must be all_or_nothing or best_effort"}), 400
+    if not isinstance(legs, list) or not legs or not all(isinstance(leg, dict) for leg in legs):
+        return jsonify({"status": "error", "message": "transfers must be a non-empty list"}), 400
+    if len(legs) > BATCH_TRANSFER_LIMIT:
+        return jsonify({"status": "error", "message": f"At most {BATCH_TRANSFER_LIMIT} transfers per batch"}), 400
+
+    # 1. Validate every recipient and apply all debits/credits in one Users write
+    results, new_balance = db.apply_transfers(sender_id, legs, atomic=mode == 'all_or_nothing')
+    if results is None:
+        return jsonify({"status": "error", "message": new_balance}), 400
+    accepted = [i for i, r in enumerate(results) if r['status'] == 'success']
+
+    # 2. Score every applied leg in one call
+    with metrics.timer('flux_model_inference_seconds', model='mock_amount_rules'):
+        scores = mock_risk_scores([results[i]['amount'] for i in accepted])
+    log.debug("mock_risk_batch", legs=len(accepted), batch_max_score=int(scores.max()) if accepted else 0)
+
+    # 3. Debit and credit logs for all legs in one ActivityLogs append
+    sender_user = db.get_user_by_id(sender_id)
+    sender_name = sender_user.get('FullName', 'Unknown Sender') if sender_user else 'Unknown Sender'
+    entries = []
+    for i, score in zip(accepted, scores):
+        leg, result = legs[i], results[i]
+        result['risk_score'] = int(score)
+        entries.append((sender_id, {
+            "TransactionAmount": result['amount'],
+            "TransactionType": "Debit",
+            "Description": f"Transfer to ACC: {leg.get('recipient_account')} (IFSC: {leg.get('recipient_ifsc')})",
+            "SessionID": data.get('session_id', 'SES-UNKNOWN'),
+            "ClickRate": data.get('click_rate', 0),
+            "PagesVisited": data.get('pages_visited', 1),
+            "SessionDuration": data.get('session_duration', 0),
+            "DeviceTrustScore": data.get('device_trust_score', 100),
+            "Channel": data.get('channel', 'Web'),
+            "NewDeviceLogin": data.get('new_device_login', 0),
+            "RapidTransactions": data.get('rapid_transactions', 0)
+        }, int(score)))
+        entries.append((result['recipient_id'], {
+            "TransactionAmount": result['amount'],
+            "TransactionType": "Credit",
+            "Description": f"Transfer from {sender_name}",
+            "SessionID": data.get('session_id', 'SES-UNKNOWN')
+        }, 10))
+    db.log_activities(entries)
+
+    legs_out = [dict({k: v for k, v in r.items() if k != 'recipient_id'}, index=i) for i, r in enumerate(results)]
+    status = "success" if len(accepted) == len(results) else "partial" if accepted else "error"
+    return jsonify({
+        "status": status,
+        "mode": mode,
+        "new_balance": new_balance,
+        "transferred": sum(results[i]['amount'] for i in accepted),
+        "results": legs_out
+    }), 200 if accepted else 400
+
 # --- API: DEPOSIT (ADD MONEY) ---
 @app.route('/api/transaction/deposit', methods=['POST'])
 def deposit():
@@ -225,14 +444,14 @@ def deposit():
             "message": f"Successfully added ${amount} via {source}"
         })
     except Exception as e:
-        print(f"ERROR: Deposit Failed: {e}")
+        log.error("deposit_failed", exc_info=e, error=str(e))
         return jsonify({"status": "error", "message": f"Server Error: {str(e)}"}), 500
 
 # --- API: TRANSACTIONS HISTORY ---
 @app.route('/api/user/transactions/<account_id>', methods=['GET'])
+@response_cache.conditional('ActivityLogs')
 def get_transactions_history(account_id):
-    transactions = db.get_user_transactions(account_id)
-    return jsonify({"transactions": transactions})
+    return frame_response("transactions", db.get_user_transactions(account_id, as_frame=True), 'ActivityLogs')
 
 # --- API: BENEFICIARIES ---
 @app.route('/api/user/beneficiaries', methods=['POST'])
@@ -258,10 +477,11 @@ def add_beneficiary():
             return jsonify({"status": "success", "message": msg})
         return jsonify({"status": "error", "message": msg}), 400
     except Exception as e:
-        print(f"ERROR in Add Beneficiary: {e}")
+        log.error("add_beneficiary_failed", exc_info=e, error=str(e))
         return jsonify({"status": "error", "message": f"Server Error: {str(e)}"}), 500
 
 @app.route('/api/user/beneficiaries/<account_id>', methods=['GET'])
+@response_cache.conditional('Beneficiaries')
 def get_beneficiaries(account_id):
     return jsonify({"beneficiaries": db.get_beneficiaries(account_id)})
 
@@ -305,65 +525,69 @@ def admin_login():
     username = data.get('username')
     password = data.get('password')
     if username == 'admin' and password == 'admin123':
+        session['admin_id'] = "ADM-001"
         return jsonify({"status": "success", "admin_id": "ADM-001", "name": "Super Admin"})
     return jsonify({"status": "error", "message": "Invalid admin credentials"}), 401
 
+def admin_required(view):
+    # Routes that read or change data in bulk, or expose the worker's internals
+    # (metrics, profiler), need the session set by /api/admin/login
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not session.get('admin_id'):
+            return jsonify({"status": "error", "message": "Admin login required"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
 @app.route('/api/admin/stats', methods=['GET'])
 def get_admin_stats():
-    def safe_float(val):
-        try:
-            return float(val) if str(val).strip() != '' else 0.0
-        except:
-            return 0.0
-
     users = db.get_all_users()
-    transactions = db.get_all_transactions(limit=1000)
 
     total_balance = sum(safe_float(u.get('AccountBalance', 0)) for u in users)
     total_users = len(users)
-    pending_kyc = len(db.get_pending_kyc_requests())
+    pending_kyc = db.count_kyc_requests('Pending')
 
-    tx_volume = sum(safe_float(t.get('TransactionAmount', 0)) for t in transactions if t.get('TransactionType') == 'Credit')
-
-    recent_tx = db.get_all_transactions(limit=200)
+    # Credit volume over the last 1000 transactions, flagged rows over the last 200
     blocked_users = {str(u.get('AccountID')) for u in users if u.get('Status') == 'Blocked'}
-
-    flagged = 0
-    for t in recent_tx:
-        try:
-            if float(t.get('CyberRiskScore', 0)) > 75:
-                if str(t.get('AccountID')) not in blocked_users:
-                    flagged += 1
-        except:
-            pass
+    window = window_stats(blocked_users)
 
     return jsonify({
         "total_balance": total_balance,
         "total_users": total_users,
         "active_users": total_users,
         "pending_kyc": pending_kyc,
-        "transaction_volume": tx_volume,
-        "flagged_transactions": flagged
+        "transaction_volume": window["transaction_volume"],
+        "flagged_transactions": window["flagged_transactions"]
     })
 
+@app.route('/api/admin/stream', methods=['GET'])
+@admin_required
+def admin_live_stream():
+    # Server-Sent Events; EventSource resends Last-Event-ID on reconnect.
+    # Each open stream holds one thread, hence the gthread workers in the Procfile.
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    _window_start()
+    return Response(broker.stream(last_event_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/admin/transactions', methods=['GET'])
 def get_admin_transactions():
-    transactions = db.get_all_transactions(limit=100)
-    users = db.get_all_users()
-    blocked_users = {str(u.get('AccountID')) for u in users if u.get('Status') == 'Blocked'}
-
-    for t in transactions:
-        if str(t.get('AccountID')) in blocked_users:
-            t['CyberRiskScore'] = 0
-            if not str(t.get('Description', '')).startswith('[BLOCKED]'):
-                t['Description'] = "[BLOCKED] " + str(t.get('Description', ''))
-
-    return jsonify({"transactions": transactions})
+    transactions = db.get_all_transactions(limit=100, as_frame=True)
+    users = db.get_all_users(as_frame=True)
+    if not transactions.empty and 'Status' in users.columns:
+        blocked_users = users.loc[users['Status'] == 'Blocked', 'AccountID'].astype(str)
+        blocked = transactions['AccountID'].astype(str).isin(set(blocked_users))
+        if blocked.any():
+            desc = transactions.loc[blocked, 'Description'].astype(str)
+            transactions.loc[blocked, 'CyberRiskScore'] = 0
+            transactions.loc[blocked, 'Description'] = desc.where(desc.str.startswith('[BLOCKED]'), "[BLOCKED] " + desc)
+
+    return frame_response("transactions", transactions, 'ActivityLogs')
 
 @app.route('/api/admin/users', methods=['GET'])
+@response_cache.conditional('Users')
 def get_admin_users():
-    users = db.get_all_users()
-    return jsonify({"users": users})
+    return frame_response("users", db.get_all_users(as_frame=True), 'Users')
 
 @app.route('/api/admin/user/<account_id>', methods=['GET'])
 def get_admin_user_analytics(account_id):
@@ -371,24 +595,17 @@ def get_admin_user_analytics(account_id):
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    all_activity = db.get_user_transactions(account_id)
-    transfers = [log for log in all_activity if log.get('TransactionType') == 'Transfer']
-    total_spend = sum([float(log.get('TransactionAmount', 0)) for log in transfers])
-    avg_txn = total_spend / len(transfers) if len(transfers) > 0 else 0.0
-
-    try:
-        b_df = db._load_sheet('Beneficiaries')
-        ben_count = len(b_df[b_df['AccountID'] == account_id]) if not b_df.empty and 'AccountID' in b_df.columns else 0
-    except:
-        ben_count = 0
+    profile = db.get_user_profile(account_id)
 
     return jsonify({
         "status": "success",
-        "total_spend": round(total_spend, 2),
-        "avg_transaction": round(avg_txn, 2),
-        "beneficiaries": ben_count,
+        "total_spend": round(profile['transfer_total'], 2),
+        "avg_transaction": round(profile['transfer_mean'], 2),
+        "beneficiaries": profile['beneficiaries'],
+        "max_risk": profile['max_risk'],
+        "high_risk_events": profile['high_risk_count'],
         "kyc_status": user.get('KYCStatus', 'Pending'),
-        "recent_activity": all_activity[:5]
+        "recent_activity": profile['recent']
     })
 
 @app.route('/api/admin/action', methods=['POST'])
@@ -404,17 +621,81 @@ def log_admin_action():
         }, risk_score=100 if action == 'Blocked' else 0)
         if action == 'Blocked':
             db.update_user_status(account_id, 'Blocked')
+        db.log_audit(action, account_id, f"Admin (ADM-001) {action} user {account_id}")
 
     return jsonify({"status": "success"})
 
+@app.route('/api/admin/metrics', methods=['GET'])
+@admin_required
+def get_admin_metrics():
+    # Prometheus text exposition format
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/admin/startup', methods=['GET'])
+def get_admin_startup():
+    # Where this worker's cold start went: imports, app setup, then the storage
+    # connection steps and first load of each sheet (seconds)
+    return jsonify({
+        "imports_s": round(_imports_s, 4),
+        "app_ready_s": round(_app_ready_s, 4),
+        "database": db.startup_report()
+    })
+
+@app.route('/api/admin/profiler', methods=['GET', 'POST'])
+@admin_required
+def admin_profiler():
+    # POST {"sample_rate": 0.05, "allow_triggers": true, "route": "/api/admin/user/"} arms this worker;
+    # set FLUX_PROFILE_* env vars to arm every worker at boot
+    if request.method == 'POST':
+        data = request.json or {}
+        profiler.configure(
+            sample_rate=data.get('sample_rate'),
+            allow_triggers=data.get('allow_triggers'),
+            route_filter=data.get('route'),
+            interval_ms=data.get('interval_ms')
+        )
+    return jsonify({"status": "success", "profiler": profiler.status(), "profiles": profiler.list_profiles()})
+
+@app.route('/api/admin/profiles/<name>', methods=['GET'])
+@admin_required
+def get_admin_profile(name):
+    # Collapsed stacks: feed to flamegraph.pl or drop into speedscope.app
+    return send_from_directory(profiler.directory, name, mimetype='text/plain')
+
+def parse_time_arg(name):
+    # Optional ISO date or datetime query argument, in the stored (IST, no offset) time
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO date or datetime, e.g. 2025-03-14 or 2025-03-14T10:30:00")
+    if parsed.tzinfo is not None:
+        raise ValueError(f"{name} must not carry a UTC offset; times are stored in IST")
+    return parsed
+
 @app.route('/api/admin/logs', methods=['GET'])
 def get_admin_logs():
-    return jsonify({"logs": db.get_audit_logs()})
+    # Newest first; ?account_id=&action=&since=&until= filter, ?limit=&offset= page
+    args = request.args
+    limit = args.get('limit', type=int)
+    offset = args.get('offset', 0, type=int)
+    try:
+        since, until = parse_time_arg('since'), parse_time_arg('until')
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    page, total = db.query_audit_logs(account_id=args.get('account_id') or None, action=args.get('action') or None,
+                                      since=since, until=until, offset=offset, limit=limit)
+    return frame_response("logs", page, 'AuditLogs', extra={"total": total, "offset": offset})
 
 @app.route('/api/admin/kyc-requests', methods=['GET'])
 def get_admin_pending_kyc():
-    reqs = db.get_pending_kyc_requests()
-    return jsonify({"requests": reqs})
+    # Oldest first; ?status= (default Pending), ?limit=&offset= page
+    status = request.args.get('status', 'Pending')
+    offset = request.args.get('offset', 0, type=int)
+    reqs, total = db.query_kyc_requests(status, offset, request.args.get('limit', type=int))
+    return jsonify({"requests": reqs, "total": total, "offset": offset})
 
 @app.route('/api/admin/kyc-update', methods=['POST'])
 def admin_update_kyc():
@@ -429,9 +710,68 @@ def admin_update_kyc():
             "Description": f"Admin (ADM-001) {new_status.lower()} KYC for {account_id}",
             "TransactionType": "System"
         }, risk_score=risk)
+        db.log_audit(f"KYC {new_status}", account_id, f"Admin (ADM-001) {new_status.lower()} KYC for {account_id}")
         return jsonify({"status": "success", "message": msg})
     return jsonify({"status": "error", "message": msg}), 400
 
+@app.route('/api/admin/kyc-bulk-update', methods=['POST'])
+@admin_required
+def admin_bulk_update_kyc():
+    # {"account_ids": [...], "status": "Approved" | "Rejected"}; one write per sheet
+    data = request.json or {}
+    account_ids = [a for a in data.get('account_ids', []) if a]
+    new_status = data.get('status')
+    if not account_ids or new_status not in ('Approved', 'Rejected'):
+        return jsonify({"status": "error", "message": "account_ids and status (Approved/Rejected) are required"}), 400
+
+    updated = db.bulk_update_kyc_status(account_ids, new_status)
+    risk = 50 if new_status == 'Rejected' else 0
+    db.log_system_events([
+        (acc, f"Admin (ADM-001) {new_status.lower()} KYC for {acc}", risk) for acc in updated])
+    db.log_audit_many([
+        (f"KYC {new_status}", acc, f"Admin (ADM-001) {new_status.lower()} KYC for {acc}") for acc in updated])
+    return jsonify({"status": "success", "updated": updated,
+                    "not_found": [a for a in account_ids if a not in set(updated)]})
+
+@app.route('/api/admin/import/<kind>', methods=['POST'])
+@admin_required
+def admin_bulk_import(kind):
+    # Multipart "file" field or the raw request body; ?format=csv|parquet (default from
+    # the file name, else csv), ?keep_ids=1 to keep source AccountIDs
+    upload = request.files.get('file')
+    name = upload.filename if upload else ''
+    try:
+        fmt = bulk_io.detect_format(name, request.args.get('format'))
+        if kind not in bulk_io.KINDS:
+            raise ValueError(f"kind must be one of {', '.join(bulk_io.KINDS)}")
+        if upload:
+            source = upload.stream
+        else:
+            # Parquet needs a seekable file; CSV is parsed straight off the socket
+            source = io.BytesIO(request.get_data()) if fmt == 'parquet' else request.stream
+        report = bulk_io.import_file(db, kind, source, fmt, keep_ids=request.args.get('keep_ids') == '1')
+    except (ValueError, RuntimeError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    imported = {sheet: r['imported'] for sheet, r in report.items() if isinstance(r, dict)}
+    db.log_audit("Bulk Import", "", f"Admin ({session['admin_id']}) bulk imported {kind} {name}: {imported}")
+    return jsonify({"status": "success", "report": report})
+
+@app.route('/api/admin/export/<sheet_name>', methods=['GET'])
+@admin_required
+def admin_bulk_export(sheet_name):
+    if sheet_name not in SHEETS:
+        return jsonify({"status": "error", "message": "Unknown sheet"}), 404
+    try:
+        fmt = bulk_io.detect_format('', request.args.get('format', 'csv'))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if fmt == 'parquet' and bulk_io.pq is None:
+        return jsonify({"status": "error", "message": "Parquet export needs pyarrow"}), 400
+    mimetype = 'application/vnd.apache.parquet' if fmt == 'parquet' else 'text/csv'
+    return Response(bulk_io.export_chunks(db, sheet_name, fmt), mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename={sheet_name}.{fmt}"})
+
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
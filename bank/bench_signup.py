@@ -0,0 +1,184 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import string
+import sys
+import tempfile
+import threading
+import time
+
+# Allow running as `python bank/bench_signup.py` from the repo root
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+# Signup cost as the Users table grows, and AccountID allocation across processes.
+#
+#   python bank/bench_signup.py                          # 1k, 10k and 100k existing users
+#   python bank/bench_signup.py --users 50000 --signups 2000 --workers 8
+#
+# scale    create_user against a fake Sheets backend pre-loaded with N users, next to
+#          the pre-allocator algorithm (lowercase scan of every Username, len()-based ID,
+#          whole-sheet rewrite) run on the same table. Reports signups/s and p50/p99.
+# threads  T threads calling create_user on one DatabaseManager at once; every account
+#          they were given must be in the Users cache and, once the flush queue has
+#          drained, in the fake sheet. Reports signups/s and the number lost.
+# workers  W processes drawing AccountIDs from one IdAllocator directory as fast as they
+#          can; every ID is collected and checked for duplicates.
+
+DEFAULT_USERS = [1_000, 10_000, 100_000]
+
+
+def synthetic_users(rows, seed=11):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'AccountID': [f"AC{1001 + i}" for i in range(rows)],
+        'AccountNumber': rng.integers(10**10, 10**11 - 1, rows).astype(str),
+        'IFSC': [f"FLUX0{n:06X}" for n in rng.integers(0, 16**6, rows)],
+        'Username': [f"user{i}" for i in range(rows)],
+        'Password': 'pw',
+        'FullName': 'Bench User',
+        'Email': 'bench@example.com',
+        'Phone': '0',
+        'AccountBalance': 0.0,
+        'KYCStatus': 'Not Started',
+        'CreatedAt': '2025-01-01 00:00:00',
+    })
+
+
+def fresh_db(users):
+    from database_manager import DatabaseManager
+    from fake_sheets import FakeSheetsClient
+    directory = tempfile.mkdtemp(prefix='flux-bench-')
+    db = DatabaseManager(db_file=os.path.join(directory, 'db.xlsx'), sheets_client=FakeSheetsClient(),
+                         connect_mode='eager')
+    db._save_sheet(users, 'Users')
+    return db
+
+
+def legacy_create_user(db, username):
+    # create_user before the allocator, kept here as the baseline
+    df = db._load_sheet('Users')
+    if str(username).lower() in df['Username'].astype(str).str.lower().values:
+        return False
+    new_user = {
+        "AccountID": f"AC{len(df) + 1001}",
+        "AccountNumber": str(random.randint(10000000000, 99999999999)),
+        "IFSC": "FLUX0" + ''.join(random.choices(string.ascii_uppercase + string.digits, k=6)),
+        "Username": username, "Password": "pw", "FullName": "Bench User", "Email": "bench@example.com",
+        "Phone": "0", "AccountBalance": 0.0, "KYCStatus": "Not Started",
+        "CreatedAt": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    db._save_sheet(pd.concat([df, pd.DataFrame([new_user])], ignore_index=True), 'Users')
+    return True
+
+
+def timed(fn, count):
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summary(name, rows, latencies):
+    lat = np.array(latencies)
+    return {'mode': name, 'users': rows, 'signups': len(lat), 'per_s': len(lat) / lat.sum(),
+            'p50_ms': float(np.percentile(lat, 50) * 1000), 'p99_ms': float(np.percentile(lat, 99) * 1000)}
+
+
+def bench_scale(rows, signups):
+    users = synthetic_users(rows)
+    db = fresh_db(users)
+    db.get_user('warmup')  # build the index outside the timings
+    new = timed(lambda i: db.create_user(f"new{i}", 'pw', 'Bench User', 'bench@example.com', '0'), signups)
+    db = fresh_db(users)
+    old = timed(lambda i: legacy_create_user(db, f"new{i}"), signups)
+    return [summary('legacy', rows, old), summary('allocator', rows, new)]
+
+
+def bench_threads(threads, per_thread, rows=1_000):
+    db = fresh_db(synthetic_users(rows))
+    barrier = threading.Barrier(threads + 1)
+    created = [[] for _ in range(threads)]
+
+    def run(t, out):
+        barrier.wait()
+        for i in range(per_thread):
+            ok, user = db.create_user(f"t{t}_{i}", 'pw', 'Bench User', 'bench@example.com', '0')
+            if ok:
+                out.append(user['AccountID'])
+
+    workers = [threading.Thread(target=run, args=(t, out)) for t, out in enumerate(created)]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for w in workers:
+        w.join()
+    seconds = time.perf_counter() - start
+    db.sheets.drain(60)
+    ids = {a for out in created for a in out}
+    cached = set(db._peek_sheet('Users')['AccountID'])
+    stored = {r['AccountID'] for r in db.sh.worksheet('Users').get_all_records()}
+    return {'mode': 'threads', 'threads': threads, 'signups': len(ids), 'per_s': len(ids) / seconds,
+            'lost_cache': len(ids - cached), 'lost_sheet': len(ids - stored)}
+
+
+def _draw(args):
+    directory, count = args
+    from id_allocator import IdAllocator
+    allocator = IdAllocator('bench', directory=directory)
+    return [allocator.next(1001) for _ in range(count)]
+
+
+def bench_workers(workers, per_worker):
+    directory = tempfile.mkdtemp(prefix='flux-ids-')
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        drawn = pool.map(_draw, [(directory, per_worker)] * workers)
+    seconds = time.perf_counter() - start
+    ids = [i for chunk in drawn for i in chunk]
+    return {'mode': 'workers', 'workers': workers, 'ids': len(ids), 'unique': len(set(ids)),
+            'per_s': len(ids) / seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark signups and AccountID allocation")
+    parser.add_argument('--users', type=int, nargs='+', default=DEFAULT_USERS)
+    parser.add_argument('--signups', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--signups-per-thread', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--ids-per-worker', type=int, default=20_000)
+    parser.add_argument('--json', dest='json_out')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'users':>8} {'mode':<10} {'signups/s':>10} {'p50':>9} {'p99':>9}")
+    for rows in args.users:
+        for r in bench_scale(rows, args.signups):
+            results.append(r)
+            print(f"{r['users']:>8} {r['mode']:<10} {r['per_s']:>10.0f} {r['p50_ms']:>7.2f}ms {r['p99_ms']:>7.2f}ms")
+
+    r = bench_threads(args.threads, args.signups_per_thread)
+    results.append(r)
+    print(f"\n{r['threads']} threads signed up {r['signups']} users at {r['per_s']:.0f}/s, "
+          f"{r['lost_cache']} missing from the cache, {r['lost_sheet']} missing from the sheet")
+
+    r = bench_workers(args.workers, args.ids_per_worker)
+    results.append(r)
+    print(f"{r['workers']} processes drew {r['ids']} AccountIDs at {r['per_s']:.0f}/s, "
+          f"{r['ids'] - r['unique']} duplicates")
+
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
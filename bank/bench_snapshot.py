@@ -0,0 +1,124 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+# Allow running as `python bank/bench_snapshot.py` from the repo root
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+# Cold-load cost of an ActivityLogs sheet: openpyxl vs the Feather snapshot.
+#
+#   python bank/bench_snapshot.py                      # 10k, 100k and 1M rows
+#   python bank/bench_snapshot.py --rows 10000 50000
+#
+# For each size a synthetic workbook is written once, then every loader runs in a fresh
+# interpreter so the timings are true cold loads and the RSS figure (resident growth
+# with the loaded table held) is not polluted by earlier runs:
+#   excel          pd.read_excel, what offline mode did for every sheet load
+#   snapshot       SheetSnapshots.load, memory-mapped and converted to a DataFrame
+#   snapshot_arrow the mapped Arrow table alone, before any pandas conversion
+# Writing the 1M-row workbook takes a few minutes; it is not part of the timings.
+
+SHEET = 'ActivityLogs'
+MODES = ('excel', 'snapshot', 'snapshot_arrow')
+
+
+def synthetic_logs(rows, seed=7):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2025-01-01').value // 10**9
+    return pd.DataFrame({
+        'LogID': [f"LOG-{i + 1}" for i in range(rows)],
+        'AccountID': [f"AC{n}" for n in rng.integers(1001, 6001, rows)],
+        'Timestamp': pd.to_datetime(np.sort(rng.integers(start, start + 365 * 86400, rows)), unit='s')
+                       .strftime('%Y-%m-%d %H:%M:%S'),
+        'CyberRiskScore': rng.integers(0, 101, rows),
+        'Channel': rng.choice(['Web', 'Mobile', 'ATM', 'Branch'], rows),
+        'SessionDuration': rng.integers(30, 900, rows),
+        'DeviceTrustScore': np.round(rng.uniform(40, 100, rows), 1),
+        'TransactionType': rng.choice(['Transfer', 'Deposit', 'Login', 'Withdrawal', 'System'], rows),
+        'Amount': np.round(rng.exponential(2500, rows), 2),
+        'Description': rng.choice(['Transfer to beneficiary', 'Salary credit', 'User login', 'ATM cash'], rows),
+        'SessionID': [f"S{n:08x}" for n in rng.integers(0, 2**32, rows)],
+    })
+
+
+def rss_kb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def child(mode, workbook):
+    import shared_tables
+    from sheet_snapshots import SheetSnapshots
+    snapshots = SheetSnapshots(workbook)
+    before = rss_kb()
+    start = time.perf_counter()
+    if mode == 'excel':
+        loaded = pd.read_excel(workbook, sheet_name=SHEET, engine='openpyxl')
+    elif mode == 'snapshot':
+        loaded = snapshots.load(SHEET)
+    else:
+        loaded = shared_tables.read_table(snapshots._path(SHEET))
+    seconds = time.perf_counter() - start
+    # Resident growth while the loaded table is still alive
+    rss_mb = (rss_kb() - before) / 1024.0
+    print(json.dumps({'mode': mode, 'rows': len(loaded), 'seconds': seconds, 'rss_mb': rss_mb}))
+
+
+def prepare(rows, directory):
+    from sheet_snapshots import SheetSnapshots
+    workbook = os.path.join(directory, f"logs_{rows}.xlsx")
+    df = synthetic_logs(rows)
+    print(f"writing {rows} rows to {workbook} ...", flush=True)
+    df.to_excel(workbook, sheet_name=SHEET, index=False, engine='openpyxl')
+    SheetSnapshots(workbook).rebuild({SHEET: df})
+    return workbook
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cold sheet loads: read_excel vs Feather snapshot")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--dir', help="Where to write the workbooks (default: a temp dir)")
+    parser.add_argument('--json', dest='json_out')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'WORKBOOK'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    directory = args.dir or tempfile.mkdtemp(prefix='flux-bench-')
+    results = []
+    for rows in args.rows:
+        workbook = prepare(rows, directory)
+        for mode in MODES:
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode, workbook],
+                                 check=True, capture_output=True, text=True).stdout
+            results.append(json.loads(out.strip().splitlines()[-1]))
+
+    print(f"\n{'rows':>9} {'mode':<15} {'load':>10} {'RSS +':>10} {'speedup':>8}")
+    excel = {r['rows']: r['seconds'] for r in results if r['mode'] == 'excel'}
+    for r in results:
+        print(f"{r['rows']:>9} {r['mode']:<15} {r['seconds'] * 1000:>8.1f}ms {r['rss_mb']:>8.1f}MB "
+              f"{excel[r['rows']] / r['seconds']:>7.0f}x")
+
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
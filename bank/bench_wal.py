@@ -0,0 +1,103 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+# Allow running as `python bank/bench_wal.py` from the repo root
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from write_ahead_log import WriteAheadLog
+
+# Write-ahead log commit throughput by fsync policy.
+#
+#   python bank/bench_wal.py                                   # every policy, 1/8/32 writers
+#   python bank/bench_wal.py --writers 16 --policies group --commit-ms 0 1 5 10
+#   python bank/bench_wal.py --dir /var/lib/flux               # measure the real disk
+#
+# W threads each commit N records the size of one ActivityLogs append, waiting for
+# durability the way a request does (write_ahead_log.py). For every policy and writer
+# count it reports commits/s, commit latency p50/p99 and records per fsync, which is
+# what group commit buys. The temp directory is often tmpfs, where fsync is free: point
+# --dir at the disk the service will use for numbers that mean something.
+
+RECORD = {
+    'sheet': 'ActivityLogs', 'op': 'append',
+    'columns': ['LogID', 'AccountID', 'Timestamp', 'TransactionType', 'TransactionAmount', 'Channel',
+                'Description', 'SessionDuration', 'DeviceTrustScore', 'CyberRiskScore'],
+    'rows': [['LOG-1b2c3d4e', 'AC1042', '2025-03-14 10:22:31', 'Transfer', 2500.0, 'Web',
+              'Transfer to AC1077', 120, 0.9, 18.5]],
+}
+
+
+def run(directory, policy, commit_ms, writers, records):
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    scratch = tempfile.mkdtemp(prefix='flux-wal-', dir=directory)
+    wal = WriteAheadLog(scratch, sync=policy,
+                        commit_interval=commit_ms / 1000.0, snapshot_records=10**12)
+    wal.start({})
+    latencies = [[] for _ in range(writers)]
+    barrier = threading.Barrier(writers + 1)
+
+    def writer(out):
+        barrier.wait()
+        for _ in range(records):
+            start = time.perf_counter()
+            wal.wait(wal.write(dict(RECORD)))
+            out.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=writer, args=(out,)) for out in latencies]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    wal.close(clean=False)  # flush what async/off left buffered
+    seconds = time.perf_counter() - started
+    shutil.rmtree(scratch, ignore_errors=True)
+    lat = np.concatenate([np.array(out) for out in latencies])
+    total = writers * records
+    return {'policy': policy, 'commit_ms': commit_ms if policy != 'always' else None, 'writers': writers,
+            'records': total, 'per_s': total / seconds,
+            'p50_ms': float(np.percentile(lat, 50) * 1000), 'p99_ms': float(np.percentile(lat, 99) * 1000),
+            'fsyncs': wal.fsyncs, 'per_fsync': total / wal.fsyncs if wal.fsyncs else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark write-ahead log commits by fsync policy")
+    parser.add_argument('--dir', default=None, help="Directory for the logs (default: the temp directory)")
+    parser.add_argument('--policies', nargs='+', default=['always', 'group', 'async', 'off'],
+                        choices=['always', 'group', 'async', 'off'])
+    parser.add_argument('--commit-ms', type=float, nargs='+', default=[2.0],
+                        help="Group-commit gathering window(s) to try")
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--records', type=int, default=500, help="Records per writer")
+    parser.add_argument('--json', dest='json_out')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'policy':<7} {'commit':>7} {'writers':>8} {'commits/s':>10} {'p50':>9} {'p99':>9} {'per fsync':>10}")
+    for policy in args.policies:
+        for commit_ms in (args.commit_ms if policy != 'always' else [0.0]):
+            for writers in args.writers:
+                r = run(args.dir, policy, commit_ms, writers, args.records)
+                results.append(r)
+                commit = '-' if r['commit_ms'] is None else f"{r['commit_ms']:g}ms"
+                per_fsync = '-' if r['per_fsync'] is None else f"{r['per_fsync']:.1f}"
+                print(f"{policy:<7} {commit:>7} {writers:>8} {r['per_s']:>10.0f} {r['p50_ms']:>7.2f}ms "
+                      f"{r['p99_ms']:>7.2f}ms {per_fsync:>10}")
+
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,472 @@
+import argparse
+import json
+import os
+import string
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: pip install pyarrow
+    pa = pq = None
+
+# Allow running as `python bank/bulk_io.py` from the repo root
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import metrics
+import schemas
+from indexes import account_key
+
+# Bulk import and export of Users, ActivityLogs and Beneficiaries.
+#
+#   python bank/bulk_io.py import banking data_generator/banking_activity_logs.csv
+#   python bank/bulk_io.py import users accounts.parquet --keep-ids
+#   python bank/bulk_io.py export ActivityLogs activity.parquet
+#
+# The same pipeline backs POST /api/admin/import/<kind> and GET /api/admin/export/<sheet>.
+#
+# Import reads the source in batches (CSV chunks, Parquet row batches). Every batch is
+# validated with column-wide masks: rejected rows are counted with a reason and the
+# first few are reported by row number. New AccountIDs, account numbers, IFSCs and
+# LogIDs are assigned for the whole batch at once, and accepted rows are written with
+# one append per sheet every CHUNK_ROWS rows (Users before the rows that reference them).
+#
+# Kinds:
+#   users          one row per account (Username, Password, FullName, Email, Phone, ...)
+#   activity       ActivityLogs rows for accounts that already exist
+#   beneficiaries  AccountID, BeneficiaryName, AccountNumber, IFSC, Nickname
+#   banking        the denormalised banking_activity_logs.csv layout: user columns and
+#                  activity columns on every row; each AccountID becomes one account
+#                  (first row wins) and its rows become its activity. Its AccountNumber
+#                  and IFSC are the user's own, so it carries no beneficiaries.
+# Source AccountIDs are mapped to newly assigned ones unless keep_ids is set, in which
+# case they are kept and rows whose AccountID is already in use are rejected.
+#
+# Export walks the sheet (for ActivityLogs the archive partitions oldest first, then the
+# hot sheet) CHUNK_ROWS rows at a time, so memory beyond the cached frames stays flat.
+# Columns in NOT_EXPORTED (passwords) are left out of every export.
+
+CHUNK_ROWS = int(os.environ.get('FLUX_BULK_CHUNK_ROWS', 5000))
+KINDS = ('users', 'activity', 'beneficiaries', 'banking')
+FORMATS = ('csv', 'parquet')
+MAX_ERRORS = 20
+
+USER_COLUMNS = ['AccountID', 'AccountNumber', 'IFSC', 'Username', 'Password', 'FullName',
+                'Email', 'Phone', 'AccountBalance', 'KYCStatus', 'CreatedAt']
+ACTIVITY_COLUMNS = ['LogID', 'AccountID', 'Timestamp', 'CyberRiskScore', 'TransactionAmount',
+                    'TransactionType', 'Description', 'SessionID', 'Channel', 'SessionDuration',
+                    'DeviceTrustScore']
+BENEFICIARY_COLUMNS = ['AccountID', 'BeneficiaryName', 'AccountNumber', 'IFSC', 'Nickname']
+NOT_EXPORTED = {'Users': ['Password']}
+IFSC_CHARS = np.array(list(string.ascii_uppercase + string.digits))
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Parquet needs pyarrow (pip install pyarrow)")
+
+
+def detect_format(name, fmt=None):
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+        return fmt
+    return 'parquet' if str(name).lower().endswith(('.parquet', '.pq')) else 'csv'
+
+
+def read_batches(source, fmt='csv', batch_rows=CHUNK_ROWS):
+    # DataFrames of at most batch_rows rows, indexed by row number in the source
+    if fmt == 'parquet':
+        _require_pyarrow()
+        batches = (b.to_pandas() for b in pq.ParquetFile(source).iter_batches(batch_size=batch_rows))
+    else:
+        # Everything as text: account numbers and phones keep their leading zeros
+        batches = pd.read_csv(source, chunksize=batch_rows, dtype=str, keep_default_na=False)
+    start = 0
+    for batch in batches:
+        batch.index = pd.RangeIndex(start, start + len(batch))
+        start += len(batch)
+        yield batch
+
+
+def _text(batch, col, default=''):
+    if col not in batch.columns:
+        return pd.Series(default, index=batch.index, dtype=object)
+    values = batch[col]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(object)
+    return values.where(values.notna(), default).astype(str).str.strip()
+
+
+def _account_numbers(values):
+    # Account numbers as indexes.account_key compares them ("12345678901.0" -> "12345678901")
+    return values.map(lambda v: account_key(v, '')[0])
+
+
+def _number(batch, col, default=0.0):
+    # NaN marks a value that is present but not a number
+    text = _text(batch, col)
+    return pd.to_numeric(text.where(text != '', str(default)), errors='coerce')
+
+
+def _timestamps(batch, col):
+    if col in batch.columns and pd.api.types.is_datetime64_any_dtype(batch[col]):
+        return batch[col].dt.tz_localize(None) if batch[col].dt.tz is not None else batch[col]
+    return pd.to_datetime(_text(batch, col), format=schemas.TIMESTAMP, errors='coerce')
+
+
+class BulkImporter:
+    def __init__(self, db, keep_ids=False, chunk_rows=CHUNK_ROWS):
+        self.db = db
+        self.keep_ids = keep_ids
+        self.chunk_rows = chunk_rows
+        self.rng = np.random.default_rng()
+
+        users = db._peek_sheet('Users')
+        self.usernames = set(_text(users, 'Username').str.lower())
+        self.account_ids = set(_text(users, 'AccountID'))
+        self.existing_ids = frozenset(self.account_ids)
+        self.account_numbers = set(_account_numbers(_text(users, 'AccountNumber')))
+        self.id_map = {}   # source AccountID -> AccountID
+        self.rejected_sources = set()
+        index = db._beneficiary_index()[1]
+        self.payees = {(a, account_key(n, '')[0]) for a, n in index.pairs} if index is not None else set()
+
+        self.pending = {'Users': [], 'ActivityLogs': [], 'Beneficiaries': []}
+        self.report = {sheet: {'imported': 0, 'rejected': 0, 'errors': []} for sheet in self.pending}
+
+    def run(self, batches, kind):
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+        started = time.perf_counter()
+        for batch in batches:
+            if kind in ('users', 'banking'):
+                self.add_users(batch, repeats_ok=kind == 'banking')
+            if kind in ('activity', 'banking'):
+                self.add_activity(batch)
+            if kind == 'beneficiaries':
+                self.add_beneficiaries(batch)
+            if max(sum(len(f) for f in frames) for frames in self.pending.values()) >= self.chunk_rows:
+                self.flush()
+        self.flush()
+        report = {sheet: r for sheet, r in self.report.items() if r['imported'] or r['rejected']}
+        report['seconds'] = round(time.perf_counter() - started, 3)
+        return report
+
+    # --- VALIDATION ---
+    def _reject(self, sheet, checks):
+        # checks: (mask, reason) in priority order; returns the mask of accepted rows
+        rejected = None
+        report = self.report[sheet]
+        for mask, reason in checks:
+            mask = mask if rejected is None else mask & ~rejected
+            if mask.any():
+                for row in mask.index[mask][:MAX_ERRORS - len(report['errors'])]:
+                    report['errors'].append({'row': int(row), 'error': reason})
+            rejected = mask if rejected is None else rejected | mask
+        report['rejected'] += int(rejected.sum())
+        metrics.inc('flux_bulk_rows_total', int(rejected.sum()), sheet=sheet, result='rejected')
+        return ~rejected
+
+    def _resolve_accounts(self, batch):
+        # Target AccountID per row (None when unknown): mapped from this import, else an
+        # account that existed before it. Source IDs of rejected users resolve to nothing,
+        # even when a newly assigned ID happens to spell the same.
+        source = _text(batch, 'AccountID')
+        mapped = source.map(self.id_map)
+        existing = source.isin(self.existing_ids) & ~source.isin(self.rejected_sources)
+        return mapped.where(mapped.notna(), source.where(existing))
+
+    def _allocate_ids(self, n):
+        # Same sequence as create_user, so imports and live signups never collide
+        users = self.db._user_index()[1]
+        ids = []
+        while len(ids) < n:
+            candidate = self.db.allocate_account_id(users)
+            if candidate not in self.account_ids:
+                ids.append(candidate)
+        return ids
+
+    def _allocate_account_numbers(self, n):
+        numbers = []
+        while len(numbers) < n:
+            drawn = self.rng.integers(10000000000, 99999999999, n - len(numbers), endpoint=True).astype(str)
+            fresh = [num for num in pd.unique(drawn) if num not in self.account_numbers]
+            self.account_numbers.update(fresh)
+            numbers.extend(fresh)
+        return numbers
+
+    def add_users(self, batch, repeats_ok=False):
+        source = _text(batch, 'AccountID')
+        repeat = (source != '') & (source.isin(self.id_map) | source.duplicated())
+        if repeats_ok:
+            # Later rows of an account already imported (or already rejected)
+            repeat |= (source != '') & source.isin(self.rejected_sources)
+            batch, source = batch[~repeat], source[~repeat]
+            repeat = repeat[~repeat]
+        if batch.empty:
+            return
+
+        username = _text(batch, 'Username')
+        lower = username.str.lower()
+        balance = _number(batch, 'AccountBalance')
+        created_text = _text(batch, 'CreatedAt')
+        created = _timestamps(batch, 'CreatedAt')
+        numbers = _account_numbers(_text(batch, 'AccountNumber'))
+        checks = [
+            (repeat, "duplicate AccountID"),
+            ((username == '') | (_text(batch, 'Password') == '') | (_text(batch, 'FullName') == ''),
+             "Username, Password and FullName are required"),
+            (lower.isin(self.usernames) | lower.duplicated(), "Username already exists"),
+            (balance.isna() | (balance < 0), "AccountBalance must be a non-negative number"),
+            ((created_text != '') & created.isna(), "CreatedAt must be YYYY-MM-DD HH:MM:SS"),
+        ]
+        if self.keep_ids:
+            checks += [
+                ((source == '') | source.isin(self.account_ids), "AccountID missing or already in use"),
+                ((numbers != '') & (numbers.isin(self.account_numbers) | numbers.duplicated()),
+                 "AccountNumber already in use"),
+            ]
+        ok = self._reject('Users', checks)
+        self.rejected_sources.update(source[~ok & (source != '')])
+        if not ok.any():
+            return
+        batch, source = batch[ok], source[ok]
+        n = len(batch)
+
+        if self.keep_ids:
+            ids = source.tolist()
+            numbers = numbers[ok]
+            missing = numbers == ''
+            numbers = numbers.tolist()
+            for i, num in zip(np.flatnonzero(missing.to_numpy()), self._allocate_account_numbers(int(missing.sum()))):
+                numbers[i] = num
+            self.account_numbers.update(numbers)
+        else:
+            ids = self._allocate_ids(n)
+            numbers = self._allocate_account_numbers(n)
+        ifsc = self.rng.choice(IFSC_CHARS, size=(n, 6))
+        kyc = _text(batch, 'KYCStatus')
+        now = datetime.now().strftime(schemas.TIMESTAMP)
+
+        rows = pd.DataFrame({
+            "AccountID": ids,
+            "AccountNumber": numbers,
+            "IFSC": ["FLUX0" + "".join(chars) for chars in ifsc],
+            "Username": username[ok].to_numpy(),
+            "Password": _text(batch, 'Password').to_numpy(),
+            "FullName": _text(batch, 'FullName').to_numpy(),
+            "Email": _text(batch, 'Email').to_numpy(),
+            "Phone": _text(batch, 'Phone').to_numpy(),
+            "AccountBalance": balance[ok].astype(float).to_numpy(),
+            "KYCStatus": kyc.where(kyc != '', 'Not Started').to_numpy(),
+            "CreatedAt": created[ok].dt.strftime(schemas.TIMESTAMP).fillna(now).to_numpy(),
+        })
+        if self.keep_ids and 'IFSC' in batch.columns:
+            given = _text(batch, 'IFSC').to_numpy()
+            rows['IFSC'] = np.where(given != '', given, rows['IFSC'])
+
+        self.usernames.update(lower[ok])
+        self.account_ids.update(ids)
+        self.id_map.update((src, new) for src, new in zip(source, ids) if src)
+        self.pending['Users'].append(rows)
+
+    def add_activity(self, batch):
+        account = self._resolve_accounts(batch)
+        ts = _timestamps(batch, 'Timestamp')
+        amount = _number(batch, 'TransactionAmount')
+        risk = _number(batch, 'CyberRiskScore')
+        ok = self._reject('ActivityLogs', [
+            (account.isna(), "unknown AccountID"),
+            (ts.isna(), "Timestamp must be YYYY-MM-DD HH:MM:SS"),
+            (amount.isna(), "TransactionAmount must be a number"),
+            (risk.isna() | (risk < 0) | (risk > 100), "CyberRiskScore must be between 0 and 100"),
+        ])
+        if not ok.any():
+            return
+        batch = batch[ok]
+        computed = {
+            "AccountID": account[ok],
+            "Timestamp": ts[ok].dt.strftime(schemas.TIMESTAMP),
+            "CyberRiskScore": risk[ok],
+            "TransactionAmount": amount[ok],
+        }
+        current = self.db._peek_sheet('ActivityLogs')
+        columns = [c for c in (list(current.columns) if not current.empty else ACTIVITY_COLUMNS) if c != 'LogID']
+        rows = pd.DataFrame({
+            col: computed[col] if col in computed else _text(batch, col) if col in batch.columns else 0
+            for col in columns
+        }, index=batch.index)
+        self.pending['ActivityLogs'].append(rows)
+
+    def add_beneficiaries(self, batch):
+        account = self._resolve_accounts(batch)
+        name = _text(batch, 'BeneficiaryName')
+        number = _account_numbers(_text(batch, 'AccountNumber'))
+        pairs = pd.Series(list(zip(account.fillna(''), number)), index=batch.index)
+        ok = self._reject('Beneficiaries', [
+            (account.isna(), "unknown AccountID"),
+            ((name == '') | (number == ''), "BeneficiaryName and AccountNumber are required"),
+            (pairs.isin(self.payees) | pairs.duplicated(), "Beneficiary already exists"),
+        ])
+        if not ok.any():
+            return
+        rows = pd.DataFrame({
+            "AccountID": account[ok],
+            "BeneficiaryName": name[ok],
+            "AccountNumber": number[ok],
+            "IFSC": _text(batch, 'IFSC')[ok],
+            "Nickname": _text(batch, 'Nickname')[ok],
+        })
+        self.payees.update(pairs[ok])
+        self.pending['Beneficiaries'].append(rows)
+
+    # --- COMMIT ---
+    def flush(self):
+        # One append per sheet, parents first
+        for sheet in ('Users', 'ActivityLogs', 'Beneficiaries'):
+            frames = self.pending[sheet]
+            if not frames:
+                continue
+            self.pending[sheet] = []
+            with self.db._write_lock(sheet):
+                chunk = pd.concat(frames, ignore_index=True)
+                current = self.db._peek_sheet(sheet)
+                if sheet == 'ActivityLogs':
+                    first = len(current) + self.db.archive.total_rows() + 1
+                    chunk.insert(0, 'LogID', [f"LOG-{first + i}" for i in range(len(chunk))])
+                if not current.empty:
+                    columns = list(current.columns)
+                    chunk = chunk.reindex(columns=columns + [c for c in chunk.columns if c not in columns],
+                                          fill_value=0 if sheet == 'ActivityLogs' else '')
+                before, after = self.db._append_rows(sheet, chunk, accounts=list(pd.unique(chunk['AccountID'])))
+                if sheet == 'ActivityLogs':
+                    self.db._advance_profiles(before, after, len(chunk))
+            self.report[sheet]['imported'] += len(chunk)
+            metrics.inc('flux_bulk_rows_total', len(chunk), sheet=sheet, result='imported')
+
+
+def import_file(db, kind, source, fmt='csv', keep_ids=False, chunk_rows=CHUNK_ROWS):
+    importer = BulkImporter(db, keep_ids=keep_ids, chunk_rows=chunk_rows)
+    return importer.run(read_batches(source, fmt, chunk_rows), kind)
+
+
+# --- EXPORT ---
+def export_batches(db, sheet_name, chunk_rows=CHUNK_ROWS):
+    frames = [db._peek_sheet(sheet_name)]
+    if sheet_name == 'ActivityLogs':
+        frames = [db.archive.read(month) for month in reversed(db.archive.months())] + frames
+    hidden = NOT_EXPORTED.get(sheet_name, [])
+    for df in frames:
+        for start in range(0, len(df), chunk_rows):
+            batch = schemas.to_storage(sheet_name, df.iloc[start:start + chunk_rows])
+            yield batch.drop(columns=[c for c in hidden if c in batch.columns])
+
+
+class _Sink:
+    # Write-only file object the Parquet writer fills and the export drains per batch
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def _parquet_table(sheet_name, batch, schema=None):
+    # Declared numeric columns stay numeric and everything else is written as text, so
+    # every batch (hot sheet or any archive partition) has the same Parquet schema
+    numeric = {col for col, kind in schemas.SCHEMAS.get(sheet_name, {}).items() if kind in ('float64', 'int32')}
+    if schema is not None:
+        batch = batch.reindex(columns=schema.names, fill_value='')
+    batch = batch.copy()
+    for col in batch.columns:
+        if col in numeric:
+            batch[col] = pd.to_numeric(batch[col], errors='coerce').fillna(0).astype(schemas.SCHEMAS[sheet_name][col])
+        else:
+            batch[col] = batch[col].where(batch[col].notna(), '').astype(str)
+    return pa.Table.from_pandas(batch, schema=schema, preserve_index=False)
+
+
+def export_chunks(db, sheet_name, fmt='csv', chunk_rows=CHUNK_ROWS):
+    # Encoded file contents, one piece per batch
+    if fmt == 'parquet':
+        _require_pyarrow()
+        sink, writer = _Sink(), None
+        for batch in export_batches(db, sheet_name, chunk_rows):
+            table = _parquet_table(sheet_name, batch, writer.schema if writer else None)
+            if writer is None:
+                writer = pq.ParquetWriter(sink, table.schema, compression='zstd')
+            writer.write_table(table)
+            yield sink.drain()
+        if writer is not None:
+            writer.close()
+            yield sink.drain()
+        return
+    header = True
+    for batch in export_batches(db, sheet_name, chunk_rows):
+        yield batch.to_csv(index=False, header=header).encode()
+        header = False
+
+
+def export_file(db, sheet_name, path, fmt='csv', chunk_rows=CHUNK_ROWS):
+    with open(path, 'wb') as f:
+        for data in export_chunks(db, sheet_name, fmt, chunk_rows):
+            f.write(data)
+    archived = db.archive.total_rows() if sheet_name == 'ActivityLogs' else 0
+    return len(db._peek_sheet(sheet_name)) + archived
+
+
+def main():
+    from database_manager import DatabaseManager, SHEETS
+
+    parser = argparse.ArgumentParser(description="Bulk import/export for Flux sheets")
+    sub = parser.add_subparsers(dest='command', required=True)
+    imp = sub.add_parser('import', help="Load a CSV or Parquet file")
+    imp.add_argument('kind', choices=KINDS)
+    imp.add_argument('path')
+    imp.add_argument('--format', choices=FORMATS)
+    imp.add_argument('--keep-ids', action='store_true', help="Keep source AccountIDs instead of assigning new ones")
+    imp.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    exp = sub.add_parser('export', help="Write a sheet to a CSV or Parquet file")
+    exp.add_argument('sheet', choices=SHEETS)
+    exp.add_argument('path')
+    exp.add_argument('--format', choices=FORMATS)
+    exp.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    db = DatabaseManager(connect_mode='eager')
+    fmt = detect_format(args.path, args.format)
+    if args.command == 'import':
+        report = import_file(db, args.kind, args.path, fmt, args.keep_ids, args.chunk_rows)
+        print(json.dumps(report, indent=2))
+    else:
+        started = time.perf_counter()
+        rows = export_file(db, args.sheet, args.path, fmt, args.chunk_rows)
+        print(f"Exported {rows} {args.sheet} rows to {args.path} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,41 @@
+import atexit
 import gspread
+import json
 import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 import pandas as pd
 from datetime import datetime
 import pytz
 from oauth2client.service_account import ServiceAccountCredentials
 
+import metrics
+from id_allocator import IdAllocator
+from indexes import ActivityProfiles, AuditIndex, BeneficiaryIndex, KycIndex, UserIndex
+import schemas
+import shared_tables
+from sheets_scheduler import SheetsScheduler
+from log_archive import LogArchive
+from sheet_mirror import SheetMirror
+from sheet_snapshots import SheetSnapshots
+from write_ahead_log import WriteAheadLog, rebase
+import structured_log
+
+log = structured_log.get_logger('flux.db')
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_FILE = os.path.join(BASE_DIR, "flux_financial_database.xlsx")
 CREDENTIALS_FILE = os.path.join(BASE_DIR, "credentials.json")
 GOOGLE_SHEET_ID = "1f4Qk6s50pDmRMyH7pMXzPqKk6Jp7VaTPHRfNTIxk8Eg" # User provided ID
+SHEETS = ('Users', 'ActivityLogs', 'ML_Features', 'Beneficiaries', 'KYCRequests', 'AuditLogs')
 
+@metrics.instrument
 class DatabaseManager:
-    def __init__(self, db_file=DB_FILE):
+    def __init__(self, db_file=DB_FILE, sheets_client=None, connect_mode=None, shared_role=None):
         self.db_file = db_file
         self.use_cloud = False
         self.gc = None
@@ -19,16 +43,149 @@ class DatabaseManager:
         
         self._cache = {}
         self._cache_time = {}
+        self._fetching = {}
+        self._writing = {}
+        self._workbook_lock = threading.RLock()  # offline: one .xlsx holds every sheet
         self.CACHE_TTL = 15 # Fetch from Google Sheets max every 15 seconds
         
+        # Callables(event, data) notified after each write, e.g. the admin live feed
+        self.listeners = []
+        
+        # Data versions for conditional GETs. Writes attributed to accounts bump only
+        # those accounts; anything else (unattributed saves, changes pulled from Sheets)
+        # bumps the sheet epoch, which invalidates every account on that sheet.
+        self.instance_id = uuid.uuid4().hex[:8]
+        self._sheet_version = {}
+        self._sheet_epoch = {}
+        self._account_version = {}
+        self._indexes = {}
+        
+        # Host-wide table store shared by gunicorn workers (shared_tables.py), enabled with
+        # FLUX_SHARED_CACHE=1. Workers read sheets from it instead of fetching them and
+        # publish their own writes to it; shared_loader.py is the one process that keeps
+        # it in sync with Sheets.
+        self.shared = None
+        self.shared_role = shared_role or {'1': 'worker'}.get(os.environ.get('FLUX_SHARED_CACHE', ''))
+        self._shared_seen = {}
+        if self.shared_role:
+            if shared_tables.available():
+                self.shared = shared_tables.SharedTables()
+            else:
+                log.warning("shared_cache_unavailable", reason="pyarrow is not installed")
+                self.shared_role = None
+        
+        # Offline mode loads sheets from Feather snapshots of the workbook (sheet_snapshots.py)
+        # when pyarrow is installed; FLUX_SNAPSHOTS=0 always parses the .xlsx
+        self.snapshots = None
+        if shared_tables.available() and os.environ.get('FLUX_SNAPSHOTS', '1') == '1':
+            self.snapshots = SheetSnapshots(self.db_file)
+        
+        # ActivityLogs tiering (log_archive.py): rows older than FLUX_LOG_HOT_DAYS move to
+        # monthly archive partitions. FLUX_ARCHIVE_INTERVAL=<seconds> runs the rollover in
+        # the background; it is off by default because the archive is local disk.
+        # AccountIDs come from per-worker sequence blocks (id_allocator.py)
+        self.ids = IdAllocator(os.path.abspath(self.db_file))
+        
+        self.archive = LogArchive(os.environ.get('FLUX_ARCHIVE_DIR') or os.path.splitext(self.db_file)[0] + '.archive')
+        self.HOT_DAYS = int(os.environ.get('FLUX_LOG_HOT_DAYS', 30))
+        archive_interval = float(os.environ.get('FLUX_ARCHIVE_INTERVAL', 0))
+        if archive_interval > 0:
+            self.start_archiver(archive_interval)
+        
+        # Connection setup (credentials, authorize, open spreadsheet) happens off the
+        # import path. FLUX_DB_CONNECT picks when:
+        #   background  start now on a daemon thread, first storage call waits for it (default)
+        #   lazy        on the first storage call
+        #   eager       synchronously here (the old behaviour)
+        # FLUX_DB_PREWARM=1 additionally loads all sheets in parallel once connected.
+        self._sheets_client = sheets_client
+        # Every Sheets call is rate limited and every Sheets write queued and coalesced
+        # by the scheduler (sheets_scheduler.py); queued writes get a chance to go out
+        # at exit
+        self.sheets = SheetsScheduler(self._write_sheet, synced=self._synced)
+        self._worksheets = {}
+        self.mirror = None
+        
+        # Write-ahead log of every cache change plus snapshots (write_ahead_log.py),
+        # FLUX_WAL=1; replayed on the next start if the process dies with writes the
+        # backend may not have
+        self.wal = None
+        if os.environ.get('FLUX_WAL') == '1':
+            if shared_tables.available():
+                try:
+                    self.wal = WriteAheadLog(os.environ.get('FLUX_WAL_DIR') or os.path.splitext(self.db_file)[0] + '.wal')
+                except RuntimeError as e:
+                    # Another worker owns the log; this one runs without
+                    log.warning("wal_unavailable", reason=str(e))
+            else:
+                log.warning("wal_unavailable", reason="pyarrow is not installed")
+        atexit.register(self._shutdown)
+        self.connect_mode = connect_mode or os.environ.get('FLUX_DB_CONNECT', 'background')
+        self.ready = threading.Event()
+        self._connect_lock = threading.Lock()
+        self._connect_started = False
+        self.startup = {"mode": self.connect_mode, "steps": {}, "first_load": {}}
+        
+        if self.connect_mode == 'eager':
+            self._ensure_connected()
+        elif self.connect_mode == 'background':
+            self._connect_started = True
+            threading.Thread(target=self._connect, name='flux-db-connect', daemon=True).start()
+
+    def _mark(self, step, started):
+        self.startup["steps"][step] = round(time.perf_counter() - started, 4)
+
+    def _ensure_connected(self):
+        if self.ready.is_set():
+            return
+        with self._connect_lock:
+            if not self._connect_started:
+                self._connect_started = True
+                self._connect()
+                return
+        self.ready.wait()
+
+    def _connect(self):
+        started = time.perf_counter()
+        try:
+            self._open_backend()
+            self._recover_wal()
+        finally:
+            self._mark('connect_total', started)
+            self.startup["backend"] = "sheets" if self.use_cloud else "excel"
+            self.ready.set()
+        self._migrate()
+        if os.environ.get('FLUX_DB_PREWARM') == '1':
+            self.prewarm()
+
+    def _migrate(self):
+        # Data fixes run once the backend is open; each is a no-op once done
+        started = time.perf_counter()
+        try:
+            for name, migration in (('archived_logs_trim', self.trim_archived_logs),
+                                    ('audit_logs_backfill', self.backfill_audit_logs)):
+                try:
+                    rows = migration()
+                    if rows:
+                        log.info("migration_applied", migration=name, rows=rows)
+                except Exception as e:
+                    log.error("migration_failed", migration=name, error=str(e))
+        finally:
+            self._mark('migrate', started)
+
+    def _open_backend(self):
         # Try to connect to Google Sheets
         creds_json = os.environ.get('GOOGLE_CREDENTIALS_JSON')
         
         try:
             scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
             creds = None
+            step_start = time.perf_counter()
             
-            if creds_json:
+            if self._sheets_client is not None:
+                # Injected client (e.g. fake_sheets.FakeSheetsClient for load tests)
+                log.info("sheets_client_injected")
+            elif creds_json:
                 # Load from Environment Variable (Render / Production)
                 import json, base64
                 
@@ -37,7 +194,7 @@ class DatabaseManager:
                 try:
                     decoded = base64.b64decode(creds_json.strip()).decode('utf-8')
                     creds_dict = json.loads(decoded)
-                    print("--- LOADED CREDENTIALS FROM BASE64 ENVIRONMENT VARIABLE ---")
+                    log.info("credentials_loaded", source="base64_env")
                 except Exception:
                     pass
                 
@@ -53,262 +210,749 @@ class DatabaseManager:
                     # Fix for Render escaping the newlines in the private key
                     if creds_dict and 'private_key' in creds_dict:
                         creds_dict['private_key'] = creds_dict['private_key'].replace('\\n', '\n')
-                    print("--- LOADED CREDENTIALS FROM JSON ENVIRONMENT VARIABLE ---")
+                    log.info("credentials_loaded", source="json_env")
                     
                 creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-                print("--- GOOGLE CREDENTIALS LOADED SUCCESSFULLY ---")
+                log.info("google_credentials_ready")
             elif os.path.exists(CREDENTIALS_FILE):
                 # Load from Local File (Development)
                 creds = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIALS_FILE, scope)
-                print("--- LOADED CREDENTIALS FROM LOCAL FILE ---")
+                log.info("credentials_loaded", source="local_file")
             
-            if creds:
-                self.gc = gspread.authorize(creds)
+            self._mark('credentials', step_start)
+            
+            if creds or self._sheets_client is not None:
+                step_start = time.perf_counter()
+                self.gc = self._sheets_client if self._sheets_client is not None else gspread.authorize(creds)
+                self._mark('authorize', step_start)
                 
                 # Try open sheet by ID
                 try:
-                    self.sh = self.gc.open_by_key(GOOGLE_SHEET_ID)
-                    print(f"--- CONNECTED TO GOOGLE SHEETS (ID: {GOOGLE_SHEET_ID}) ---")
+                    step_start = time.perf_counter()
+                    self.sh = self._api('open_by_key', self.gc.open_by_key, GOOGLE_SHEET_ID)
+                    self._mark('open_spreadsheet', step_start)
+                    log.info("sheets_connected", sheet_id=GOOGLE_SHEET_ID)
                     
                     # Rename it if needed (User asked to "name it")
                     if self.sh.title != "Flux Financial Database":
-                        self.sh.update_title("Flux Financial Database")
+                        step_start = time.perf_counter()
+                        self._api('update_title', self.sh.update_title, "Flux Financial Database")
+                        self._mark('update_title', step_start)
                         
                 except gspread.SpreadsheetNotFound:
-                    print("Error: The Sheet ID exists but I cannot access it. Did you share it with the Service Account email?")
+                    log.error("sheet_not_accessible", sheet_id=GOOGLE_SHEET_ID,
+                              hint="Share the sheet with the Service Account email")
                 except Exception as e:
-                     print(f"Error opening sheet: {e}")
+                     log.error("sheet_open_failed", error=str(e))
                 
                 if self.sh:
                     self.use_cloud = True
+                    self._start_mirror()
             
         except Exception as e:
-            print(f"Cloud Connection Failed: {e}")
+            log.error("cloud_connection_failed", error=str(e))
                 
         if not self.use_cloud:
-            print("--- USING LOCAL EXCEL FILE (OFFLINE MODE) ---")
+            log.info("offline_mode", db_file=self.db_file)
             if not os.path.exists(self.db_file):
-                print(f"WARNING: Database file {self.db_file} not found. Operating with empty data in-memory.")
+                log.warning("db_file_missing", db_file=self.db_file)
                 try:
                     import pandas as pd
                     pd.DataFrame().to_excel(self.db_file)
                 except Exception as e:
-                    print(f"Failed to create dummy excel file: {e}")
+                    log.error("db_file_create_failed", error=str(e))
+
+    def _recover_wal(self):
+        if self.wal is None:
+            return
+        self.wal.recover()
+        self.wal.start({})
+        if self.wal.pending:
+            # Writes the backend never confirmed: made again on top of its current copy,
+            # then the replayed log is folded into a snapshot
+            for sheet_name, records in self.wal.pending.items():
+                self._replay_unsynced(sheet_name, records)
+            self.wal.snapshot(self._cache)
+            log.warning("wal_replayed", sheets=sorted(self.wal.pending))
+
+    def _replay_unsynced(self, sheet_name, records):
+        with self._write_lock(sheet_name):
+            current = self._fetch_sheet(sheet_name, time.time(), use_mirror=False)
+            if current.empty and any(r['op'] == 'patch' for r in records):
+                # Nothing to patch: the sheet could not be read. The records stay unsynced.
+                log.error("wal_replay_deferred", sheet=sheet_name, records=len(records))
+                return
+            new, merged = rebase(sheet_name, current, records)
+            if new is not None and self.use_cloud and not current.empty:
+                if len(new):
+                    self._set_cached(sheet_name, schemas.append(sheet_name, current, new), None, len(new))
+                    values = schemas.to_storage(sheet_name, schemas.apply(sheet_name, new)).fillna('').values.tolist()
+                    self.sheets.enqueue(sheet_name, 'append', values, self.wal.last_seq(sheet_name))
+            else:
+                if new is not None:
+                    merged = schemas.append(sheet_name, current, new)
+                self._store_sheet(sheet_name, self._set_cached(sheet_name, merged, None))
+            # The old records are superseded by the ones just logged
+            self.wal.mark_synced(sheet_name, records[-1]['seq'])
+
+    def _shutdown(self):
+        # The log is emptied only when every queued Sheets write went out (a failed
+        # flush stays queued until it succeeds)
+        drained = self.sheets.drain(30)
+        if self.wal is not None:
+            self.wal.close(clean=drained)
+
+    def _start_mirror(self):
+        # Local mirror serving every read (sheet_mirror.py), FLUX_MIRROR=1. Workers of
+        # the shared table store already read from it, so they do not keep their own.
+        if os.environ.get('FLUX_MIRROR') != '1':
+            return
+        if self.shared_role == 'worker':
+            log.warning("mirror_disabled", reason="FLUX_SHARED_CACHE worker")
+            return
+        directory = os.environ.get('FLUX_MIRROR_DIR') or os.path.splitext(self.db_file)[0] + '.mirror'
+        self.mirror = SheetMirror(self, directory, SHEETS)
+        self.mirror.start()
+        log.info("mirror_started", directory=self.mirror.directory, interval=self.mirror.interval)
+
+    def prewarm(self, sheet_names=SHEETS, parallel=True):
+        # Fill the cache for every sheet, fetching them concurrently
+        started = time.perf_counter()
+        if parallel:
+            with ThreadPoolExecutor(max_workers=len(sheet_names)) as pool:
+                list(pool.map(self._peek_sheet, sheet_names))
+        else:
+            for name in sheet_names:
+                self._peek_sheet(name)
+        self._mark('prewarm', started)
+
+    def startup_report(self):
+        report = dict(self.startup)
+        report["ready"] = self.ready.is_set()
+        if self.mirror is not None:
+            report["mirror"] = self.mirror.status()
+        return report
+
+    def roll_activity_logs(self, hot_days=None):
+        # Move ActivityLogs rows older than the hot window into the archive, then trim
+        # the sheet. Returns the number of rows archived. Runs under the ActivityLogs
+        # write lock, so a row logged meanwhile is neither dropped by the trim nor
+        # given a LogID the archive already holds.
+        hot_days = self.HOT_DAYS if hot_days is None else hot_days
+        with self._write_lock('ActivityLogs'):
+            df = self._load_sheet('ActivityLogs')
+            if df.empty or 'Timestamp' not in df.columns:
+                return 0
+            now = datetime.now(pytz.timezone('Asia/Kolkata')).replace(tzinfo=None)
+            cold = (df['Timestamp'] < pd.Timestamp(now) - pd.Timedelta(days=hot_days)).to_numpy()
+            if not cold.any():
+                return 0
+            self.archive.append(schemas.apply('ActivityLogs', df[cold]))
+            self._save_sheet(df[~cold].reset_index(drop=True), 'ActivityLogs')
+        log.info("activity_logs_archived", rows=int(cold.sum()), hot_rows=int((~cold).sum()))
+        return int(cold.sum())
+
+    def trim_archived_logs(self):
+        # Finish a rollover interrupted between archive.append and the trim: hot rows
+        # whose LogID the archive already holds would otherwise be counted twice by
+        # _activity and the profiles. Returns the number of rows dropped.
+        if not self.archive.index():
+            return 0
+        with self._write_lock('ActivityLogs'):
+            df = self._peek_sheet('ActivityLogs')
+            if df.empty or 'LogID' not in df.columns or 'Timestamp' not in df.columns:
+                return 0
+            archived = self.archive.holds(df)
+            if not archived.any():
+                return 0
+            self._save_sheet(schemas.writable(df[~archived]).reset_index(drop=True), 'ActivityLogs')
+        return int(archived.sum())
+
+    def start_archiver(self, interval):
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.roll_activity_logs()
+                except Exception as e:
+                    log.error("activity_logs_archive_failed", error=str(e))
+        threading.Thread(target=run, name='flux-archiver', daemon=True).start()
+
+    def _activity(self, account_id=None, limit=None, where=None):
+        # ActivityLogs newest first across the hot sheet and the archive. Archive
+        # partitions are opened newest first and only until `limit` rows were found.
+        hot = self._peek_sheet('ActivityLogs')
+        if 'AccountID' in hot.columns and account_id is not None:
+            hot = hot[hot['AccountID'] == account_id]
+        sources = [hot] if 'AccountID' in hot.columns else []
+        parts, found = [], 0
+        for df in chain(sources, self.archive.frames(account_id)):
+            if where is not None:
+                df = df[where(df)]
+            parts.append(df)
+            found += len(df)
+            if limit is not None and found >= limit:
+                break
+        if not parts:
+            return pd.DataFrame()
+        if len(parts) > 1:
+            merged = pd.concat([schemas.writable(p) for p in parts if not p.empty], ignore_index=True)
+            parts = [schemas.apply('ActivityLogs', merged)]
+        result = parts[0].sort_values(by='Timestamp', ascending=False)
+        return result if limit is None else result.head(limit)
+
+    def _api(self, call, fn, *args, **kwargs):
+        # Single choke point for Google Sheets API calls: counted, rate limited and
+        # retried by the scheduler
+        return self.sheets.call(call, fn, *args, **kwargs)
+
+    def _worksheet(self, sheet_name):
+        # Worksheet handles are kept, since every sh.worksheet() is a metadata request
+        # against the same quota as the data calls
+        ws = self._worksheets.get(sheet_name)
+        if ws is None:
+            ws = self._worksheets[sheet_name] = self._api('worksheet', self.sh.worksheet, sheet_name)
+        return ws
+
+    def _emit(self, event, data):
+        for listener in self.listeners:
+            try:
+                listener(event, data)
+            except Exception as e:
+                log.warning("listener_failed", event=event, error=str(e))
+
+    def _bump(self, sheet_name, accounts=None):
+        self._sheet_version[sheet_name] = self._sheet_version.get(sheet_name, 0) + 1
+        if accounts is None:
+            self._sheet_epoch[sheet_name] = self._sheet_epoch.get(sheet_name, 0) + 1
+        else:
+            for acc in accounts:
+                key = (sheet_name, str(acc))
+                self._account_version[key] = self._account_version.get(key, 0) + 1
+
+    def _cache_fetched(self, sheet_name, df, fetched_at):
+        df = schemas.apply(sheet_name, df)
+        previous = self._cache.get(sheet_name)
+        if previous is None or not previous.equals(df):
+            self._bump(sheet_name)
+        else:
+            df = previous  # keep the same frame so indexes built on it stay valid
+        self._cache[sheet_name] = df
+        self._cache_time[sheet_name] = fetched_at
+        if self.mirror is not None:
+            self.mirror.touch(sheet_name)
+
+    def data_version(self, sheet_names, account_id=None):
+        # Cheap version token for conditional GETs: refreshes expired caches but does
+        # no DataFrame work when they are fresh
+        parts = [self.instance_id]
+        for name in sheet_names:
+            self._peek_sheet(name)
+            if account_id is None:
+                parts.append(self._sheet_version.get(name, 0))
+            else:
+                parts.append(self._sheet_epoch.get(name, 0))
+                parts.append(self._account_version.get((name, str(account_id)), 0))
+        return tuple(parts)
 
     def _load_sheet(self, sheet_name):
-        import time
+        # Mutable copy for the write paths (see schemas.writable)
+        return schemas.writable(self._peek_sheet(sheet_name))
+
+    def _attach_shared(self, sheet_name):
+        entry = self.shared.lookup(sheet_name)
+        if entry is None:
+            return None  # loader has not published it yet
+        seen = self._shared_seen.get(sheet_name)
+        if seen == entry['version']:
+            metrics.inc('flux_sheet_cache_total', sheet=sheet_name, result='hit')
+            return self._cache[sheet_name]
+        
+        # Used as published, without a schemas.apply that would copy it out of the mapping
+        self._cache[sheet_name] = self.shared.read(entry)
+        self._cache_time[sheet_name] = time.time()
+        self._shared_seen[sheet_name] = entry['version']
+        if seen is not None and entry['version'] == seen + 1 and entry['accounts'] is not None:
+            self._bump(sheet_name, entry['accounts'])
+        else:
+            self._bump(sheet_name)
+        metrics.inc('flux_sheet_cache_total', sheet=sheet_name, result='shared')
+        return self._cache[sheet_name]
+
+    def _peek_sheet(self, sheet_name):
+        # Cached frame without the defensive copy; callers must not mutate it
         current_time = time.time()
         
-        # Serve from fast local cache if under TTL
-        if sheet_name in self._cache and (current_time - self._cache_time.get(sheet_name, 0)) < self.CACHE_TTL:
-            return self._cache[sheet_name].copy()
+        if self.shared_role == 'worker':
+            df = self._attach_shared(sheet_name)
+            if df is not None:
+                return df
+        
+        # Serve from fast local cache if under TTL, or while Sheets still has writes of
+        # ours to catch up on (a fetch would bring back the sheet without them). With the
+        # mirror on, the cache never expires; the mirror keeps it current.
+        if sheet_name in self._cache and ((current_time - self._cache_time.get(sheet_name, 0)) < self.CACHE_TTL
+                                          or self.mirror is not None
+                                          or self.use_cloud and self.sheets.pending(sheet_name)):
+            metrics.inc('flux_sheet_cache_total', sheet=sheet_name, result='hit')
+            return self._cache[sheet_name]
+        metrics.inc('flux_sheet_cache_total', sheet=sheet_name,
+                    result='refresh' if sheet_name in self._cache else 'miss')
+        self._ensure_connected()
+        seen = self._cache_time.get(sheet_name)
+        with self._fetching.setdefault(sheet_name, threading.Lock()):
+            # Concurrent misses on one sheet share a single fetch
+            if sheet_name in self._cache and self._cache_time.get(sheet_name) != seen:
+                return self._cache[sheet_name]
+            if sheet_name not in self.startup["first_load"]:
+                try:
+                    return self._fetch_sheet(sheet_name, current_time)
+                finally:
+                    self._mark_first_load(sheet_name, current_time)
+            return self._fetch_sheet(sheet_name, current_time)
+
+    def _write_lock(self, sheet_name):
+        # Held by every write from reading the sheet to caching (and queueing) the new
+        # frame, so two writers never start from the same frame and drop each other's
+        # change. Reentrant: write paths call _append_rows/_save_sheet under it.
+        return self._writing.setdefault(sheet_name, threading.RLock())
 
+    def _mark_first_load(self, sheet_name, started):
+        self.startup["first_load"].setdefault(sheet_name, round(time.time() - started, 4))
+
+    def _fetch_sheet(self, sheet_name, current_time, use_mirror=True):
+        if self.mirror is not None and use_mirror:
+            # Last copy on disk first; the mirror's sync brings it up to date
+            df = self.mirror.load(sheet_name)
+            if df is not None:
+                self._cache_fetched(sheet_name, df, current_time)
+                metrics.inc('flux_sheet_cache_total', sheet=sheet_name, result='mirror')
+                return self._cache[sheet_name]
         if self.use_cloud:
             try:
-                ws = self.sh.worksheet(sheet_name)
-                data = ws.get_all_records()
-                if not data:
-                    headers = ws.row_values(1)
-                    df = pd.DataFrame(columns=headers)
-                else:
-                    df = pd.DataFrame(data)
+                with metrics.timer('flux_sheet_load_duration_seconds', sheet=sheet_name, source='sheets'):
+                    ws = self._worksheet(sheet_name)
+                    data = self._api('get_all_records', ws.get_all_records)
+                    if not data:
+                        headers = self._api('row_values', ws.row_values, 1)
+                        df = pd.DataFrame(columns=headers)
+                    else:
+                        df = pd.DataFrame(data)
                 
                 # Update Cache
-                self._cache[sheet_name] = df.copy()
-                self._cache_time[sheet_name] = current_time
-                return df
+                self._cache_fetched(sheet_name, df, current_time)
+                return self._cache[sheet_name]
                 
             except gspread.WorksheetNotFound:
+                 # Cached like any other result, so a sheet nobody has written yet does
+                 # not cost a metadata request on every read
+                 self._cache_fetched(sheet_name, pd.DataFrame(), current_time)
                  return pd.DataFrame() 
             except Exception as e:
-                print(f"Error loading sheet {sheet_name}: {e}")
+                self._worksheets.pop(sheet_name, None)
+                log.error("sheet_load_failed", sheet=sheet_name, error=str(e))
                 # Fallback to expired cache if Google API rate limits us
                 if sheet_name in self._cache:
-                    return self._cache[sheet_name].copy()
+                    metrics.inc('flux_sheet_cache_total', sheet=sheet_name, result='stale')
+                    return self._cache[sheet_name]
                 return pd.DataFrame() 
         else:
             try:
-                df = pd.read_excel(self.db_file, sheet_name=sheet_name, engine='openpyxl')
-                self._cache[sheet_name] = df.copy()
-                self._cache_time[sheet_name] = current_time
-                return df
+                df = None
+                if self.snapshots is not None:
+                    start = time.perf_counter()
+                    df = self.snapshots.load(sheet_name)
+                    if df is not None:
+                        metrics.observe('flux_sheet_load_duration_seconds', time.perf_counter() - start,
+                                        sheet=sheet_name, source='snapshot')
+                if df is None:
+                    df = self._read_workbook()[sheet_name]
+                self._cache_fetched(sheet_name, df, current_time)
+                return self._cache[sheet_name]
             except Exception:
                 if sheet_name in self._cache:
-                    return self._cache[sheet_name].copy()
+                    metrics.inc('flux_sheet_cache_total', sheet=sheet_name, result='stale')
+                    return self._cache[sheet_name]
                 return pd.DataFrame()
 
-    def _save_sheet(self, df, sheet_name):
-        import time
-        # Instantly update local cache whenever we save, ensuring it's never stale
-        self._cache[sheet_name] = df.copy()
+    def _read_workbook(self, use_snapshots=False):
+        # Every sheet of the offline workbook, refreshing the snapshots when it was parsed
+        if use_snapshots and self.snapshots is not None:
+            all_sheets = self.snapshots.load_all()
+            if all_sheets is not None:
+                return all_sheets
+        with self._workbook_lock:
+            with metrics.timer('flux_sheet_load_duration_seconds', sheet='*', source='excel'):
+                all_sheets = pd.read_excel(self.db_file, sheet_name=None, engine='openpyxl')
+            if self.snapshots is not None:
+                self.snapshots.rebuild(all_sheets)
+        return all_sheets
+
+    def _in_sheet_order(self, columns, row, fill=0):
+        # Row keyed in the sheet's column order (missing cells filled) with any new keys
+        # last, so it can go out through _append_rows without a full rewrite
+        ordered = {col: row.get(col, fill) for col in columns}
+        ordered.update((k, v) for k, v in row.items() if k not in ordered)
+        return ordered
+
+    def _set_cached(self, sheet_name, df, accounts, appended=0, pulled=False):
+        # Instantly update local cache whenever we save, ensuring it's never stale.
+        # `appended` says the change only added that many rows at the end; `pulled`
+        # that it came from the backend (the mirror).
+        typed = schemas.apply(sheet_name, df)
+        typed = typed if typed is not df else df.copy()
+        if self.wal is None:
+            self._cache[sheet_name] = typed
+        else:
+            with self.wal.lock:
+                seq = self.wal.log_change(sheet_name, self._cache.get(sheet_name), typed, accounts, appended, pulled)
+                self._cache[sheet_name] = typed
+            self.wal.wait(seq)
+            self.wal.maybe_snapshot(self._cache)
         self._cache_time[sheet_name] = time.time()
+        self._bump(sheet_name, accounts)
+        if self.mirror is not None:
+            self.mirror.touch(sheet_name)
+        if self.shared is not None:
+            self._shared_seen[sheet_name] = self.shared.publish(
+                sheet_name, typed, accounts, unsynced=self.shared_role == 'worker')
+        return typed
+
+    def _synced(self, sheet_name, through, seq=0):
+        # The backend now has the sheet's writes up to WAL record `seq`, and with
+        # `through` every write cached up to then: the shared loader may publish
+        # fetches again (shared_tables.py)
+        if self.wal is not None and seq:
+            self.wal.mark_synced(sheet_name, seq)
+        if self.shared_role == 'worker' and through is not None:
+            self.shared.mark_synced(sheet_name, through)
+
+    def _wal_seq(self, sheet_name):
+        # WAL record of the write being stored (called under the sheet's write lock)
+        return self.wal.last_seq(sheet_name) if self.wal is not None else 0
+
+    def _index(self, sheet_name, factory):
+        # (current frame, lookup structure from indexes.py over it); the structure is
+        # rebuilt when the frame is replaced
+        df = self._peek_sheet(sheet_name)
+        cached = self._indexes.get((sheet_name, factory))
+        if cached is None or cached[0] is not df:
+            cached = (df, factory(df))
+            self._indexes[(sheet_name, factory)] = cached
+        return cached
+
+    def _advance_index(self, sheet_name, factory, before, after, update):
+        # Carry an index across a write we made ourselves instead of rebuilding it
+        cached = self._indexes.get((sheet_name, factory))
+        if cached is not None and cached[0] is before:
+            update(cached[1])
+            self._indexes[(sheet_name, factory)] = (after, cached[1])
+
+    def _append_rows(self, sheet_name, rows, accounts=None):
+        # Append-only write: Sheets receives just the new rows, not the whole sheet.
+        # Falls back to a full save when the sheet is new or the columns change.
+        self._ensure_connected()
+        with self._write_lock(sheet_name):
+            current = self._peek_sheet(sheet_name)
+            new = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
+            if current.empty or list(current.columns) != list(new.columns) or not self.use_cloud:
+                merged = new if current.empty else pd.concat([schemas.writable(current), new], ignore_index=True)
+                self._save_sheet(merged, sheet_name, accounts)
+                return current, self._cache[sheet_name]
+        
+            merged = self._set_cached(sheet_name, schemas.append(sheet_name, current, new), accounts, len(new))
+            values = schemas.to_storage(sheet_name, schemas.apply(sheet_name, new)).fillna('').values.tolist()
+            self.sheets.enqueue(sheet_name, 'append', values, self._wal_seq(sheet_name))
+            return current, merged
+
+    def _save_sheet(self, df, sheet_name, accounts=None):
+        # `accounts` lists the AccountIDs whose rows changed (None = whole sheet)
+        self._ensure_connected()
+        # Returns the frame now cached
+        with self._write_lock(sheet_name):
+            typed = self._set_cached(sheet_name, df, accounts)
+            self._store_sheet(sheet_name, typed)
+        return typed
+
+    def _store_sheet(self, sheet_name, df):
+        # Whole-sheet write of a cached frame to the backend
+        df = schemas.to_storage(sheet_name, df)
         
         if self.use_cloud:
-            try:
-                try:
-                    ws = self.sh.worksheet(sheet_name)
-                    ws.clear()
-                except gspread.WorksheetNotFound:
-                    ws = self.sh.add_worksheet(title=sheet_name, rows=100, cols=20)
+            # Convert DataFrame to List of Lists
+            # Handle timestamps/NaNs
+            df = df.fillna('')
+            # Convert datetime objects to string
+            for col in df.select_dtypes(include=['datetime64']).columns:
+                df[col] = df[col].astype(str)
                 
-                # Convert DataFrame to List of Lists
-                # Handle timestamps/NaNs
-                df = df.fillna('')
-                # Convert datetime objects to string
-                for col in df.select_dtypes(include=['datetime64']).columns:
-                    df[col] = df[col].astype(str)
-                    
-                data = [df.columns.values.tolist()] + df.values.tolist()
-                ws.update(range_name='A1', values=data)
-            except Exception as e:
-                print(f"Error saving to Cloud: {e}")
+            data = [df.columns.values.tolist()] + df.values.tolist()
+            # Sent by the scheduler's flush thread (_write_sheet)
+            self.sheets.enqueue(sheet_name, 'save', data, self._wal_seq(sheet_name))
         else:
-            # Local Save Logic
-            all_sheets = pd.read_excel(self.db_file, sheet_name=None, engine='openpyxl')
-            all_sheets[sheet_name] = df
-            
-            with pd.ExcelWriter(self.db_file, engine='openpyxl') as writer:
-                for name, data in all_sheets.items():
-                    data.to_excel(writer, sheet_name=name, index=False)
+            # Local Save Logic. Saves of different sheets rewrite the same file, so
+            # they take turns.
+            start = time.perf_counter()
+            with self._workbook_lock:
+                all_sheets = self._read_workbook(use_snapshots=True)
+                all_sheets[sheet_name] = df
+                
+                with pd.ExcelWriter(self.db_file, engine='openpyxl') as writer:
+                    for name, data in all_sheets.items():
+                        data.to_excel(writer, sheet_name=name, index=False)
+                if self.snapshots is not None:
+                    self.snapshots.rebuild(all_sheets)
+            self._synced(sheet_name, time.time(), self._wal_seq(sheet_name))
+            metrics.inc('flux_sheet_save_bytes_total', os.path.getsize(self.db_file), sheet=sheet_name)
+            metrics.observe('flux_sheet_save_duration_seconds', time.perf_counter() - start, sheet=sheet_name)
+
+    def _write_sheet(self, sheet_name, kind, values):
+        # Flush of a queued write (possibly several coalesced), run by the scheduler
+        start = time.perf_counter()
+        try:
+            if kind == 'append':
+                ws = self._worksheet(sheet_name)
+                self._api('append_rows', ws.append_rows, values, value_input_option='RAW')
+            else:
+                try:
+                    ws = self._worksheet(sheet_name)
+                    self._api('clear', ws.clear)
+                except gspread.WorksheetNotFound:
+                    ws = self._api('add_worksheet', self.sh.add_worksheet, title=sheet_name, rows=100, cols=20)
+                    self._worksheets[sheet_name] = ws
+                self._api('update', ws.update, range_name='A1', values=values)
+            metrics.inc('flux_sheet_save_bytes_total', len(json.dumps(values, default=str)), sheet=sheet_name)
+        except Exception as e:
+            self._worksheets.pop(sheet_name, None)
+            log.error("sheet_append_failed" if kind == 'append' else "sheet_save_failed",
+                      sheet=sheet_name, error=str(e))
+            raise
+        finally:
+            metrics.observe('flux_sheet_save_duration_seconds', time.perf_counter() - start, sheet=sheet_name)
 
     # --- USER AUTHENTICATION ---
+    def _user_index(self):
+        # (Users frame, UserIndex), or (frame, None) before the sheet has any users
+        df = self._peek_sheet('Users')
+        if 'AccountID' not in df.columns: return df, None
+        return self._index('Users', UserIndex)
+
+    def allocate_account_id(self, users=None):
+        # Next AccountID from this worker's sequence block (id_allocator.py)
+        floor = max(users.max_number + 1, 1001) if users is not None else 1001
+        while True:
+            account_id = f"AC{self.ids.next(floor)}"
+            if users is None or users.get(account_id) is None:
+                return account_id
+
     def create_user(self, username, password, full_name, email, phone):
-        df = self._load_sheet('Users')
-        
-        # Check if username exists (Case Insensitive)
-        # Convert column to string and lower for comparison
-        if not df.empty and 'Username' in df.columns:
-            existing_users = df['Username'].astype(str).str.lower().values
-            if str(username).lower() in existing_users:
-                print(f"DEBUG: Username '{username}' already exists.")
+        with self._write_lock('Users'):
+            df, users = self._user_index()
+        
+            # Check if username exists (Case Insensitive), through the index
+            if users is not None and users.by_username(username) is not None:
+                log.debug("signup_username_taken", username=username)
                 return False, "Username already exists"
 
-        # Generate IDs
-        new_id = f"AC{len(df) + 1001}"
-        
-        import random
-        import string
-        from datetime import datetime
-        
-        # 11-digit random account number for uniqueness
-        acc_num = str(random.randint(10000000000, 99999999999))
-        
-        # 11-character unique IFSC: standard bank code FLUX + 0 + random 6 chars
-        suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        ifsc_code = f"FLUX0{suffix}"
-        
-        new_user = {
-            "AccountID": new_id,
-            "AccountNumber": acc_num,
-            "IFSC": ifsc_code,
-            "Username": username, # Store original casing for display
-            "Password": str(password), # Force String
-            "FullName": full_name,
-            "Email": email,
-            "Phone": str(phone), # Force string to prevent pandas type errors
-            "AccountBalance": 0.0, # Start with 0
-            "KYCStatus": "Not Started",
-            "CreatedAt": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
+            # Generate IDs
+            new_id = self.allocate_account_id(users)
         
-        print(f"DEBUG: Creating User: {new_user}")
+            import random
+            import string
+            from datetime import datetime
         
-        # Use simple concat, safe for empty dataframes
-        new_row_df = pd.DataFrame([new_user])
-        if df.empty:
-            df = new_row_df
-        else:
-            df = pd.concat([df, new_row_df], ignore_index=True)
-            
-        self._save_sheet(df, 'Users')
-        return True, new_user
+            # 11-digit random account number, redrawn until unused; the IFSC then only has
+            # to make the (number, IFSC) pair unique
+            while True:
+                acc_num = str(random.randint(10000000000, 99999999999))
+                if users is None or acc_num not in users.numbers:
+                    break
+        
+            # 11-character unique IFSC: standard bank code FLUX + 0 + random 6 chars
+            while True:
+                suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+                ifsc_code = f"FLUX0{suffix}"
+                if users is None or users.find(acc_num, ifsc_code) is None:
+                    break
+        
+            new_user = {
+                "AccountID": new_id,
+                "AccountNumber": acc_num,
+                "IFSC": ifsc_code,
+                "Username": username, # Store original casing for display
+                "Password": str(password), # Force String
+                "FullName": full_name,
+                "Email": email,
+                "Phone": str(phone), # Force string to prevent pandas type errors
+                "AccountBalance": 0.0, # Start with 0
+                "KYCStatus": "Not Started",
+                "CreatedAt": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+        
+            log.debug("user_created", user=new_user)
+        
+            # Only the new row goes to storage
+            row = self._in_sheet_order(df.columns, new_user, fill='')
+            before, after = self._append_rows('Users', [row], accounts=[new_id])
+            self._advance_index('Users', UserIndex, before, after,
+                                lambda index: index.append(new_id, acc_num, ifsc_code, username))
+            self._emit('user_created', {k: v for k, v in new_user.items() if k != 'Password'})
+            return True, new_user
 
     def get_user(self, username):
-        df = self._load_sheet('Users')
+        df, users = self._user_index()
         
         # Check if DB is completely empty (no columns)
-        if df.empty or 'Username' not in df.columns:
-            print(f"DEBUG: Login Failed - Database empty or missing Username column.")
+        if users is None or 'Username' not in df.columns:
+            log.debug("get_user_empty_table")
             return None
         
-        # Case Insensitive Lookup
-        # We look for a row where Lower(Username) == Lower(Input)
-        # But return the actual row data
-        
-        # Safe string conversion
-        df['Username_Lower'] = df['Username'].astype(str).str.lower()
-        search_key = str(username).lower()
-        
-        user_row = df[df['Username_Lower'] == search_key]
-        
-        if user_row.empty:
-            print(f"DEBUG: Login Failed - Username '{username}' not found.")
+        # Case Insensitive Lookup through the index, returning the actual row data
+        pos = users.by_username(username)
+        if pos is None:
+            log.debug("get_user_not_found", username=username)
             return None
             
-        print(f"DEBUG: User Found: {user_row.iloc[0]['Username']}")
-        return user_row.iloc[0].to_dict()
+        log.debug("get_user_found", username=username)
+        return schemas.to_records('Users', df.iloc[[pos]])[0]
 
     def get_user_by_id(self, account_id):
-        df = self._load_sheet('Users')
-        user = df[df['AccountID'] == account_id]
-        if user.empty:
+        df, users = self._user_index()
+        pos = users.get(account_id) if users is not None else None
+        if pos is None:
             return None
-        return user.iloc[0].to_dict()
+        return schemas.to_records('Users', df.iloc[[pos]])[0]
 
     def update_balance(self, account_id, amount):
         # Amount can be negative (withdrawal) or positive (deposit)
-        df = self._load_sheet('Users')
-        
-        if account_id not in df['AccountID'].values:
-            return False, "User not found"
-            
-        index = df[df['AccountID'] == account_id].index[0]
-        current_balance = df.at[index, 'AccountBalance']
-        
-        if current_balance + amount < 0:
-            return False, "Insufficient funds"
-            
-        df.at[index, 'AccountBalance'] = current_balance + amount
-        self._save_sheet(df, 'Users')
+        with self._write_lock('Users'):
+            df = self._load_sheet('Users')
+
+            if account_id not in df['AccountID'].values:
+                return False, "User not found"
+
+            index = df[df['AccountID'] == account_id].index[0]
+            current_balance = df.at[index, 'AccountBalance']
+
+            if current_balance + amount < 0:
+                return False, "Insufficient funds"
+
+            df.at[index, 'AccountBalance'] = current_balance + amount
+            self._save_sheet(df, 'Users', accounts=[account_id])
+        self._emit('balance', {"AccountID": account_id, "delta": amount,
+                               "balance": float(df.at[index, 'AccountBalance'])})
         return True, float(df.at[index, 'AccountBalance'])
 
     def validate_account(self, account_number, ifsc):
-        df = self._load_sheet('Users')
+        df = self._peek_sheet('Users')
         if 'AccountNumber' not in df.columns or 'IFSC' not in df.columns:
             return False, "System uninitialized for this check."
             
-        # Clean inputs
-        acc_str = str(account_number).strip().split('.')[0]
-        ifsc_str = str(ifsc).strip().upper()
-        
-        # Clean Database Columns for matching
-        df_acc = df['AccountNumber'].astype(str).str.strip().str.split('.').str[0]
-        df_ifsc = df['IFSC'].astype(str).str.strip().str.upper()
-            
-        match = df[(df_acc == acc_str) & (df_ifsc == ifsc_str)]
-                   
-        if match.empty:
+        users_df, users = self._index('Users', UserIndex)
+        pos = users.find(account_number, ifsc)
+        if pos is None:
             return False, "Invalid Account Number or IFSC Code."
             
-        return True, match.iloc[0]['AccountID']
+        return True, users_df['AccountID'].iat[pos]
 
-    def update_password(self, account_id, old_password, new_password):
-        df = self._load_sheet('Users')
+    def apply_transfers(self, sender_id, legs, atomic=True):
+        # Multi-recipient transfer: legs are {"recipient_account", "recipient_ifsc", "amount"}.
+        # Every leg is validated through UserIndex, then all accepted debits and credits
+        # go to Users in one write. atomic=True applies all legs or none; otherwise each
+        # valid leg is applied in order while the sender's balance covers it. The Users
+        # write lock is held from validation to the save, so no other balance change
+        # can land in between.
+        # Returns (per-leg results, sender balance after), or (None, error message).
+        with self._write_lock('Users'):
+            if 'AccountID' not in self._peek_sheet('Users').columns: return None, "User not found"
+            before, users = self._index('Users', UserIndex)
+            sender = users.get(sender_id)
+            if sender is None: return None, "User not found"
         
-        if account_id not in df['AccountID'].values:
-            return False, "User not found"
-            
-        index = df[df['AccountID'] == account_id].index[0]
-        stored_password = str(df.at[index, 'Password'])
+            results, positions = [], []
+            for leg in legs:
+                try:
+                    amount = float(leg.get('amount'))
+                except (AttributeError, TypeError, ValueError):
+                    amount = float('nan')
+                pos = users.find(leg.get('recipient_account'), leg.get('recipient_ifsc')) if amount > 0 else None
+                if not amount > 0:
+                    results.append({"status": "error", "message": "Invalid amount"})
+                elif pos is None:
+                    results.append({"status": "error", "message": "Invalid Account Number or IFSC Code."})
+                elif pos == sender:
+                    results.append({"status": "error", "message": "Cannot transfer to the sending account"})
+                else:
+                    results.append({"status": "success", "message": "Transferred", "amount": amount,
+                                    "recipient_id": before['AccountID'].iat[pos]})
+                positions.append(pos)
         
-        if stored_password != str(old_password):
-            return False, "Incorrect current password"
-            
-        df.at[index, 'Password'] = str(new_password)
-        self._save_sheet(df, 'Users')
-        return True, "Password updated successfully"
+            balance = float(before['AccountBalance'].iat[sender])
+            valid = [i for i, r in enumerate(results) if r['status'] == 'success']
+            if atomic:
+                total = sum(results[i]['amount'] for i in valid)
+                failed = len(valid) < len(results) or total > balance
+                if failed:
+                    reason = "Insufficient funds" if len(valid) == len(results) else "Batch rejected: another transfer failed"
+                    for i in valid:
+                        results[i].update(status="error", message=reason)
+                    return results, balance
+            else:
+                remaining = balance
+                for i in valid:
+                    if results[i]['amount'] > remaining:
+                        results[i].update(status="error", message="Insufficient funds")
+                    else:
+                        remaining -= results[i]['amount']
+        
+            accepted = [i for i in valid if results[i]['status'] == 'success']
+            if not accepted:
+                return results, balance
+            deltas = pd.Series([results[i]['amount'] for i in accepted], index=[positions[i] for i in accepted])
+            deltas = deltas.groupby(level=0).sum()
+            deltas.loc[sender] = -deltas.sum()
+            df = schemas.writable(before)
+            col = df.columns.get_loc('AccountBalance')
+            df.iloc[deltas.index, col] = df['AccountBalance'].iloc[deltas.index].to_numpy() + deltas.to_numpy()
+            accounts = before['AccountID'].iloc[deltas.index].tolist()
+            self._save_sheet(df, 'Users', accounts=accounts)
+            # Same rows in the same order, so the positions carry over
+            after = self._peek_sheet('Users')
+            self._advance_index('Users', UserIndex, before, after, lambda index: None)
+            for account_id, pos, delta in zip(accounts, deltas.index, deltas):
+                self._emit('balance', {"AccountID": account_id, "delta": float(delta),
+                                       "balance": float(after['AccountBalance'].iat[pos])})
+            return results, float(after['AccountBalance'].iat[sender])
+
+    def update_password(self, account_id, old_password, new_password):
+        with self._write_lock('Users'):
+            df = self._load_sheet('Users')
+
+            if account_id not in df['AccountID'].values:
+                return False, "User not found"
+
+            index = df[df['AccountID'] == account_id].index[0]
+            stored_password = str(df.at[index, 'Password'])
+
+            if stored_password != str(old_password):
+                return False, "Incorrect current password"
+
+            df.at[index, 'Password'] = str(new_password)
+            self._save_sheet(df, 'Users', accounts=[account_id])
+            return True, "Password updated successfully"
 
     # --- LOGGING & RISK ---
+    # Columns only ML_Features keeps; ActivityLogs drops them
+    ML_ONLY_COLUMNS = ['FailedLoginCount', 'BeneficiaryAdded', 'account', 'ClickRate', 'PagesVisited', 
+                       'LoginHour', 'RapidTransactions', 'NewDeviceLogin', 'PasswordChanged', 'RiskLabel']
+    ML_COLUMNS = [
+        'AccountBalance', 'KYCStatus', 'TransactionType', 'TransactionAmount', 
+        'SessionDuration', 'LoginHour', 'FailedLoginCount', 'NewDeviceLogin', 
+        'PasswordChanged', 'Channel', 'PagesVisited', 'ClickRate', 
+        'RapidTransactions', 'BeneficiaryAdded', 'LargeTransaction', 
+        'DeviceTrustScore', 'CyberRiskScore'
+    ]
+
     def log_activity(self, account_id, activity_data, risk_score):
         # Default UI Values for missing ML metrics requested by User
         activity_data.setdefault('Channel', 'Web')
@@ -321,7 +965,7 @@ class DatabaseManager:
         # 0. Early Risk Escalation for Failed Logins so ActivityLogs gets the correct score
         if activity_data.get('FailedLoginCount', 0) > 0:
             try:
-                temp_ml = self._load_sheet('ML_Features')
+                temp_ml = self._peek_sheet('ML_Features')
                 if not temp_ml.empty:
                     mask = (temp_ml['AccountID'] == account_id) & (temp_ml['LoginHour'] == current_time.hour)
                     if mask.any():
@@ -339,266 +983,472 @@ class DatabaseManager:
             except Exception:
                 pass
 
-        df = self._load_sheet('ActivityLogs')
+        with self._write_lock('ActivityLogs'):
+            before = self._peek_sheet('ActivityLogs')
+            df = schemas.writable(before)
         
-        new_log = {
-            "LogID": f"LOG-{len(df) + 1}",
-            "AccountID": account_id,
-            "Timestamp": current_time.strftime("%Y-%m-%d %H:%M:%S"),
-            "CyberRiskScore": risk_score
-        }
+            new_log = {
+                "LogID": f"LOG-{len(df) + self.archive.total_rows() + 1}",
+                "AccountID": account_id,
+                "Timestamp": current_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "CyberRiskScore": risk_score
+            }
         
-        # Merge basic activity data (SessionID, Amount, etc.)
-        new_log.update(activity_data)
+            # Merge basic activity data (SessionID, Amount, etc.)
+            new_log.update(activity_data)
         
-        # Filter out purely internal ML metrics. User explicitly requested Channel, SessionDuration, DeviceTrustScore to be kept.
-        ml_only_cols = ['FailedLoginCount', 'BeneficiaryAdded', 'account', 'ClickRate', 'PagesVisited', 
-                        'LoginHour', 'RapidTransactions', 'NewDeviceLogin', 'PasswordChanged', 'RiskLabel']
-        activity_row = {k: v for k, v in new_log.items() if k not in ml_only_cols}
+            # Filter out purely internal ML metrics. User explicitly requested Channel, SessionDuration, DeviceTrustScore to be kept.
+            ml_only_cols = self.ML_ONLY_COLUMNS
+            activity_row = {k: v for k, v in new_log.items() if k not in ml_only_cols}
         
-        # Fill missing columns with 0 or default to verify schema compliance
-        for col in df.columns:
-            if col not in activity_row:
-                activity_row[col] = 0
+            # Fill missing columns with 0 or default to verify schema compliance
+            for col in df.columns:
+                if col not in activity_row:
+                    activity_row[col] = 0
                 
-        df = pd.concat([df, pd.DataFrame([activity_row])], ignore_index=True)
+            columns_before = list(df.columns)
+            df = pd.concat([df, pd.DataFrame([activity_row])], ignore_index=True)
         
-        # Extra safety measure: drop rogue columns if the DataFrame inherited them
-        for drop_col in ml_only_cols:
-            if drop_col in df.columns:
-                df = df.drop(columns=[drop_col])
+            # Extra safety measure: drop rogue columns if the DataFrame inherited them
+            for drop_col in ml_only_cols:
+                if drop_col in df.columns:
+                    df = df.drop(columns=[drop_col])
                 
-        self._save_sheet(df, 'ActivityLogs')
+            # A schema change touches every account's rows
+            touched = [account_id] if list(df.columns) == columns_before else None
+            after = self._save_sheet(df, 'ActivityLogs', accounts=touched)
+            self._advance_profiles(before, after, 1)
+        self._emit('activity', activity_row)
 
         # --- Write targeted subset to ML_Features ---
         try:
-            ml_df = self._load_sheet('ML_Features')
-            ml_columns = [
-                'AccountBalance', 'KYCStatus', 'TransactionType', 'TransactionAmount', 
-                'SessionDuration', 'LoginHour', 'FailedLoginCount', 'NewDeviceLogin', 
-                'PasswordChanged', 'Channel', 'PagesVisited', 'ClickRate', 
-                'RapidTransactions', 'BeneficiaryAdded', 'LargeTransaction', 
-                'DeviceTrustScore', 'CyberRiskScore'
-            ]
-            
-            # Fetch user context for base features
-            user_info = self.get_user_by_id(account_id) or {}
+            with self._write_lock('ML_Features'):
+                ml_df = self._load_sheet('ML_Features')
             
-            ml_row = {}
-            for col in ml_columns:
-                if col in new_log:
-                    ml_row[col] = new_log[col]
-                elif col == 'TransactionAmount' and 'TransactionAmount' not in new_log:
-                    ml_row[col] = 0
-                elif col == 'TransactionType' and 'TransactionType' not in new_log:
-                    ml_row[col] = 'Transfer' # Default safe fallback
-                elif col == 'AccountBalance':
-                    ml_row[col] = user_info.get('AccountBalance', 0)
-                elif col == 'KYCStatus':
-                    ml_row[col] = user_info.get('KYCStatus', 'Verified') # Cannot predict effectively on '0'
-                elif col == 'LargeTransaction':
-                    amt = new_log.get('TransactionAmount', 0)
-                    ml_row[col] = 1 if amt > 100000 else 0
-                else:
-                    ml_row[col] = 0 # Fallback 
-            
-            # Explicitly set LoginHour based on correct live time
-            ist = pytz.timezone('Asia/Kolkata')
-            now_dt = datetime.now(ist)
-            ml_row['LoginHour'] = now_dt.hour
-            ml_row['AccountID'] = account_id # CRITICAL: Add AccountID so it can be matched later
+                # Fetch user context for base features
+                user_info = self.get_user_by_id(account_id) or {}
+                ml_row = self._ml_row(account_id, new_log, user_info)
             
-            # --- ROW UPDATING LOGIC FOR FAILED LOGINS ---
-            # If this is a failed login, check if a row for this AccountID and LoginHour exists
-            if ml_row.get('FailedLoginCount', 0) > 0 and not ml_df.empty:
-                mask = (ml_df['AccountID'] == account_id) & (ml_df['LoginHour'] == ml_row['LoginHour'])
-                if mask.any():
-                    idx = ml_df[mask].index[-1]
-                    # Update existing row
-                    total_fails = ml_df.at[idx, 'FailedLoginCount'] + ml_row['FailedLoginCount']
-                    ml_df.at[idx, 'FailedLoginCount'] = total_fails
+                # --- ROW UPDATING LOGIC FOR FAILED LOGINS ---
+                # If this is a failed login, check if a row for this AccountID and LoginHour exists
+                if ml_row.get('FailedLoginCount', 0) > 0 and not ml_df.empty:
+                    mask = (ml_df['AccountID'] == account_id) & (ml_df['LoginHour'] == ml_row['LoginHour'])
+                    if mask.any():
+                        idx = ml_df[mask].index[-1]
+                        # Update existing row
+                        total_fails = ml_df.at[idx, 'FailedLoginCount'] + ml_row['FailedLoginCount']
+                        ml_df.at[idx, 'FailedLoginCount'] = total_fails
                     
-                    # Risk score was escalated early in method so we just write it directly:
-                    ml_df.at[idx, 'CyberRiskScore'] = max(ml_df.at[idx, 'CyberRiskScore'], risk_score)
+                        # Risk score was escalated early in method so we just write it directly:
+                        ml_df.at[idx, 'CyberRiskScore'] = max(ml_df.at[idx, 'CyberRiskScore'], risk_score)
                     
-                    print(f"DEBUG: Updated existing ML row for {account_id} (Fails: {total_fails}, New Score: {ml_df.at[idx, 'CyberRiskScore']})")
+                        log.debug("ml_row_updated", account_id=account_id, failed_logins=total_fails,
+                                  risk_score=ml_df.at[idx, 'CyberRiskScore'])
+                    else:
+                        ml_df = pd.concat([ml_df, pd.DataFrame([ml_row])], ignore_index=True)
                 else:
                     ml_df = pd.concat([ml_df, pd.DataFrame([ml_row])], ignore_index=True)
-            else:
-                ml_df = pd.concat([ml_df, pd.DataFrame([ml_row])], ignore_index=True)
                 
-            self._save_sheet(ml_df, 'ML_Features')
+                self._save_sheet(ml_df, 'ML_Features', accounts=[account_id])
         except Exception as e:
-            print(f"DEBUG: Failed to write to ML_Features: {e}")
+            log.warning("ml_features_write_failed", account_id=account_id, error=str(e))
 
         return True
 
+    # --- USER PROFILES ---
+    # Per-account aggregates (indexes.ActivityProfiles) kept in step with log_activity,
+    # so the admin user view never rescans a user's history. Built on first read, not
+    # by the transfer path: the mock risk rules only look at the amount.
+    def _build_profiles(self, df):
+        return ActivityProfiles(chain([df], self.archive.frames()))
+
+    def _advance_profiles(self, before, after, rows):
+        # `after` is the frame the write that added the last `rows` rows cached
+        records = schemas.to_records('ActivityLogs', after.iloc[len(after) - rows:])
+
+        def update(profiles):
+            for record in records:
+                profiles.add(record)
+        self._advance_index('ActivityLogs', self._build_profiles, before, after, update)
+
+    def get_risk_features(self, account_id):
+        # Behavioral inputs for risk scoring; aggregates only, no history read
+        profile = self._index('ActivityLogs', self._build_profiles)[1].profile(account_id)
+        count = profile['transfer_count']
+        return {
+            "activity_count": profile['activity_count'],
+            "transfer_count": count,
+            "transfer_mean": profile['transfer_total'] / count if count else 0.0,
+            "max_risk": profile['max_risk'],
+            "high_risk_count": profile['high_risk_count'],
+            "beneficiaries": self.count_beneficiaries(account_id),
+        }
+
+    def get_user_profile(self, account_id):
+        profile = self._index('ActivityLogs', self._build_profiles)[1].profile(account_id)
+        if profile['recent'] is None:
+            profile['recent'] = deque(self.get_recent_activity(account_id, ActivityProfiles.RECENT),
+                                      maxlen=ActivityProfiles.RECENT)
+        return dict(profile, **self.get_risk_features(account_id),
+                    transfer_total=profile['transfer_total'], recent=list(profile['recent']))
+
+    def _ml_row(self, account_id, new_log, user_info):
+        ml_row = {}
+        for col in self.ML_COLUMNS:
+            if col in new_log:
+                ml_row[col] = new_log[col]
+            elif col == 'TransactionAmount' and 'TransactionAmount' not in new_log:
+                ml_row[col] = 0
+            elif col == 'TransactionType' and 'TransactionType' not in new_log:
+                ml_row[col] = 'Transfer' # Default safe fallback
+            elif col == 'AccountBalance':
+                ml_row[col] = user_info.get('AccountBalance', 0)
+            elif col == 'KYCStatus':
+                ml_row[col] = user_info.get('KYCStatus', 'Verified') # Cannot predict effectively on '0'
+            elif col == 'LargeTransaction':
+                amt = new_log.get('TransactionAmount', 0)
+                ml_row[col] = 1 if amt > 100000 else 0
+            else:
+                ml_row[col] = 0 # Fallback 
+        
+        # Explicitly set LoginHour based on correct live time
+        ist = pytz.timezone('Asia/Kolkata')
+        now_dt = datetime.now(ist)
+        ml_row['LoginHour'] = now_dt.hour
+        ml_row['AccountID'] = account_id # CRITICAL: Add AccountID so it can be matched later
+        return ml_row
+
+    def log_activities(self, entries):
+        # Batch form of log_activity for (account_id, activity_data, risk_score) entries:
+        # one ActivityLogs append and one ML_Features append for all of them. No
+        # failed-login escalation, so not for login events.
+        if not entries: return []
+        ist = pytz.timezone('Asia/Kolkata')
+        now = datetime.now(ist).strftime("%Y-%m-%d %H:%M:%S")
+        with self._write_lock('ActivityLogs'):
+            before = self._peek_sheet('ActivityLogs')
+            first = len(before) + self.archive.total_rows() + 1
+            users_df, users = self._user_index()
+            ml_columns = self._peek_sheet('ML_Features').columns
+        
+            rows, ml_rows = [], []
+            for i, (account_id, activity_data, risk_score) in enumerate(entries):
+                activity_data.setdefault('Channel', 'Web')
+                activity_data.setdefault('SessionDuration', 120)
+                activity_data.setdefault('DeviceTrustScore', 98.5)
+                new_log = {
+                    "LogID": f"LOG-{first + i}",
+                    "AccountID": account_id,
+                    "Timestamp": now,
+                    "CyberRiskScore": risk_score
+                }
+                new_log.update(activity_data)
+                activity_row = {k: v for k, v in new_log.items() if k not in self.ML_ONLY_COLUMNS}
+                rows.append(self._in_sheet_order(before.columns, activity_row))
+            
+                pos = users.get(account_id) if users is not None else None
+                user_info = schemas.to_records('Users', users_df.iloc[[pos]])[0] if pos is not None else {}
+                ml_rows.append(self._in_sheet_order(ml_columns, self._ml_row(account_id, new_log, user_info)))
+        
+            accounts = list(dict.fromkeys(e[0] for e in entries))
+            before, after = self._append_rows('ActivityLogs', rows, accounts=accounts)
+            self._advance_profiles(before, after, len(rows))
+        for row in rows:
+            self._emit('activity', row)
+        try:
+            self._append_rows('ML_Features', ml_rows, accounts=accounts)
+        except Exception as e:
+            log.warning("ml_features_write_failed", accounts=len(accounts), error=str(e))
+        return rows
+
     def get_recent_activity(self, account_id, limit=5):
-        df = self._load_sheet('ActivityLogs')
-        if 'AccountID' not in df.columns: return [] # Handle empty case
-        user_logs = df[df['AccountID'] == account_id].sort_values(by='Timestamp', ascending=False)
-        return user_logs.head(limit).to_dict('records')
+        user_logs = self._activity(account_id, limit=limit)
+        if user_logs.empty: return [] # Handle empty case
+        return schemas.to_records('ActivityLogs', user_logs)
 
-    def get_user_transactions(self, account_id):
-        df = self._load_sheet('ActivityLogs')
-        if 'AccountID' not in df.columns: return []
-        user_logs = df[df['AccountID'] == account_id].sort_values(by='Timestamp', ascending=False)
+    def get_user_transactions(self, account_id, as_frame=False):
+        # as_frame=True returns the DataFrame for frame_json instead of a list of dicts
+        user_logs = self._activity(account_id)
+        if 'AccountID' not in user_logs.columns: return pd.DataFrame() if as_frame else []
         
         # Ensure optional columns exist for clean frontend
         if 'Description' not in user_logs.columns: user_logs['Description'] = 'Transaction'
         if 'TransactionType' not in user_logs.columns: user_logs['TransactionType'] = 'Debit' # Default hack for old data
         
-        return user_logs.to_dict('records')
+        return user_logs if as_frame else schemas.to_records('ActivityLogs', user_logs)
+
+    # --- AUDIT LOG ---
+    # Admin and system actions go to the append-only AuditLogs sheet as they happen,
+    # indexed by account, action and time (indexes.AuditIndex)
+    def log_audit(self, action, account_id, description, admin_id='ADM-001'):
+        return self.log_audit_many([(action, account_id, description)], admin_id)[0]
+
+    def log_audit_many(self, entries, admin_id='ADM-001'):
+        # entries: (action, account_id, description) tuples, written as one append
+        if not entries: return []
+        ist = pytz.timezone('Asia/Kolkata')
+        now = datetime.now(ist).strftime("%Y-%m-%d %H:%M:%S")
+        with self._write_lock('AuditLogs'):
+            first = len(self._peek_sheet('AuditLogs')) + 1
+            rows = [{
+                "AuditID": f"AUD-{first + i}",
+                "Timestamp": now,
+                "AdminID": admin_id,
+                "Action": action,
+                "AccountID": account_id,
+                "Description": description
+            } for i, (action, account_id, description) in enumerate(entries)]
+            before, after = self._append_rows('AuditLogs', rows, accounts=[e[1] for e in entries])
+            ts = after['Timestamp'].iat[-1]
+
+            def update(index):
+                for action, account_id, _ in entries:
+                    index.append(account_id, action, ts)
+            self._advance_index('AuditLogs', AuditIndex, before, after, update)
+        return rows
+
+    def log_system_events(self, events):
+        # Admin-side ActivityLogs rows, (account_id, description, risk_score), as one append;
+        # unlike log_activity they are not mirrored into ML_Features
+        if not events: return []
+        ist = pytz.timezone('Asia/Kolkata')
+        now = datetime.now(ist).strftime("%Y-%m-%d %H:%M:%S")
+        with self._write_lock('ActivityLogs'):
+            df = self._peek_sheet('ActivityLogs')
+            first = len(df) + self.archive.total_rows() + 1
+            rows = []
+            for i, (account_id, description, risk_score) in enumerate(events):
+                row = {
+                    "LogID": f"LOG-{first + i}",
+                    "AccountID": account_id,
+                    "Timestamp": now,
+                    "CyberRiskScore": risk_score,
+                    "Description": description,
+                    "TransactionType": "System",
+                    "Channel": "Web",
+                    "SessionDuration": 120,
+                    "DeviceTrustScore": 98.5
+                }
+                rows.append(self._in_sheet_order(df.columns, row))
+            before, after = self._append_rows('ActivityLogs', rows, accounts=[e[0] for e in events])
+            self._advance_profiles(before, after, len(rows))
+        for row in rows:
+            self._emit('activity', row)
+        return rows
+
+    def backfill_audit_logs(self):
+        # One-off migration: copy the admin rows that used to be found by scanning
+        # ActivityLogs descriptions into AuditLogs
+        with self._write_lock('AuditLogs'):
+            if not self._peek_sheet('AuditLogs').empty:
+                return 0
+            found = self._activity(
+                where=lambda df: df['Description'].str.contains('Admin|Blocked|Dismissed', na=False, case=False))
+            if found.empty:
+                return 0
+            found = found.sort_values(by='Timestamp').reset_index(drop=True)
+            parsed = found['Description'].astype(str).str.extract(
+                r'Admin \((?P<admin>[^)]+)\) (?P<action>.+?) (?P<kind>user|KYC for) ')
+            kyc = parsed['kind'] == 'KYC for'
+            parsed.loc[kyc, 'action'] = 'KYC ' + parsed.loc[kyc, 'action'].str.capitalize()
+            audit = pd.DataFrame({
+                "AuditID": [f"AUD-{i + 1}" for i in range(len(found))],
+                "Timestamp": found['Timestamp'],
+                "AdminID": parsed['admin'].fillna('ADM-001'),
+                "Action": parsed['action'].fillna('System'),
+                "AccountID": found['AccountID'].astype(object),
+                "Description": found['Description'].astype(object)
+            })
+            self._save_sheet(audit, 'AuditLogs')
+        return len(audit)
 
-    def get_audit_logs(self):
-        # In a real app, this would be a separate 'AuditLogs' sheet.
-        # For now, we'll filter 'ActivityLogs' for Admin actions (if any)
-        # OR just return high-level system events.
-        # Let's create a visual mock from recent high-risk events for now.
-        df = self._load_sheet('ActivityLogs')
-        admin_actions = df[df['Description'].str.contains('Admin|Blocked|Dismissed', na=False, case=False)]
-        return admin_actions.sort_values(by='Timestamp', ascending=False).to_dict('records')
+    def query_audit_logs(self, account_id=None, action=None, since=None, until=None, offset=0, limit=None):
+        # (newest-first page as a DataFrame, total matches); cost follows the page size.
+        # `since`/`until` are timestamps (the route validates user input)
+        if 'Action' not in self._peek_sheet('AuditLogs').columns:
+            return pd.DataFrame(), 0
+        df, index = self._index('AuditLogs', AuditIndex)
+        since = pd.Timestamp(since) if since else None
+        until = pd.Timestamp(until) if until else None
+        positions, total = index.query(len(df), account_id, action, since, until, offset, limit)
+        return df.iloc[positions], total
+
+    def get_audit_logs(self, as_frame=False, **filters):
+        page, _ = self.query_audit_logs(**filters)
+        return page if as_frame else schemas.to_records('AuditLogs', page)
 
     # --- ADMIN ---
-    def get_all_users(self):
-        return self._load_sheet('Users').to_dict('records')
+    def get_all_users(self, as_frame=False):
+        df = self._peek_sheet('Users')
+        return df if as_frame else schemas.to_records('Users', df)
     
     def get_high_risk_alerts(self):
-        df = self._load_sheet('ActivityLogs')
         # Filter for Score > 75 (High Risk)
-        alerts = df[df['CyberRiskScore'] > 75].sort_values(by='Timestamp', ascending=False)
-        return alerts.to_dict('records')
+        alerts = self._activity(where=lambda df: df['CyberRiskScore'] > 75)
+        return schemas.to_records('ActivityLogs', alerts)
 
-    def get_all_transactions(self, limit=50):
-        df = self._load_sheet('ActivityLogs')
-        if df.empty or 'Timestamp' not in df.columns:
-            return []
-        # Sort by latest
-        tx = df.sort_values(by='Timestamp', ascending=False).head(limit)
+    def get_all_transactions(self, limit=50, as_frame=False):
+        tx = self._activity(limit=limit)
+        if tx.empty or 'Timestamp' not in tx.columns:
+            return pd.DataFrame() if as_frame else []
+        # Latest first; a small plain copy callers may annotate
+        tx = schemas.writable(tx)
         
         # Ensure calculated columns exist
         if 'Description' not in tx.columns: tx['Description'] = 'Transaction'
         if 'CyberRiskScore' not in tx.columns: tx['CyberRiskScore'] = 0
         
-        return tx.to_dict('records')
+        return tx if as_frame else schemas.to_records('ActivityLogs', tx)
 
     # --- BENEFICIARIES ---
     def add_beneficiary(self, account_id, name, account_number, ifsc, nickname):
-        df = self._load_sheet('Beneficiaries')
-        
-        # Check if already exists for this user
-        if 'AccountID' in df.columns and 'AccountNumber' in df.columns:
-            exists = df[(df['AccountID'] == account_id) & (df['AccountNumber'] == account_number)]
-            if not exists.empty:
+        with self._write_lock('Beneficiaries'):
+            # Check if already exists for this user
+            index = self._beneficiary_index()[1]
+            if index is not None and index.exists(account_id, account_number):
                 return False, "Beneficiary already exists"
             
-        new_ben = {
-            "AccountID": account_id,
-            "BeneficiaryName": name,
-            "AccountNumber": account_number,
-            "IFSC": ifsc,
-            "Nickname": nickname
-        }
+            new_ben = {
+                "AccountID": account_id,
+                "BeneficiaryName": name,
+                "AccountNumber": account_number,
+                "IFSC": ifsc,
+                "Nickname": nickname
+            }
         
-        df = pd.concat([df, pd.DataFrame([new_ben])], ignore_index=True)
-        self._save_sheet(df, 'Beneficiaries')
+            before, after = self._append_rows('Beneficiaries', [new_ben], accounts=[account_id])
+            self._advance_index('Beneficiaries', BeneficiaryIndex, before, after,
+                                lambda index: index.append(account_id, account_number))
         return True, "Beneficiary Added"
 
+    def _beneficiary_index(self):
+        df = self._peek_sheet('Beneficiaries')
+        if 'AccountID' not in df.columns or 'AccountNumber' not in df.columns: return df, None
+        return self._index('Beneficiaries', BeneficiaryIndex)
+
     def get_beneficiaries(self, account_id):
-        df = self._load_sheet('Beneficiaries')
-        if 'AccountID' not in df.columns: return []
-        return df[df['AccountID'] == account_id].to_dict('records')
+        df, index = self._beneficiary_index()
+        if index is None: return []
+        return schemas.to_records('Beneficiaries', df.iloc[index.for_account(account_id)])
+
+    def count_beneficiaries(self, account_id):
+        index = self._beneficiary_index()[1]
+        return index.count(account_id) if index is not None else 0
 
     # --- KYC ---
+    # KYCRequests is read through indexes.KycIndex (status queue + per-account positions)
+    # and user names are joined through indexes.UserIndex
     def submit_kyc(self, account_id, doc_type, doc_number):
-        df = self._load_sheet('KYCRequests')
+        with self._write_lock('KYCRequests'):
+            kyc_df = self._peek_sheet('KYCRequests')
         
-        # Check if pending request exists
-        pending = df[(df['AccountID'] == account_id) & (df['Status'] == 'Pending')]
-        if not pending.empty:
-            return False, "KYC Verification already in progress"
+            # Check if pending request exists
+            if 'AccountID' in kyc_df.columns and self._index('KYCRequests', KycIndex)[1].for_account(account_id, 'Pending'):
+                return False, "KYC Verification already in progress"
             
-        new_request = {
-            "RequestID": f"KYC-{len(df) + 1001}",
-            "AccountID": account_id,
-            "DocumentType": doc_type,
-            "DocumentNumber": doc_number,
-            "Status": "Pending",
-            "SubmissionDate": datetime.now().strftime("%Y-%m-%d"),
-            "AdminComments": ""
-        }
+            new_request = {
+                "RequestID": f"KYC-{len(kyc_df) + 1001}",
+                "AccountID": account_id,
+                "DocumentType": doc_type,
+                "DocumentNumber": doc_number,
+                "Status": "Pending",
+                "SubmissionDate": datetime.now().strftime("%Y-%m-%d"),
+                "AdminComments": ""
+            }
         
-        df = pd.concat([df, pd.DataFrame([new_request])], ignore_index=True)
-        self._save_sheet(df, 'KYCRequests')
+            before, after = self._append_rows('KYCRequests', [new_request], accounts=[account_id])
+            self._advance_index('KYCRequests', KycIndex, before, after,
+                                lambda index: index.append(account_id, 'Pending'))
+            self._emit('kyc', {"AccountID": account_id, "status": "Pending", "pending_delta": 1})
         
         # Update User Status to Pending
-        users_df = self._load_sheet('Users')
-        if account_id in users_df['AccountID'].values:
-            idx = users_df[users_df['AccountID'] == account_id].index[0]
-            users_df.at[idx, 'KYCStatus'] = 'Pending'
-            self._save_sheet(users_df, 'Users')
+        self._set_user_kyc_status([account_id], 'Pending')
             
         return True, "KYC Submitted"
 
     def get_kyc_status(self, account_id):
-        df = self._load_sheet('Users')
-        user = df[df['AccountID'] == account_id]
-        if user.empty: return "Unknown"
-        return user.iloc[0]['KYCStatus']
+        if 'AccountID' not in self._peek_sheet('Users').columns: return "Unknown"
+        users_df, users = self._index('Users', UserIndex)
+        pos = users.get(account_id)
+        if pos is None: return "Unknown"
+        return users_df['KYCStatus'].iat[pos]
 
-    def get_pending_kyc_requests(self):
-        kyc_df = self._load_sheet('KYCRequests')
-        users_df = self._load_sheet('Users')
-        
-        if 'RequestID' not in kyc_df.columns: return []
-        
-        pending_reqs = kyc_df[kyc_df['Status'] == 'Pending']
+    def count_kyc_requests(self, status='Pending'):
+        if 'Status' not in self._peek_sheet('KYCRequests').columns: return 0
+        return self._index('KYCRequests', KycIndex)[1].count(status)
+
+    def query_kyc_requests(self, status='Pending', offset=0, limit=None):
+        # (page of queue entries oldest first, total in that status)
+        if 'RequestID' not in self._peek_sheet('KYCRequests').columns: return [], 0
+        kyc_df, kyc = self._index('KYCRequests', KycIndex)
+        positions, total = kyc.page(status, offset, limit)
         
+        users_df, users = self._index('Users', UserIndex)
         results = []
-        for _, req in pending_reqs.iterrows():
-            acc_id = req['AccountID']
-            user_match = users_df[users_df['AccountID'] == acc_id]
-            full_name = user_match.iloc[0]['FullName'] if not user_match.empty else "Unknown User"
-            
+        for req in schemas.to_records('KYCRequests', kyc_df.iloc[positions]):
+            user_pos = users.get(req['AccountID'])
             results.append({
                 "id": req['AccountID'],
                 "request_id": req['RequestID'],
-                "name": full_name,
+                "name": users_df['FullName'].iat[user_pos] if user_pos is not None else "Unknown User",
                 "docType": req['DocumentType'],
                 "date": req['SubmissionDate'],
                 "status": req['Status'],
                 "docFile": "document_preview.jpg" # Mock filename for UI
             })
-            
-        return results
+        return results, total
+
+    def get_pending_kyc_requests(self):
+        return self.query_kyc_requests('Pending')[0]
 
     def update_kyc_status(self, account_id, new_status):
-        # 1. Update KYC Requests Sheet
-        kyc_df = self._load_sheet('KYCRequests')
-        if 'AccountID' in kyc_df.columns:
-            # Update all pending for this user to new status
-            indices = kyc_df[(kyc_df['AccountID'] == account_id) & (kyc_df['Status'] == 'Pending')].index
-            for idx in indices:
-                kyc_df.at[idx, 'Status'] = new_status
-            self._save_sheet(kyc_df, 'KYCRequests')
-
-        # 2. Update Users Sheet
-        users_df = self._load_sheet('Users')
-        if 'AccountID' in users_df.columns:
-            idx = users_df[users_df['AccountID'] == account_id].index
-            if not idx.empty:
-                users_df.at[idx[0], 'KYCStatus'] = new_status
-                self._save_sheet(users_df, 'Users')
-                return True, f"KYC {new_status}"
-                
+        updated = self.bulk_update_kyc_status([account_id], new_status)
+        if account_id in updated:
+            return True, f"KYC {new_status}"
         return False, "User not found"
 
+    def bulk_update_kyc_status(self, account_ids, new_status):
+        # Resolve every account's pending requests, then one KYCRequests write and one
+        # Users write for the whole batch. Returns the AccountIDs that were updated.
+        if 'AccountID' in self._peek_sheet('KYCRequests').columns:
+            with self._write_lock('KYCRequests'):
+                before, kyc = self._index('KYCRequests', KycIndex)
+                kyc_df = schemas.writable(before)
+                pending = {acc: kyc.for_account(acc, 'Pending') for acc in account_ids}
+                positions = [p for found in pending.values() for p in found]
+                if positions:
+                    kyc_df.iloc[positions, kyc_df.columns.get_loc('Status')] = new_status
+                    self._save_sheet(kyc_df, 'KYCRequests', accounts=[acc for acc, found in pending.items() if found])
+                    self._advance_index('KYCRequests', KycIndex, before, self._peek_sheet('KYCRequests'),
+                                        lambda index: index.set_status(positions, new_status))
+            for acc, found in pending.items():
+                self._emit('kyc', {"AccountID": acc, "status": new_status,
+                                   "pending_delta": 0 if new_status == 'Pending' else -len(found)})
+
+        return self._set_user_kyc_status(account_ids, new_status)
+
+    def _set_user_kyc_status(self, account_ids, new_status):
+        if 'AccountID' not in self._peek_sheet('Users').columns: return []
+        with self._write_lock('Users'):
+            before, users = self._index('Users', UserIndex)
+            found = {acc: users.get(acc) for acc in account_ids}
+            found = {acc: pos for acc, pos in found.items() if pos is not None}
+            if found:
+                users_df = schemas.writable(before)
+                users_df.iloc[list(found.values()), users_df.columns.get_loc('KYCStatus')] = new_status
+                self._save_sheet(users_df, 'Users', accounts=list(found))
+                # Same rows in the same order, so the positions carry over
+                self._advance_index('Users', UserIndex, before, self._peek_sheet('Users'), lambda index: None)
+        return list(found)
+
     def update_user_status(self, account_id, new_status):
-        users_df = self._load_sheet('Users')
-        if 'AccountID' in users_df.columns:
-            idx = users_df[users_df['AccountID'] == account_id].index
-            if not idx.empty:
-                users_df.at[idx[0], 'Status'] = new_status
-                self._save_sheet(users_df, 'Users')
-                return True, f"User status set to {new_status}"
+        with self._write_lock('Users'):
+            users_df = self._load_sheet('Users')
+            if 'AccountID' in users_df.columns:
+                idx = users_df[users_df['AccountID'] == account_id].index
+                if not idx.empty:
+                    users_df.at[idx[0], 'Status'] = new_status
+                    self._save_sheet(users_df, 'Users', accounts=[account_id])
+                    self._emit('user_status', {"AccountID": account_id, "status": new_status})
+                    return True, f"User status set to {new_status}"
         return False, "User not found"
@@ -0,0 +1,171 @@
+import json
+import random
+import threading
+import time
+from collections import deque
+
+import gspread
+from gspread.utils import numericise_all
+
+# In-process stand-in for the gspread client, used by the load and replay tools so
+# capacity planning can run without a network or Google credentials.
+# Only the calls DatabaseManager actually makes are implemented.
+#
+# quota_per_min makes the spreadsheet enforce a per-minute request quota the way Google
+# does (a sliding 60s window, HTTP 429 RESOURCE_EXHAUSTED once it is spent), and
+# error_rate fails that share of calls at random with a 429 or 503, so the scheduler's
+# throttling and backoff (sheets_scheduler.py) can be exercised offline.
+
+
+class _ErrorResponse:
+    # Just enough of a requests.Response for gspread.exceptions.APIError
+    def __init__(self, code, status, message):
+        self.status_code = code
+        self.text = json.dumps({'error': {'code': code, 'status': status, 'message': message}})
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, title):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self._values = []  # list of rows, header first, stored as strings like Sheets does
+
+    def get_all_records(self):
+        self.spreadsheet._api_call('get_all_records')
+        with self.spreadsheet._lock:
+            if len(self._values) < 2:
+                return []
+            headers = list(self._values[0])
+            rows = [list(r) for r in self._values[1:]]
+        return [dict(zip(headers, numericise_all(row))) for row in rows]
+
+    def get_all_values(self):
+        self.spreadsheet._api_call('get_all_values')
+        with self.spreadsheet._lock:
+            return [list(r) for r in self._values]
+
+    def batch_get(self, ranges, **kwargs):
+        # Whole-row A1 ranges only ("A1:F1", "A10:F"), which is all the mirror asks for
+        self.spreadsheet._api_call('batch_get')
+        result = []
+        with self.spreadsheet._lock:
+            for name in ranges:
+                start, _, end = name.partition(':')
+                first = int(start.lstrip('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+                last = end.lstrip('ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+                result.append([list(r) for r in self._values[first - 1:int(last) if last else None]])
+        return result
+
+    def row_values(self, row):
+        self.spreadsheet._api_call('row_values')
+        with self.spreadsheet._lock:
+            if len(self._values) < row:
+                return []
+            return list(self._values[row - 1])
+
+    def clear(self):
+        self.spreadsheet._api_call('clear')
+        with self.spreadsheet._lock:
+            self._values = []
+            self.spreadsheet._touch()
+
+    def update(self, values=None, range_name=None, **kwargs):
+        self.spreadsheet._api_call('update')
+        cleaned = [['' if v is None else str(v) for v in row] for row in (values or [])]
+        with self.spreadsheet._lock:
+            self._values = cleaned
+            self.spreadsheet._touch()
+        return {'updatedRows': len(cleaned)}
+
+    def append_rows(self, values, value_input_option='RAW', **kwargs):
+        self.spreadsheet._api_call('append_rows')
+        cleaned = [['' if v is None else str(v) for v in row] for row in values]
+        with self.spreadsheet._lock:
+            self._values.extend(cleaned)
+            self.spreadsheet._touch()
+        return {'updates': {'updatedRows': len(cleaned)}}
+
+
+class FakeSpreadsheet:
+    def __init__(self, title="Flux Financial Database", latency=0.0, jitter=0.0,
+                 quota_per_min=None, error_rate=0.0):
+        self.title = title
+        self.latency = latency  # seconds added to every API call
+        self.jitter = jitter    # +/- uniform jitter in seconds
+        self.quota_per_min = quota_per_min
+        self.error_rate = error_rate
+        self.calls = {}
+        self.errors = {}
+        self._window = deque()  # times of the calls in the last minute
+        self.modified = 0
+        self._sheets = {}
+        self._lock = threading.Lock()
+
+    def _reject(self, now):
+        # (code, status, message) when this call is refused, else None
+        while self._window and now - self._window[0] >= 60:
+            self._window.popleft()
+        if self.quota_per_min is not None and len(self._window) >= self.quota_per_min:
+            return 429, 'RESOURCE_EXHAUSTED', "Quota exceeded for quota metric 'Read requests per minute per user'"
+        self._window.append(now)
+        if self.error_rate and random.random() < self.error_rate:
+            return random.choice([(429, 'RESOURCE_EXHAUSTED', 'Quota exceeded'),
+                                  (503, 'UNAVAILABLE', 'The service is currently unavailable.')])
+        return None
+
+    def _api_call(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            rejected = self._reject(time.monotonic())
+            if rejected:
+                self.errors[rejected[0]] = self.errors.get(rejected[0], 0) + 1
+        delay = self.latency
+        if self.jitter:
+            delay += random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if rejected:
+            raise gspread.exceptions.APIError(_ErrorResponse(*rejected))
+
+    def _touch(self):
+        # Drive's modifiedTime moves on every change; a counter serves the same purpose
+        self.modified += 1
+
+    def get_lastUpdateTime(self):
+        self._api_call('get_lastUpdateTime')
+        return f"modified-{self.modified}"
+
+    def worksheet(self, title):
+        self._api_call('worksheet')
+        with self._lock:
+            if title not in self._sheets:
+                raise gspread.WorksheetNotFound(title)
+            return self._sheets[title]
+
+    def worksheets(self):
+        self._api_call('worksheets')
+        with self._lock:
+            return list(self._sheets.values())
+
+    def add_worksheet(self, title, rows=100, cols=20):
+        self._api_call('add_worksheet')
+        with self._lock:
+            ws = self._sheets.setdefault(title, FakeWorksheet(self, title))
+        return ws
+
+    def update_title(self, title):
+        self._api_call('update_title')
+        self.title = title
+
+
+class FakeSheetsClient:
+    # Mirrors gspread.Client.open_by_key; every key maps to the same spreadsheet.
+    def __init__(self, latency=0.0, jitter=0.0, quota_per_min=None, error_rate=0.0):
+        self.spreadsheet = FakeSpreadsheet(latency=latency, jitter=jitter, quota_per_min=quota_per_min,
+                                           error_rate=error_rate)
+
+    def open_by_key(self, key):
+        return self.spreadsheet
@@ -0,0 +1,80 @@
+import json
+
+import pandas as pd
+from flask import Response, request
+
+import schemas
+
+# DataFrame -> JSON bytes without the per-row dict detour.
+#
+# to_dict('records') + jsonify builds one Python dict per row and then walks them again
+# to encode. Here each column slice goes straight through pandas' C encoder:
+#   records   [{"col": v, ...}, ...]            same shape the routes always returned
+#   columnar  {"columns": [...], "data": {"col": [...]}, "length": n}    (?format=columnar)
+# Cells are rendered as schemas.to_records renders them (datetime columns in the sheet's
+# own format, e.g. KYCRequests.SubmissionDate as a date, NaT as ''); NaN/None become null. Lists above STREAM_ROWS rows (or ?stream=1) are sent as
+# a chunked response so the full body is never held in memory.
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+STREAM_ROWS = 20000
+CHUNK_ROWS = 5000
+
+
+def _prepare(df, sheet_name):
+    df = schemas.to_storage(sheet_name, df)
+    # Datetime columns the sheet's schema does not declare
+    datetime_cols = [c for c in df.columns if pd.api.types.is_datetime64_any_dtype(df[c])]
+    if not datetime_cols:
+        return df
+    df = df.copy()
+    for col in datetime_cols:
+        df[col] = df[col].dt.strftime(TIMESTAMP_FORMAT).fillna('')
+    return df
+
+
+def records_json(df, sheet_name=None):
+    if df is None or df.empty:
+        return '[]'
+    return _prepare(df, sheet_name).to_json(orient='records', double_precision=15)
+
+
+def columnar_json(df, sheet_name=None):
+    if df is None or df.empty:
+        return '{"columns":[],"data":{},"length":0}'
+    df = _prepare(df, sheet_name)
+    columns = [str(c) for c in df.columns]
+    data = ','.join(f"{json.dumps(name)}:{df[col].to_json(orient='values', double_precision=15)}"
+                    for name, col in zip(columns, df.columns))
+    return f'{{"columns":{json.dumps(columns)},"data":{{{data}}},"length":{len(df)}}}'
+
+
+def iter_records_json(df, sheet_name=None, chunk_rows=CHUNK_ROWS):
+    yield '['
+    first = True
+    for start in range(0, len(df), chunk_rows):
+        chunk = records_json(df.iloc[start:start + chunk_rows], sheet_name)[1:-1]
+        if chunk:
+            yield chunk if first else ',' + chunk
+            first = False
+    yield ']'
+
+
+def frame_response(key, df, sheet_name, extra=None):
+    # JSON response shaped {key: <rows of sheet_name>, **extra}, honouring ?format= and ?stream=
+    if df is None:
+        df = pd.DataFrame()
+    fmt = request.args.get('format', 'records')
+    prefix = '{' + ''.join(f"{json.dumps(k)}:{json.dumps(v, default=str)}," for k, v in (extra or {}).items())
+    prefix += f"{json.dumps(key)}:"
+
+    if fmt == 'columnar':
+        return Response(prefix + columnar_json(df, sheet_name) + '}', mimetype='application/json')
+
+    if len(df) > STREAM_ROWS or request.args.get('stream') == '1':
+        def generate():
+            yield prefix
+            yield from iter_records_json(df, sheet_name)
+            yield '}'
+        return Response(generate(), mimetype='application/json')
+
+    return Response(prefix + records_json(df, sheet_name) + '}', mimetype='application/json')
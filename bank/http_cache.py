@@ -0,0 +1,86 @@
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, make_response, request
+
+# Conditional GET support for polled read routes.
+#
+#   cache = ResponseCache(lambda: db)
+#
+#   @app.route('/api/user/transactions/<account_id>')
+#   @cache.conditional('ActivityLogs')
+#   def get_transactions_history(account_id): ...
+#
+# The ETag is derived from DatabaseManager.data_version() for the listed sheets, which
+# is per-account when the route has an <account_id> and per-sheet otherwise. A matching
+# If-None-Match is answered with 304 before the view runs, and 200 bodies are kept in
+# an LRU keyed on (path + query, account, version) so repeat polls skip the DataFrame
+# work and JSON encoding entirely. A write bumps the version, so stale entries are
+# never served and simply age out.
+
+MAX_ENTRIES = 2048
+
+
+class ResponseCache:
+    def __init__(self, get_db, max_entries=MAX_ENTRIES):
+        self.get_db = get_db
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def conditional(self, *sheet_names):
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(**kwargs):
+                account_id = kwargs.get('account_id')
+                version = self.get_db().data_version(sheet_names, account_id)
+                key = (request.full_path, account_id, version)
+                etag = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:24]
+
+                if etag in request.if_none_match:
+                    self.not_modified += 1
+                    resp = Response(status=304)
+                    resp.set_etag(etag)
+                    resp.headers['Cache-Control'] = 'no-cache'
+                    return resp
+
+                entry = self._get(key)
+                if entry is not None:
+                    self.hits += 1
+                    body, mimetype = entry
+                    resp = Response(body, status=200, mimetype=mimetype)
+                else:
+                    self.misses += 1
+                    resp = make_response(view(**kwargs))
+                    if resp.status_code != 200 or resp.is_streamed:
+                        return resp
+                    self._put(key, (resp.get_data(), resp.mimetype))
+
+                resp.set_etag(etag)
+                resp.headers['Cache-Control'] = 'no-cache'  # always revalidate, usually a 304
+                return resp
+            return wrapper
+        return decorator
@@ -0,0 +1,56 @@
+import hashlib
+import os
+import threading
+
+import shared_tables
+
+# AccountID sequence shared by every worker on the host.
+#
+# One small file per database holds the next unreserved number. A worker reserves a
+# block of BLOCK numbers under the directory flock and then hands them out from memory,
+# so the file is touched once per BLOCK signups and two workers can never draw the same
+# number. Each reservation starts at no less than the caller's floor (one past the
+# highest AccountID already stored), so a wiped tmpfs or a restored workbook cannot
+# lead to an ID that exists. Numbers left in a block when a worker exits are skipped,
+# never reused; IDs stay unique but are not gap-free.
+#
+# The lock is host-local: workers on different hosts writing the same spreadsheet need
+# FLUX_ID_DIR on a filesystem they share.
+
+DIRECTORY = os.environ.get('FLUX_ID_DIR') or shared_tables.DIRECTORY
+BLOCK = int(os.environ.get('FLUX_ID_BLOCK', 50))
+
+
+class IdAllocator:
+    def __init__(self, key, directory=DIRECTORY, block=BLOCK):
+        # key names the sequence, e.g. the database file: one sequence per database
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha1(str(key).encode()).hexdigest()[:12]
+        self.path = os.path.join(directory, f"account-seq-{digest}")
+        self.block = block
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def _reserve(self, floor):
+        with shared_tables.directory_lock(self.directory):
+            try:
+                with open(self.path) as f:
+                    start = int(f.read().strip() or 0)
+            except (FileNotFoundError, ValueError):
+                start = 0
+            start = max(start, floor)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, 'w') as f:
+                f.write(str(start + self.block))
+            os.replace(tmp, self.path)
+        self._next, self._end = start, start + self.block
+
+    def next(self, floor=0):
+        with self._lock:
+            if self._next >= self._end:
+                self._reserve(floor)
+            value = self._next
+            self._next += 1
+            return value
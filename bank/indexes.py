@@ -0,0 +1,227 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from itertools import islice
+
+import pandas as pd
+
+# In-memory lookup structures over cached sheet frames.
+#
+# DatabaseManager._index(sheet, Factory) builds one from the current frame and keeps
+# it until that frame is replaced; writes that know exactly what changed (an append,
+# a status flip) update the structure in place instead of paying for a rebuild.
+# Positions are row positions in the frame the index was built or advanced with.
+
+
+class AuditIndex:
+    # AuditLogs is append-only and written in time order, so every position list is
+    # also sorted by time and a time range is two bisects
+    def __init__(self, df):
+        self.times = []
+        self.actions = []
+        self.by_account = defaultdict(list)
+        self.by_action = defaultdict(list)
+        self.by_account_action = defaultdict(list)
+        for account_id, action, ts in zip(df['AccountID'], df['Action'], df['Timestamp']):
+            self.append(account_id, action, ts)
+
+    def append(self, account_id, action, ts):
+        position = len(self.times)
+        self.times.append(ts)
+        self.actions.append(action)
+        self.by_account[str(account_id)].append(position)
+        self.by_action[str(action)].append(position)
+        self.by_account_action[(str(account_id), str(action))].append(position)
+
+    def query(self, rows, account_id=None, action=None, since=None, until=None, offset=0, limit=None):
+        # Newest-first page of positions among the first `rows` rows, plus the match count
+        if account_id is not None and action is not None:
+            candidates = self.by_account_action.get((str(account_id), str(action)), [])
+        elif account_id is not None:
+            candidates = self.by_account.get(str(account_id), [])
+        elif action is not None:
+            candidates = self.by_action.get(str(action), [])
+        else:
+            candidates = range(min(rows, len(self.times)))
+
+        times = self.times
+        hi = bisect_left(candidates, rows)
+        lo = 0
+        if since is not None:
+            lo = bisect_left(candidates, since, lo, hi, key=lambda p: times[p])
+        if until is not None:
+            hi = bisect_right(candidates, until, lo, hi, key=lambda p: times[p])
+
+        end = max(lo, hi - offset)
+        start = lo if limit is None else max(lo, end - limit)
+        return list(reversed(candidates[start:end])), hi - lo
+
+
+class UserIndex:
+    # AccountID -> row, (account number, IFSC) -> row for recipient validation, lowercased
+    # Username -> row, the set of account numbers in use and the highest numeric AccountID
+    def __init__(self, df):
+        self.rows = 0
+        self.positions = {}
+        self.accounts = {}
+        self.numbers = set()
+        self.usernames = {}
+        self.max_number = 0
+        column = lambda col: df[col] if col in df.columns else [''] * len(df)
+        for account_id, number, ifsc, username in zip(df['AccountID'], column('AccountNumber'),
+                                                      column('IFSC'), column('Username')):
+            self.append(account_id, number, ifsc, username)
+
+    def append(self, account_id, account_number, ifsc, username):
+        position = self.rows
+        self.rows += 1
+        self.positions.setdefault(str(account_id), position)
+        key = account_key(account_number, ifsc)
+        self.accounts.setdefault(key, position)
+        self.numbers.add(key[0])
+        self.usernames.setdefault(str(username).lower(), position)
+        digits = str(account_id)[2:]
+        if digits.isdigit():
+            self.max_number = max(self.max_number, int(digits))
+
+    def get(self, account_id):
+        return self.positions.get(str(account_id))
+
+    def find(self, account_number, ifsc):
+        return self.accounts.get(account_key(account_number, ifsc))
+
+    def by_username(self, username):
+        return self.usernames.get(str(username).lower())
+
+
+def account_key(account_number, ifsc):
+    # Sheets may hand the number back as an int or float ("123.0")
+    return str(account_number).strip().split('.')[0], str(ifsc).strip().upper()
+
+
+class KycIndex:
+    # Work queue view of KYCRequests: requests per status in submission order (dicts
+    # used as ordered sets, so a status change is O(1)) and request positions per account
+    def __init__(self, df):
+        self.status = []
+        self.by_status = defaultdict(dict)
+        self.by_account = defaultdict(list)
+        for account_id, status in zip(df['AccountID'], df['Status']):
+            self.append(account_id, status)
+
+    def append(self, account_id, status):
+        position = len(self.status)
+        self.status.append(str(status))
+        self.by_status[str(status)][position] = None
+        self.by_account[str(account_id)].append(position)
+
+    def set_status(self, positions, status):
+        for position in positions:
+            self.by_status[self.status[position]].pop(position, None)
+            self.by_status[str(status)][position] = None
+            self.status[position] = str(status)
+
+    def for_account(self, account_id, status=None):
+        positions = self.by_account.get(str(account_id), [])
+        return [p for p in positions if status is None or self.status[p] == status]
+
+    def count(self, status):
+        return len(self.by_status.get(status, ()))
+
+    def page(self, status, offset=0, limit=None):
+        queue = self.by_status.get(status, {})
+        stop = None if limit is None else offset + limit
+        return list(islice(queue, offset, stop)), len(queue)
+
+
+class BeneficiaryIndex:
+    # Payees per account plus a set of (AccountID, AccountNumber) pairs for duplicate
+    # checks; Sheets hands numeric-looking account numbers back as ints, so keys are str
+    def __init__(self, df):
+        self.rows = 0
+        self.by_account = defaultdict(list)
+        self.pairs = set()
+        for account_id, account_number in zip(df['AccountID'], df['AccountNumber']):
+            self.append(account_id, account_number)
+
+    def append(self, account_id, account_number):
+        self.by_account[str(account_id)].append(self.rows)
+        self.pairs.add((str(account_id), str(account_number)))
+        self.rows += 1
+
+    def exists(self, account_id, account_number):
+        return (str(account_id), str(account_number)) in self.pairs
+
+    def for_account(self, account_id):
+        return self.by_account.get(str(account_id), [])
+
+    def count(self, account_id):
+        return len(self.by_account.get(str(account_id), ()))
+
+
+class ActivityProfiles:
+    # Running per-account aggregates over the whole ActivityLogs history (hot sheet and
+    # archive), built once with a groupby and then advanced row by row as activity is
+    # logged. "recent" is filled on first read and kept newest first from then on.
+    RECENT = 5
+
+    def __init__(self, frames):
+        parts = []
+        for df in frames:
+            if df.empty or 'AccountID' not in df.columns:
+                continue
+            parts.append(pd.DataFrame({
+                'AccountID': df['AccountID'].astype(str).to_numpy(),
+                'Transfer': _column(df, 'TransactionType', '').astype(str).to_numpy() == 'Transfer',
+                'Amount': pd.to_numeric(_column(df, 'TransactionAmount', 0), errors='coerce').fillna(0).to_numpy(),
+                'Risk': pd.to_numeric(_column(df, 'CyberRiskScore', 0), errors='coerce').fillna(0).to_numpy(),
+                'Timestamp': _column(df, 'Timestamp', pd.NaT).to_numpy(),
+            }))
+        self.profiles = {}
+        if not parts:
+            return
+        data = pd.concat(parts, ignore_index=True)
+        data['Spend'] = data['Amount'].where(data['Transfer'], 0)
+        data['HighRisk'] = data['Risk'] > 75
+        stats = data.groupby('AccountID').agg(
+            activity_count=('Risk', 'size'), transfer_count=('Transfer', 'sum'),
+            transfer_total=('Spend', 'sum'), max_risk=('Risk', 'max'),
+            high_risk_count=('HighRisk', 'sum'), last_activity=('Timestamp', 'max'))
+        for account_id, row in zip(stats.index, stats.itertuples(index=False)):
+            profile = _empty_profile()
+            profile.update(row._asdict())
+            profile['transfer_count'] = int(profile['transfer_count'])
+            profile['high_risk_count'] = int(profile['high_risk_count'])
+            profile['transfer_total'] = float(profile['transfer_total'])
+            profile['max_risk'] = float(profile['max_risk'])
+            self.profiles[account_id] = profile
+
+    def profile(self, account_id):
+        return self.profiles.setdefault(str(account_id), _empty_profile())
+
+    def add(self, record):
+        # record: one ActivityLogs row as schemas.to_records() renders it
+        profile = self.profile(record['AccountID'])
+        risk = _number(record.get('CyberRiskScore'))
+        profile['activity_count'] += 1
+        if record.get('TransactionType') == 'Transfer':
+            profile['transfer_count'] += 1
+            profile['transfer_total'] += _number(record.get('TransactionAmount'))
+        profile['max_risk'] = max(profile['max_risk'], risk)
+        profile['high_risk_count'] += risk > 75
+        profile['last_activity'] = pd.Timestamp(record['Timestamp'])
+        if profile['recent'] is not None:
+            profile['recent'].appendleft(record)
+
+
+def _column(df, col, default):
+    return df[col] if col in df.columns else pd.Series(default, index=df.index)
+
+
+def _number(value):
+    number = pd.to_numeric(value, errors='coerce')
+    return 0.0 if pd.isna(number) else float(number)
+
+
+def _empty_profile():
+    return {'activity_count': 0, 'transfer_count': 0, 'transfer_total': 0.0, 'max_risk': 0.0,
+            'high_risk_count': 0, 'last_activity': pd.NaT, 'recent': None}
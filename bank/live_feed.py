@@ -0,0 +1,109 @@
+import itertools
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+# In-process fan-out broker behind the admin Server-Sent Events stream.
+#
+# DatabaseManager emits events as it writes; the broker stamps each one with an id,
+# keeps the most recent RING_SIZE in a ring buffer for Last-Event-ID resume, and
+# pushes it onto every subscriber's bounded queue. A subscriber that falls more than
+# QUEUE_SIZE events behind is cut loose with a "resync" event rather than letting it
+# hold memory or slow down publishers; the browser reconnects and resumes from the
+# ring, or re-fetches /api/admin/stats and /api/admin/transactions once if it fell
+# off the end of the ring.
+#
+# Event ids look like "<epoch>:<seq>". The epoch changes on every process start, so a
+# client resuming against another gunicorn worker gets a resync instead of wrong data.
+
+RING_SIZE = 1000
+QUEUE_SIZE = 256
+KEEPALIVE_SECONDS = 15
+
+
+class Subscription:
+    def __init__(self, broker):
+        self.broker = broker
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.overflowed = True
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    def __init__(self):
+        self.epoch = format(int(time.time() * 1000), 'x')
+        self._seq = itertools.count(1)
+        self._ring = deque(maxlen=RING_SIZE)  # (seq, message)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, event_type, data):
+        payload = json.dumps(data, default=str)
+        with self._lock:
+            seq = next(self._seq)
+            message = f"id: {self.epoch}:{seq}\nevent: {event_type}\ndata: {payload}\n\n"
+            self._ring.append((seq, message))
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            sub.offer(message)
+        return seq
+
+    def subscribe(self, last_event_id=None):
+        # Returns (subscription, backlog messages, needs_resync)
+        sub = Subscription(self)
+        with self._lock:
+            self._subscribers.add(sub)
+            ring = list(self._ring)
+        if not last_event_id:
+            return sub, [], False
+
+        epoch, _, seq = str(last_event_id).partition(':')
+        if epoch != self.epoch or not seq.isdigit():
+            return sub, [], True
+        seq = int(seq)
+        if ring and ring[0][0] > seq + 1:
+            return sub, [], True  # fell off the end of the ring
+        return sub, [m for s, m in ring if s > seq], False
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def stream(self, last_event_id=None):
+        # Generator of SSE frames for one client
+        sub, backlog, resync = self.subscribe(last_event_id)
+        try:
+            yield "retry: 3000\n\n"
+            if resync:
+                yield f"event: resync\ndata: {json.dumps({'reason': 'history unavailable'})}\n\n"
+            for message in backlog:
+                yield message
+            while True:
+                try:
+                    message = sub.queue.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield message
+                if sub.overflowed and sub.queue.empty():
+                    yield f"event: resync\ndata: {json.dumps({'reason': 'client too slow'})}\n\n"
+                    return
+        finally:
+            sub.close()
+
+
+broker = Broker()
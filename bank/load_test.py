@@ -0,0 +1,344 @@
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+# Allow running as `python bank/load_test.py` from the repo root
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Closed-loop load generator for the banking API.
+#
+#   python bank/load_test.py --concurrency 16 --duration 30 --latency-ms 120
+#   python bank/load_test.py --mode server --rate 50 --mix dashboard=50,transfer=20
+#   python bank/load_test.py --url http://localhost:5000 --duration 60
+#
+# "client" drives the Flask test client in-process, "server" starts a local threaded
+# HTTP server, and --url targets an already running deployment. The first two swap the
+# app's DatabaseManager for one backed by fake_sheets with injectable latency.
+
+DEFAULT_MIX = {
+    'signup': 5,
+    'login': 15,
+    'dashboard': 35,
+    'transfer': 15,
+    'deposit': 10,
+    'beneficiary': 5,
+    'admin_stats': 15,
+}
+PERCENTILES = (50, 95, 99, 99.9)
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile over an already sorted list
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100.0 * len(sorted_values)) - 1
+    return sorted_values[max(0, min(rank, len(sorted_values) - 1))]
+
+
+def parse_mix(text):
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown operation '{name}' in --mix (choose from {', '.join(DEFAULT_MIX)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# --- TRANSPORTS ---
+class TestClientTransport:
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def request(self, method, path, body=None):
+        resp = self.client.open(path, method=method, json=body)
+        return resp.status_code, resp.get_json(silent=True) or {}
+
+
+class HttpTransport:
+    def __init__(self, base_url, timeout=30):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        self.timeout = timeout
+
+    def request(self, method, path, body=None):
+        resp = self.session.request(method, self.base_url + path, json=body, timeout=self.timeout)
+        try:
+            payload = resp.json()
+        except ValueError:
+            payload = {}
+        return resp.status_code, payload
+
+
+def build_fake_app(latency, jitter, quota_per_min=None, error_rate=0.0):
+    # Import the real app, then point its module-level `db` at a fake Sheets backend
+    import app as bank_app
+    from database_manager import DatabaseManager
+    from fake_sheets import FakeSheetsClient
+
+    client = FakeSheetsClient(latency=latency, jitter=jitter, quota_per_min=quota_per_min, error_rate=error_rate)
+    scratch_file = os.path.join(tempfile.mkdtemp(prefix='flux-load-'), 'db.xlsx')
+    bank_app.use_database(DatabaseManager(db_file=scratch_file, sheets_client=client))
+    return bank_app.app, client
+
+
+def start_local_server(flask_app):
+    from werkzeug.serving import make_server
+    server = make_server('127.0.0.1', 0, flask_app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+# --- RESULTS ---
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.statuses = {}
+
+    def record(self, route, seconds, status):
+        with self._lock:
+            self.latencies.setdefault(route, []).append(seconds)
+            counts = self.statuses.setdefault(route, {})
+            counts[status] = counts.get(status, 0) + 1
+
+    def summary(self, elapsed):
+        report = {}
+        for route, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            errors = sum(n for code, n in self.statuses[route].items() if code >= 400)
+            row = {
+                'count': len(values),
+                'errors': errors,
+                'rps': len(values) / elapsed if elapsed else 0.0,
+            }
+            for pct in PERCENTILES:
+                row[f'p{str(pct).replace(".", "")}_ms'] = percentile(values, pct) * 1000
+            report[route] = row
+        return report
+
+
+# --- VIRTUAL USER ---
+class VirtualUser:
+    def __init__(self, transport, recorder, shared, mix, rng):
+        self.transport = transport
+        self.recorder = recorder
+        self.shared = shared
+        self.ops = list(mix)
+        self.weights = [mix[name] for name in self.ops]
+        self.rng = rng
+        self.account = None
+
+    def call(self, route, method, path, body=None, scheduled=None):
+        start = time.perf_counter()
+        try:
+            status, payload = self.transport.request(method, path, body)
+        except Exception as e:
+            print(f"Request failed ({route}): {e}")
+            status, payload = 599, {}
+        # Measure from the intended send time when paced, so a stalled server
+        # cannot hide queueing delay (coordinated omission).
+        origin = scheduled if scheduled is not None else start
+        self.recorder.record(route, time.perf_counter() - origin, status)
+        return status, payload
+
+    def signup(self, scheduled=None):
+        username = f"load_{uuid.uuid4().hex[:12]}"
+        password = uuid.uuid4().hex[:10]
+        status, payload = self.call('POST /api/auth/signup', 'POST', '/api/auth/signup', {
+            'username': username,
+            'password': password,
+            'fullName': f"Load User {username[-4:]}",
+            'email': f"{username}@example.com",
+            'phone': str(self.rng.randint(6000000000, 9999999999)),
+        }, scheduled)
+        if status == 201:
+            user = payload['user']
+            account = {
+                'account_id': user['AccountID'],
+                'account_number': str(user['AccountNumber']),
+                'ifsc': user['IFSC'],
+                'username': username,
+                'password': password,
+            }
+            with self.shared['lock']:
+                self.shared['accounts'].append(account)
+            return account
+        return None
+
+    def setup(self):
+        self.account = self.signup()
+        if self.account:
+            self.call('POST /api/transaction/deposit', 'POST', '/api/transaction/deposit', {
+                'account_id': self.account['account_id'], 'amount': 1000000, 'source': 'LoadTest'})
+
+    def pick_peer(self):
+        with self.shared['lock']:
+            peers = [a for a in self.shared['accounts'] if a is not self.account]
+        return self.rng.choice(peers) if peers else None
+
+    def step(self, scheduled=None):
+        op = self.rng.choices(self.ops, weights=self.weights)[0]
+        acc = self.account
+        if op == 'signup' or acc is None:
+            self.signup(scheduled)
+        elif op == 'login':
+            if self.rng.random() < 0.1:
+                self.call('POST /api/auth/login (fail)', 'POST', '/api/auth/login', {
+                    'username': acc['username'], 'password': 'wrong-password'}, scheduled)
+            else:
+                self.call('POST /api/auth/login', 'POST', '/api/auth/login', {
+                    'username': acc['username'], 'password': acc['password']}, scheduled)
+        elif op == 'dashboard':
+            self.call('GET /api/user/dashboard/<id>', 'GET', f"/api/user/dashboard/{acc['account_id']}", None, scheduled)
+        elif op == 'transfer':
+            peer = self.pick_peer()
+            if peer is None:
+                return
+            self.call('POST /api/transaction/transfer', 'POST', '/api/transaction/transfer', {
+                'sender_id': acc['account_id'],
+                'amount': round(self.rng.uniform(10, 60000), 2),
+                'recipient_account': peer['account_number'],
+                'recipient_ifsc': peer['ifsc'],
+                'session_id': f"SES-LOAD-{self.rng.randint(0, 99999)}",
+            }, scheduled)
+        elif op == 'deposit':
+            self.call('POST /api/transaction/deposit', 'POST', '/api/transaction/deposit', {
+                'account_id': acc['account_id'], 'amount': round(self.rng.uniform(10, 5000), 2),
+                'source': 'LoadTest'}, scheduled)
+        elif op == 'beneficiary':
+            peer = self.pick_peer()
+            if peer is None:
+                return
+            self.call('POST /api/user/beneficiaries', 'POST', '/api/user/beneficiaries', {
+                'account_id': acc['account_id'],
+                'name': f"Peer {peer['account_id']}",
+                'account_number': peer['account_number'],
+                'ifsc': peer['ifsc'],
+                'nickname': peer['username'],
+            }, scheduled)
+        elif op == 'admin_stats':
+            self.call('GET /api/admin/stats', 'GET', '/api/admin/stats', None, scheduled)
+
+
+def run_loop(user, deadline, interval):
+    next_send = time.perf_counter()
+    while time.perf_counter() < deadline:
+        if interval:
+            now = time.perf_counter()
+            if next_send > now:
+                time.sleep(next_send - now)
+            scheduled = next_send
+            next_send += interval
+            user.step(scheduled)
+        else:
+            user.step()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Closed-loop load generator for the Flux banking API")
+    parser.add_argument('--mode', choices=['client', 'server'], default='client',
+                        help="client: Flask test client in-process; server: local threaded HTTP server")
+    parser.add_argument('--url', help="Drive an already running server instead (ignores --mode and fake backend)")
+    parser.add_argument('--concurrency', type=int, default=8, help="Number of virtual users")
+    parser.add_argument('--duration', type=float, default=30.0, help="Measured run time in seconds")
+    parser.add_argument('--rate', type=float, default=0.0, help="Target total requests/sec (0 = as fast as possible)")
+    parser.add_argument('--mix', help="Weighted operation mix, e.g. dashboard=40,transfer=20,login=10")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Fake Sheets latency per API call")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="Uniform +/- jitter on the fake latency")
+    parser.add_argument('--quota-per-min', type=int, default=None,
+                        help="Fake Sheets per-minute quota; calls past it get a 429")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="Share of fake Sheets calls failing with a random 429 or 503")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', dest='json_out', help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    fake_client = None
+    server = None
+    if args.url:
+        make_transport = lambda: HttpTransport(args.url)
+    else:
+        flask_app, fake_client = build_fake_app(args.latency_ms / 1000.0, args.jitter_ms / 1000.0,
+                                                 args.quota_per_min, args.error_rate)
+        if args.mode == 'server':
+            server, base_url = start_local_server(flask_app)
+            make_transport = lambda: HttpTransport(base_url)
+        else:
+            make_transport = lambda: TestClientTransport(flask_app)
+
+    recorder = Recorder()
+    setup_recorder = Recorder()
+    shared = {'lock': threading.Lock(), 'accounts': []}
+    master_rng = random.Random(args.seed)
+    interval = args.concurrency / args.rate if args.rate > 0 else 0.0
+
+    users = [VirtualUser(make_transport(), setup_recorder, shared, mix, random.Random(master_rng.random()))
+             for _ in range(args.concurrency)]
+    window = {}
+
+    def open_window():
+        # Runs once, before any waiter is released
+        window['started'] = time.perf_counter()
+        window['deadline'] = window['started'] + args.duration
+
+    barrier = threading.Barrier(args.concurrency + 1, action=open_window)
+
+    def worker(u):
+        # Account setup is recorded separately so it does not skew the measured window
+        u.setup()
+        barrier.wait()
+        u.recorder = recorder
+        run_loop(u, window['deadline'], interval)
+
+    threads = [threading.Thread(target=worker, args=(u,), daemon=True) for u in users]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    started = window['started']
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    report = recorder.summary(elapsed)
+    total = sum(r['count'] for r in report.values())
+    print(f"\n--- LOAD TEST: {args.concurrency} users, {elapsed:.1f}s, {total} requests, {total / elapsed:.1f} req/s ---")
+    print(f"{'route':<36} {'count':>7} {'err':>5} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'p999':>9}")
+    for route, r in report.items():
+        print(f"{route:<36} {r['count']:>7} {r['errors']:>5} {r['rps']:>8.1f} "
+              f"{r['p50_ms']:>8.1f}ms {r['p95_ms']:>7.1f}ms {r['p99_ms']:>7.1f}ms {r['p999_ms']:>7.1f}ms")
+    if fake_client is not None:
+        print(f"Fake Sheets API calls: {fake_client.spreadsheet.calls}")
+        if fake_client.spreadsheet.errors:
+            print(f"Fake Sheets errors: {fake_client.spreadsheet.errors}")
+
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump({
+                'concurrency': args.concurrency,
+                'duration_s': elapsed,
+                'total_requests': total,
+                'throughput_rps': total / elapsed if elapsed else 0.0,
+                'routes': report,
+                'sheets_calls': fake_client.spreadsheet.calls if fake_client else None,
+            }, f, indent=2)
+
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+
+import pandas as pd
+
+import schemas
+import shared_tables
+
+# Cold tier for ActivityLogs.
+#
+# The sheet itself only keeps the hot tier (the last HOT_DAYS days); older rows are
+# moved by DatabaseManager.roll_activity_logs() into one zstd-compressed Arrow file per
+# month, ActivityLogs-YYYY-MM.feather, in the archive directory. index.json lists every
+# partition with its row count and the accounts that appear in it:
+#
+#   {"2025-03": {"rows": 18231, "accounts": ["AC1001", ...]}}
+#
+# so history queries can skip partitions an account has no rows in and only open the
+# ones they need, newest first. Partitions are read on first use and kept in memory
+# until the partition changes.
+#
+# The archive is the only copy of those rows once they leave the sheet: point
+# FLUX_ARCHIVE_DIR at persistent storage before enabling rollover on an ephemeral host.
+
+INDEX = 'index.json'
+SHEET = 'ActivityLogs'
+
+
+class LogArchive:
+    def __init__(self, directory):
+        self.directory = directory
+        self._index = {}
+        self._index_mtime = None
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    def _path(self, month):
+        return os.path.join(self.directory, f"{SHEET}-{month}.feather")
+
+    def _read_index(self):
+        try:
+            with open(os.path.join(self.directory, INDEX)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def index(self):
+        try:
+            mtime = os.stat(os.path.join(self.directory, INDEX)).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        if mtime != self._index_mtime:
+            self._index = self._read_index()
+            self._index_mtime = mtime
+        return self._index
+
+    def total_rows(self):
+        return sum(entry['rows'] for entry in self.index().values())
+
+    def months(self, account_id=None):
+        # Newest first, pruned to partitions holding `account_id`
+        index = self.index()
+        return [month for month in sorted(index, reverse=True)
+                if account_id is None or str(account_id) in index[month]['accounts']]
+
+    def read(self, month):
+        rows = self.index()[month]['rows']
+        with self._lock:
+            cached = self._partitions.get(month)
+            if cached is not None and cached[0] == rows:
+                return cached[1]
+        df = schemas.apply(SHEET, shared_tables.table_to_frame(shared_tables.read_table(self._path(month))))
+        with self._lock:
+            self._partitions[month] = (rows, df)
+        return df
+
+    def frames(self, account_id=None):
+        for month in self.months(account_id):
+            df = self.read(month)
+            yield df if account_id is None else df[df['AccountID'] == account_id]
+
+    def holds(self, df):
+        # Mask of the rows of `df` whose LogID is already archived
+        index = self.index()
+        months = set(df['Timestamp'].dt.strftime('%Y-%m').dropna()) & set(index)
+        archived = [self.read(month)['LogID'].astype(str) for month in sorted(months)]
+        if not archived:
+            return pd.Series(False, index=df.index)
+        return df['LogID'].astype(str).isin(pd.concat(archived, ignore_index=True))
+
+    def append(self, cold):
+        # Merge rows into their monthly partitions; re-appending the same LogIDs (a
+        # rollover interrupted before the sheet was trimmed) is harmless
+        if not shared_tables.available():
+            raise RuntimeError("archiving ActivityLogs needs pyarrow")
+        os.makedirs(self.directory, exist_ok=True)
+        with shared_tables.directory_lock(self.directory):
+            index = self._read_index()
+            for month, rows in cold.groupby(cold['Timestamp'].dt.strftime('%Y-%m'), sort=False):
+                if month in index:
+                    existing = shared_tables.table_to_frame(shared_tables.read_table(self._path(month)))
+                    rows = pd.concat([schemas.writable(existing), schemas.writable(rows)], ignore_index=True)
+                    rows = schemas.apply(SHEET, rows.drop_duplicates(subset='LogID', keep='last'))
+                rows = rows.sort_values('Timestamp').reset_index(drop=True)
+                shared_tables.write_table(self._path(month), shared_tables.frame_to_table(rows),
+                                          compression='zstd')
+                index[month] = {'rows': len(rows), 'accounts': sorted(rows['AccountID'].astype(str).unique())}
+            tmp = os.path.join(self.directory, f"{INDEX}.{os.getpid()}.tmp")
+            with open(tmp, 'w') as f:
+                json.dump(index, f)
+            os.replace(tmp, os.path.join(self.directory, INDEX))
@@ -0,0 +1,200 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Lightweight in-process metrics with Prometheus text exposition.
+#
+# Every thread records into its own shard (a plain dict only that thread writes to),
+# so the request path never takes a lock. A scrape copies each shard and merges them.
+# The shard of a thread that has exited is folded into one retired total, so
+# short-lived threads do not leave a shard behind each.
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_local = threading.local()
+_shards = []  # (thread, shard)
+_retired = {}  # samples of threads that have exited
+_shards_lock = threading.Lock()  # only taken when a thread records its first sample, and by scrapes
+_descriptions = {}
+
+
+def describe(name, kind, help_text):
+    _descriptions[name] = (kind, help_text)
+
+
+describe('flux_http_requests_total', 'counter', 'HTTP requests by route, method and status.')
+describe('flux_http_request_duration_seconds', 'histogram', 'Flask route latency.')
+describe('flux_db_call_duration_seconds', 'histogram', 'DatabaseManager method latency.')
+describe('flux_sheet_cache_total', 'counter', 'Sheet cache lookups by result (hit, miss, refresh, stale, shared, mirror).')
+describe('flux_sheet_load_duration_seconds', 'histogram', 'Time to fetch a sheet from its backing store.')
+describe('flux_sheet_save_duration_seconds', 'histogram', 'Time to write a sheet to its backing store.')
+describe('flux_sheet_save_bytes_total', 'counter', 'Bytes written per sheet save.')
+describe('flux_sheets_api_calls_total', 'counter', 'Google Sheets API calls by call name, retries included.')
+describe('flux_sheets_retries_total', 'counter', 'Sheets API calls retried after a 429 or 5xx, by call and code.')
+describe('flux_sheets_coalesced_total', 'counter', 'Sheet writes merged into one already queued for that sheet.')
+describe('flux_sheets_flush_retries_total', 'counter', 'Queued sheet writes that failed and were put back in the queue.')
+describe('flux_sheets_throttle_seconds', 'histogram', 'Time Sheets calls waited for the rate limiter, by priority.')
+describe('flux_mirror_syncs_total', 'counter', 'Mirror sync rounds by result (unchanged, pulled, partial, failed).')
+describe('flux_mirror_rows_pulled_total', 'counter', 'Rows the mirror took in from Sheets, by sheet.')
+describe('flux_wal_records_total', 'counter', 'Write-ahead log records by op (append, patch, replace).')
+describe('flux_wal_batches_total', 'counter', 'Write-ahead log group commits.')
+describe('flux_wal_commit_seconds', 'histogram', 'Time to write and fsync one write-ahead log batch.')
+describe('flux_wal_snapshot_seconds', 'histogram', 'Time to write a snapshot of every cached sheet.')
+describe('flux_model_inference_seconds', 'histogram', 'Risk model inference time.')
+describe('flux_bulk_rows_total', 'counter', 'Bulk import rows by sheet and result (imported, rejected).')
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = {}
+        with _shards_lock:
+            _retire()
+            _shards.append((threading.current_thread(), shard))
+        _local.shard = shard
+    return shard
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+
+def inc(name, value=1, **labels):
+    shard = _shard()
+    key = _key(name, labels)
+    shard[key] = shard.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    shard = _shard()
+    key = _key(name, labels)
+    hist = shard.get(key)
+    if hist is None:
+        # [per-bucket counts (+Inf last), sum, count]
+        hist = shard[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+    hist[0][bisect_left(BUCKETS, seconds)] += 1
+    hist[1] += seconds
+    hist[2] += 1
+
+
+@contextmanager
+def timer(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def timed(name, **labels):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start, **labels)
+        return wrapper
+    return decorator
+
+
+def instrument(cls, name='flux_db_call_duration_seconds'):
+    # Wrap every public method of a class so each call lands in `name{method=...}`
+    for attr, value in list(vars(cls).items()):
+        if callable(value) and not attr.startswith('_'):
+            setattr(cls, attr, timed(name, method=attr)(value))
+    return cls
+
+
+def install_flask(app):
+    from flask import g, request
+
+    @app.before_request
+    def _metrics_start():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _metrics_finish(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+            observe('flux_http_request_duration_seconds', time.perf_counter() - start,
+                    route=route, method=request.method)
+            inc('flux_http_requests_total', route=route, method=request.method, status=str(response.status_code))
+        return response
+
+
+def _merge(merged, shard):
+    for key, value in shard.copy().items():
+        if isinstance(value, list):
+            current = merged.get(key)
+            if current is None:
+                merged[key] = [list(value[0]), value[1], value[2]]
+            else:
+                current[0] = [a + b for a, b in zip(current[0], value[0])]
+                current[1] += value[1]
+                current[2] += value[2]
+        else:
+            merged[key] = merged.get(key, 0) + value
+
+
+def _retire():
+    # With _shards_lock held: fold the shards of exited threads into _retired
+    live = []
+    for thread, shard in _shards:
+        if thread.is_alive():
+            live.append((thread, shard))
+        else:
+            _merge(_retired, shard)
+    _shards[:] = live
+
+
+def snapshot():
+    merged = {}
+    with _shards_lock:
+        _retire()
+        shards = [shard for _, shard in _shards]
+        _merge(merged, _retired)
+    for shard in shards:
+        _merge(merged, shard)
+    return merged
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+def render_prometheus():
+    by_name = {}
+    for (name, labels), value in snapshot().items():
+        by_name.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name in sorted(by_name):
+        kind, help_text = _descriptions.get(name, ('untyped', ''))
+        if help_text:
+            lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(by_name[name]):
+            if isinstance(value, list):
+                counts, total, count = value
+                cumulative = 0
+                for bound, n in zip(BUCKETS + (float('inf'),), counts):
+                    cumulative += n
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', le))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+            else:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+    return '\n'.join(lines) + '\n'
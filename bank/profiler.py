@@ -0,0 +1,157 @@
+import os
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+# Opt-in statistical request profiler.
+#
+# A profiled request registers its thread with a single background sampler that
+# walks sys._current_frames() every few milliseconds. Samples are folded into
+# collapsed stacks ("outer;inner;leaf count"), the input format of flamegraph.pl
+# and speedscope, and written to PROFILE_DIR when the request finishes.
+#
+# Nothing is sampled unless profiling is armed, either with FLUX_PROFILE_SAMPLE_RATE
+# / FLUX_PROFILE_TRIGGERS or at runtime via POST /api/admin/profiler. While disarmed
+# the per-request cost is a single attribute check.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILE_DIR = os.environ.get('FLUX_PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+TRIGGER_HEADER = 'X-Flux-Profile'
+TRIGGER_PARAM = 'profile'
+
+
+class Profiler:
+    def __init__(self):
+        self.sample_rate = float(os.environ.get('FLUX_PROFILE_SAMPLE_RATE', 0) or 0)
+        self.allow_triggers = os.environ.get('FLUX_PROFILE_TRIGGERS', '') == '1'
+        self.route_filter = os.environ.get('FLUX_PROFILE_ROUTE', '')  # e.g. /api/admin/user/
+        self.interval = float(os.environ.get('FLUX_PROFILE_INTERVAL_MS', 5)) / 1000.0
+        self.max_files = int(os.environ.get('FLUX_PROFILE_MAX_FILES', 50))
+        self.directory = PROFILE_DIR
+        self.armed = False
+        self._active = {}  # thread id -> {stack: count}
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._rearm()
+
+    def _rearm(self):
+        self.armed = self.sample_rate > 0 or self.allow_triggers
+
+    def configure(self, sample_rate=None, allow_triggers=None, route_filter=None, interval_ms=None):
+        if sample_rate is not None:
+            self.sample_rate = max(0.0, min(1.0, float(sample_rate)))
+        if allow_triggers is not None:
+            self.allow_triggers = bool(allow_triggers)
+        if route_filter is not None:
+            self.route_filter = str(route_filter)
+        if interval_ms is not None:
+            self.interval = max(0.001, float(interval_ms) / 1000.0)
+        self._rearm()
+
+    def status(self):
+        return {
+            "armed": self.armed,
+            "sample_rate": self.sample_rate,
+            "allow_triggers": self.allow_triggers,
+            "route_filter": self.route_filter,
+            "interval_ms": self.interval * 1000.0,
+            "active": len(self._active),
+        }
+
+    def should_profile(self, path, headers, args):
+        if self.route_filter and not path.startswith(self.route_filter):
+            return False
+        if self.allow_triggers and (headers.get(TRIGGER_HEADER) == '1' or args.get(TRIGGER_PARAM) == '1'):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    # --- SAMPLING ---
+    def start(self):
+        ident = threading.get_ident()
+        with self._lock:
+            self._active[ident] = {}
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = threading.Thread(target=self._sample_loop, name='flux-profiler', daemon=True)
+                self._sampler.start()
+        return ident
+
+    def stop(self, ident):
+        with self._lock:
+            return self._active.pop(ident, {})
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._sampler = None
+                    return
+                targets = list(self._active.items())
+            frames = sys._current_frames()
+            for ident, counts in targets:
+                frame = frames.get(ident)
+                if frame is None or ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+                    stack.append(f"{module}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                key = ';'.join(reversed(stack))
+                counts[key] = counts.get(key, 0) + 1
+            time.sleep(self.interval)
+
+    # --- STORAGE ---
+    def save(self, counts, route, elapsed):
+        if not counts:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+        name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{slug}_{int(elapsed * 1000)}ms.collapsed"
+        with open(os.path.join(self.directory, name), 'w') as f:
+            for stack, n in sorted(counts.items()):
+                f.write(f"{stack} {n}\n")
+        self._prune()
+        return name
+
+    def _prune(self):
+        files = self.list_profiles()
+        for old in files[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.directory, old['name']))
+            except OSError:
+                pass
+
+    def list_profiles(self):
+        if not os.path.isdir(self.directory):
+            return []
+        names = [n for n in os.listdir(self.directory) if n.endswith('.collapsed')]
+        return [{"name": n, "bytes": os.path.getsize(os.path.join(self.directory, n))}
+                for n in sorted(names, reverse=True)]
+
+
+profiler = Profiler()
+
+
+def install_flask(app):
+    from flask import g, request
+
+    @app.before_request
+    def _profile_start():
+        if not profiler.armed:
+            return
+        if profiler.should_profile(request.path, request.headers, request.args):
+            g._profile = (profiler.start(), time.perf_counter())
+
+    @app.teardown_request
+    def _profile_finish(exc):
+        token = g.pop('_profile', None)
+        if token is None:
+            return
+        ident, started = token
+        route = request.url_rule.rule if request.url_rule is not None else request.path
+        profiler.save(profiler.stop(ident), route, time.perf_counter() - started)
@@ -0,0 +1,321 @@
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import zlib
+
+import pandas as pd
+
+# Allow running as `python bank/replay_logs.py` from the repo root
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import (HttpTransport, Recorder, TestClientTransport, build_fake_app,
+                       percentile, start_local_server)
+
+# Replays data_generator/banking_activity_logs.csv through the live API.
+#
+#   python bank/replay_logs.py --speed max --concurrency 8
+#   python bank/replay_logs.py --speed 86400 --limit 2000 --latency-ms 80
+#   python bank/replay_logs.py --url http://localhost:5000 --speed max
+#
+# Accounts are seeded from the CSV users (signup + opening deposit), then rows are
+# dispatched in Timestamp order at 1x, Nx or max speed. Rows for one account always
+# go to the same worker so per-account ordering is preserved.
+#
+#   Login    -> login, or a failed login when FailedLoginCount > 0
+#   Credit   -> deposit
+#   Debit    -> transfer
+#   Transfer -> add-beneficiary (first time BeneficiaryAdded is seen for that payee), then transfer
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CSV = os.path.join(BASE_DIR, "data_generator", "banking_activity_logs.csv")
+
+
+def load_events(csv_path, limit=None):
+    df = pd.read_csv(csv_path)
+    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
+    df = df.sort_values(by='Timestamp', kind='stable')
+    if limit:
+        df = df.head(limit)
+    return df.reset_index(drop=True)
+
+
+class Replayer:
+    def __init__(self, transport_factory, recorder, concurrency, threshold):
+        self.transport_factory = transport_factory
+        self.recorder = recorder
+        self.concurrency = concurrency
+        self.threshold = threshold
+        self.accounts = {}        # CSV AccountID -> live account details
+        self.labels = {}          # CSV AccountID -> max RiskLabel
+        self.payees = set()       # (CSV AccountID, BeneficiaryName) already added
+        self.transfer_outcomes = []  # (label, live risk score) per replayed transfer
+        self.lags = []
+        self.backlog_samples = []
+        self._lock = threading.Lock()
+
+    def call(self, transport, route, method, path, body=None):
+        start = time.perf_counter()
+        try:
+            status, payload = transport.request(method, path, body)
+        except Exception as e:
+            print(f"Request failed ({route}): {e}")
+            status, payload = 599, {}
+        self.recorder.record(route, time.perf_counter() - start, status)
+        return status, payload
+
+    # --- SEEDING ---
+    def seed(self, events):
+        users = events.drop_duplicates(subset='AccountID', keep='first')
+        transport = self.transport_factory()
+        seen_usernames = set()
+        for _, row in users.iterrows():
+            username = str(row['Username'])
+            if username.lower() in seen_usernames:
+                username = f"{username}_{row['AccountID']}"
+            seen_usernames.add(username.lower())
+            status, payload = self.call(transport, 'POST /api/auth/signup', 'POST', '/api/auth/signup', {
+                'username': username,
+                'password': str(row['Password']),
+                'fullName': row['FullName'],
+                'email': row['Email'],
+                'phone': str(row['Phone']),
+            })
+            if status != 201:
+                print(f"Seeding failed for {row['AccountID']}: {payload.get('message')}")
+                continue
+            user = payload['user']
+            self.accounts[row['AccountID']] = {
+                'account_id': user['AccountID'],
+                'account_number': str(user['AccountNumber']),
+                'ifsc': user['IFSC'],
+                'username': username,
+                'password': str(row['Password']),
+            }
+            if float(row['AccountBalance']) > 0:
+                self.call(transport, 'POST /api/transaction/deposit', 'POST', '/api/transaction/deposit', {
+                    'account_id': user['AccountID'], 'amount': float(row['AccountBalance']),
+                    'source': 'Replay Opening Balance'})
+        self.labels = events.groupby('AccountID')['RiskLabel'].max().to_dict()
+
+    def payee_for(self, row):
+        # Deterministically map a BeneficiaryName onto another seeded account
+        keys = sorted(self.accounts)
+        if len(keys) < 2:
+            return None
+        pick = zlib.crc32(str(row['BeneficiaryName']).encode()) % len(keys)
+        if keys[pick] == row['AccountID']:
+            pick = (pick + 1) % len(keys)
+        return self.accounts[keys[pick]]
+
+    # --- EVENT MAPPING ---
+    def replay_row(self, transport, row):
+        acc = self.accounts.get(row['AccountID'])
+        if acc is None:
+            return
+        tx_type = row['TransactionType']
+        session = {
+            'session_id': row['SessionID'],
+            'click_rate': float(row['ClickRate']),
+            'pages_visited': int(row['PagesVisited']),
+            'session_duration': int(row['SessionDuration']),
+            'device_trust_score': float(row['DeviceTrustScore']),
+            'channel': row['Channel'],
+            'new_device_login': int(row['NewDeviceLogin']),
+            'rapid_transactions': int(row['RapidTransactions']),
+        }
+
+        if tx_type == 'Login':
+            if int(row['FailedLoginCount']) > 0:
+                self.call(transport, 'POST /api/auth/login (fail)', 'POST', '/api/auth/login',
+                          {'username': acc['username'], 'password': acc['password'] + '-wrong'})
+            else:
+                self.call(transport, 'POST /api/auth/login', 'POST', '/api/auth/login',
+                          {'username': acc['username'], 'password': acc['password']})
+        elif tx_type == 'Credit':
+            self.call(transport, 'POST /api/transaction/deposit', 'POST', '/api/transaction/deposit',
+                      dict(session, account_id=acc['account_id'], amount=float(row['TransactionAmount']),
+                           source=row['Channel']))
+        else:
+            payee = self.payee_for(row)
+            if payee is None:
+                return
+            key = (row['AccountID'], row['BeneficiaryName'])
+            if tx_type == 'Transfer' and int(row['BeneficiaryAdded']) == 1 and key not in self.payees:
+                with self._lock:
+                    self.payees.add(key)
+                self.call(transport, 'POST /api/user/beneficiaries', 'POST', '/api/user/beneficiaries', {
+                    'account_id': acc['account_id'],
+                    'name': row['BeneficiaryName'],
+                    'account_number': payee['account_number'],
+                    'ifsc': payee['ifsc'],
+                    'nickname': row['BeneficiaryName'],
+                })
+            status, payload = self.call(transport, 'POST /api/transaction/transfer', 'POST', '/api/transaction/transfer',
+                                        dict(session, sender_id=acc['account_id'],
+                                             amount=float(row['TransactionAmount']),
+                                             recipient_account=payee['account_number'],
+                                             recipient_ifsc=payee['ifsc']))
+            if status == 200 and 'risk_score' in payload:
+                with self._lock:
+                    self.transfer_outcomes.append((int(row['RiskLabel']), float(payload['risk_score'])))
+
+    # --- DISPATCH ---
+    def run(self, events, speed):
+        queues = [queue.Queue() for _ in range(self.concurrency)]
+        shard_of = {acc: zlib.crc32(str(acc).encode()) % self.concurrency for acc in self.accounts}
+
+        def worker(q):
+            transport = self.transport_factory()
+            while True:
+                item = q.get()
+                if item is None:
+                    return
+                scheduled, row = item
+                with self._lock:
+                    self.lags.append(max(0.0, time.perf_counter() - scheduled))
+                self.replay_row(transport, row)
+
+        threads = [threading.Thread(target=worker, args=(q,), daemon=True) for q in queues]
+        for t in threads:
+            t.start()
+
+        ts0 = events['Timestamp'].iloc[0]
+        started = time.perf_counter()
+        last_sample = started
+        for row in events.to_dict('records'):
+            if row['AccountID'] not in shard_of:
+                continue
+            scheduled = started
+            if speed:
+                scheduled = started + (row['Timestamp'] - ts0).total_seconds() / speed
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            queues[shard_of[row['AccountID']]].put((scheduled, row))
+            now = time.perf_counter()
+            if now - last_sample >= 0.25:
+                self.backlog_samples.append(sum(q.qsize() for q in queues))
+                last_sample = now
+
+        dispatched = time.perf_counter()
+        for q in queues:
+            q.put(None)
+        while any(t.is_alive() for t in threads):
+            self.backlog_samples.append(sum(q.qsize() for q in queues))
+            time.sleep(0.25)
+        return dispatched - started, time.perf_counter() - started
+
+    # --- DETECTION QUALITY ---
+    def account_scores(self):
+        transport = self.transport_factory()
+        scores = {}
+        for csv_id, acc in self.accounts.items():
+            status, payload = transport.request('GET', f"/api/user/transactions/{acc['account_id']}")
+            rows = payload.get('transactions', []) if status == 200 else []
+            live = [float(r.get('CyberRiskScore') or 0) for r in rows]
+            scores[csv_id] = max(live) if live else 0.0
+        return scores
+
+    def detection_report(self, pairs):
+        tp = sum(1 for label, score in pairs if label == 1 and score >= self.threshold)
+        fp = sum(1 for label, score in pairs if label == 0 and score >= self.threshold)
+        fn = sum(1 for label, score in pairs if label == 1 and score < self.threshold)
+        tn = sum(1 for label, score in pairs if label == 0 and score < self.threshold)
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        return {'tp': tp, 'fp': fp, 'fn': fn, 'tn': tn,
+                'precision': precision, 'recall': recall, 'f1': f1}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay banking_activity_logs.csv through the live API")
+    parser.add_argument('--csv', default=DEFAULT_CSV)
+    parser.add_argument('--speed', default='max', help="Replay speed: 1 (real time), N (N x faster) or 'max'")
+    parser.add_argument('--limit', type=int, default=None, help="Only replay the first N rows by timestamp")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--threshold', type=float, default=75.0,
+                        help="CyberRiskScore at or above which the live path counts as a detection")
+    parser.add_argument('--mode', choices=['client', 'server'], default='client')
+    parser.add_argument('--url', help="Replay against an already running server")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Fake Sheets latency per API call")
+    parser.add_argument('--json', dest='json_out', help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    speed = 0.0 if str(args.speed).lower() == 'max' else float(args.speed)
+
+    server = None
+    if args.url:
+        transport_factory = lambda: HttpTransport(args.url)
+    else:
+        flask_app, _ = build_fake_app(args.latency_ms / 1000.0, 0.0)
+        if args.mode == 'server':
+            server, base_url = start_local_server(flask_app)
+            transport_factory = lambda: HttpTransport(base_url)
+        else:
+            transport_factory = lambda: TestClientTransport(flask_app)
+
+    events = load_events(args.csv, args.limit)
+    seed_recorder = Recorder()
+    replay_recorder = Recorder()
+    replayer = Replayer(transport_factory, seed_recorder, args.concurrency, args.threshold)
+
+    print(f"Seeding {events['AccountID'].nunique()} accounts from {args.csv} ...")
+    seed_start = time.perf_counter()
+    replayer.seed(events)
+    print(f"Seeded {len(replayer.accounts)} accounts in {time.perf_counter() - seed_start:.1f}s")
+
+    replayer.recorder = replay_recorder
+    print(f"Replaying {len(events)} events at {'max' if not speed else f'{speed:g}x'} speed ...")
+    dispatch_time, elapsed = replayer.run(events, speed)
+
+    routes = replay_recorder.summary(elapsed)
+    calls = sum(r['count'] for r in routes.values())
+    lags = sorted(replayer.lags)
+    backlog = replayer.backlog_samples or [0]
+
+    account_pairs = [(int(replayer.labels.get(csv_id, 0)), score)
+                     for csv_id, score in replayer.account_scores().items()]
+    report = {
+        'events': len(lags),
+        'api_calls': calls,
+        'elapsed_s': elapsed,
+        'dispatch_s': dispatch_time,
+        'events_per_s': len(lags) / elapsed if elapsed else 0.0,
+        'calls_per_s': calls / elapsed if elapsed else 0.0,
+        'backlog_max': max(backlog),
+        'backlog_mean': sum(backlog) / len(backlog),
+        'lag_p50_ms': percentile(lags, 50) * 1000,
+        'lag_p99_ms': percentile(lags, 99) * 1000,
+        'lag_max_ms': (lags[-1] if lags else 0.0) * 1000,
+        'routes': routes,
+        'detection_transfers': replayer.detection_report(replayer.transfer_outcomes),
+        'detection_accounts': replayer.detection_report(account_pairs),
+    }
+
+    print(f"\n--- REPLAY: {report['events']} events, {calls} API calls in {elapsed:.1f}s ---")
+    print(f"Sustained throughput: {report['events_per_s']:.1f} events/s ({report['calls_per_s']:.1f} calls/s)")
+    print(f"Backlog: max {report['backlog_max']} queued, mean {report['backlog_mean']:.1f}; "
+          f"dispatch lag p50 {report['lag_p50_ms']:.1f}ms p99 {report['lag_p99_ms']:.1f}ms max {report['lag_max_ms']:.1f}ms")
+    print(f"{'route':<36} {'count':>7} {'err':>5} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for route, r in routes.items():
+        print(f"{route:<36} {r['count']:>7} {r['errors']:>5} {r['p50_ms']:>8.1f}ms {r['p95_ms']:>7.1f}ms {r['p99_ms']:>7.1f}ms")
+    for scope in ('transfers', 'accounts'):
+        d = report[f'detection_{scope}']
+        print(f"Detection vs RiskLabel ({scope}, score >= {args.threshold:g}): precision {d['precision']:.3f} "
+              f"recall {d['recall']:.3f} f1 {d['f1']:.3f} (tp={d['tp']} fp={d['fp']} fn={d['fn']} tn={d['tn']})")
+
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+import pandas as pd
+
+# Declared column types for the cached sheet frames.
+#
+# get_all_records() and read_excel hand back object columns: repeated strings stored
+# once per cell, timestamps as text that every query sorts lexically, numbers mixed with
+# '' for blank cells. Frames are converted once when they enter the cache:
+#   category   low-cardinality text (ids repeated across log rows, types, statuses)
+#   datetime   parsed with the sheet's own format, written back in the same format
+#   float/int  fixed numeric types, blanks and junk become 0 (what safe_float did)
+# Columns not listed keep whatever type they were loaded with, as free text such as
+# ActivityLogs.Description does: nearly every value is unique, so a category would only
+# add a codes array and rebuild its categories on each append. to_storage() turns a
+# typed frame back into the plain values the workbook and Sheets hold.
+
+TIMESTAMP = '%Y-%m-%d %H:%M:%S'
+DATE = '%Y-%m-%d'
+
+SCHEMAS = {
+    'Users': {
+        'AccountBalance': 'float64',
+        'KYCStatus': 'category',
+        'Status': 'category',
+        'CreatedAt': ('datetime', TIMESTAMP),
+    },
+    'ActivityLogs': {
+        'AccountID': 'category',
+        'Timestamp': ('datetime', TIMESTAMP),
+        'CyberRiskScore': 'float64',
+        'TransactionAmount': 'float64',
+        'TransactionType': 'category',
+        'Channel': 'category',
+        'SessionDuration': 'float64',
+        'DeviceTrustScore': 'float64',
+    },
+    'ML_Features': {
+        'AccountID': 'category',
+        'AccountBalance': 'float64',
+        'KYCStatus': 'category',
+        'TransactionType': 'category',
+        'TransactionAmount': 'float64',
+        'SessionDuration': 'float64',
+        'LoginHour': 'int32',
+        'FailedLoginCount': 'int32',
+        'NewDeviceLogin': 'int32',
+        'PasswordChanged': 'int32',
+        'Channel': 'category',
+        'PagesVisited': 'int32',
+        'ClickRate': 'float64',
+        'RapidTransactions': 'int32',
+        'BeneficiaryAdded': 'int32',
+        'LargeTransaction': 'int32',
+        'DeviceTrustScore': 'float64',
+        'CyberRiskScore': 'float64',
+    },
+    'Beneficiaries': {
+        'AccountID': 'category',
+    },
+    'KYCRequests': {
+        'AccountID': 'category',
+        'DocumentType': 'category',
+        'Status': 'category',
+        'SubmissionDate': ('datetime', DATE),
+    },
+    'AuditLogs': {
+        'Timestamp': ('datetime', TIMESTAMP),
+        'AdminID': 'category',
+        'Action': 'category',
+        'AccountID': 'category',
+    },
+}
+
+
+def _as_text(values):
+    # Category labels are always strings, so a stray 0 or number does not split a category
+    if pd.api.types.infer_dtype(values, skipna=True) in ('string', 'empty'):
+        return values
+    return values.map(lambda v: v if isinstance(v, str) or pd.isna(v) else str(v))
+
+
+def _convert(values, kind):
+    # Converted column, or None when it already has the declared type
+    if kind == 'category':
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            return None
+        return _as_text(values).astype('category')
+    if isinstance(kind, tuple):
+        if pd.api.types.is_datetime64_any_dtype(values):
+            return None
+        return pd.to_datetime(values.replace('', None), format=kind[1], errors='coerce')
+    if values.dtype == kind:
+        return None
+    return pd.to_numeric(values, errors='coerce').fillna(0).astype(kind)
+
+
+def apply(sheet_name, df):
+    schema = SCHEMAS.get(sheet_name)
+    if not schema or df.empty:
+        return df
+    changed = {}
+    for col, kind in schema.items():
+        if col in df.columns:
+            values = _convert(df[col], kind)
+            if values is not None:
+                changed[col] = values
+    return df.assign(**changed) if changed else df
+
+
+def append(sheet_name, df, new):
+    # df followed by the rows of `new`, keeping df's column types: the new rows are
+    # converted on their own and categories widened, rather than turning every column
+    # of df back into objects and re-converting it
+    new = apply(sheet_name, new.copy())
+    widened = {}
+    for col in df.columns:
+        if col in new.columns and isinstance(df[col].dtype, pd.CategoricalDtype):
+            extra = pd.Index(new[col].dropna().unique()).difference(df[col].cat.categories)
+            widened[col] = df[col].cat.add_categories(extra) if len(extra) else df[col]
+            new[col] = new[col].astype(object).astype(widened[col].dtype)
+    if widened:
+        df = df.assign(**widened)
+    return pd.concat([df, new], ignore_index=True)
+
+
+def writable(df):
+    # Copy for the write paths: categories back to plain objects so rows can be
+    # appended and cells set to values that are not an existing category yet
+    df = df.copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object)
+    return df
+
+
+def to_storage(sheet_name, df):
+    schema = SCHEMAS.get(sheet_name) or {}
+    out = None
+    for col, kind in schema.items():
+        if col not in df.columns:
+            continue
+        if isinstance(kind, tuple) and pd.api.types.is_datetime64_any_dtype(df[col]):
+            out = df.copy() if out is None else out
+            out[col] = df[col].dt.strftime(kind[1]).fillna('')
+        elif kind == 'category' and isinstance(df[col].dtype, pd.CategoricalDtype):
+            out = df.copy() if out is None else out
+            out[col] = df[col].astype(object)
+    return df if out is None else out
+
+
+def to_records(sheet_name, df):
+    # list of dicts with datetimes rendered as they are stored, ready for jsonify
+    return to_storage(sheet_name, df).to_dict('records')
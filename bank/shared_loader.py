@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+import time
+
+# Allow running as `python bank/shared_loader.py` from the repo root
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database_manager import SHEETS, DatabaseManager
+from structured_log import get_logger
+
+# Loader for the shared table store (see shared_tables.py).
+#
+#   python bank/shared_loader.py &
+#   FLUX_SHARED_CACHE=1 gunicorn -w 4 bank.app:app
+#
+# This is the only process that reads sheets from Google Sheets (or the workbook). It
+# refetches every --interval seconds and publishes a sheet whenever it changed, so Sheets
+# read traffic no longer grows with the worker count and each worker maps the same
+# tables instead of holding its own copies. Workers publish their own writes directly.
+
+log = get_logger('flux.loader')
+
+
+def sync_once(db, pending):
+    for sheet in SHEETS:
+        started = time.time()
+        before = db._sheet_version.get(sheet)
+        df = db._peek_sheet(sheet)
+        if db._sheet_version.get(sheet) != before:
+            pending.add(sheet)
+        if sheet in pending:
+            # Skipped while a worker's write may not be in Sheets yet, or when the fetch
+            # started before the last one got there (SharedTables.publish)
+            version = db.shared.publish(sheet, df, if_older_than=started)
+            if version is not None:
+                pending.discard(sheet)
+                log.info("sheet_published", sheet=sheet, version=version, rows=len(df))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the shared table store in sync with Sheets")
+    parser.add_argument('--interval', type=float, default=15.0, help="Seconds between refetches")
+    parser.add_argument('--once', action='store_true', help="Publish every sheet once and exit")
+    args = parser.parse_args()
+
+    db = DatabaseManager(connect_mode='eager', shared_role='loader')
+    if db.shared is None:
+        sys.exit("shared cache unavailable: pip install pyarrow")
+    db.CACHE_TTL = 0
+    pending = set(SHEETS)
+    log.info("loader_started", directory=db.shared.directory, interval=args.interval)
+    while True:
+        sync_once(db, pending)
+        if args.once:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
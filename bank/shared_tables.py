@@ -0,0 +1,214 @@
+import fcntl
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional: pip install pyarrow
+    pa = None
+
+# Sheet tables shared by every worker on the host.
+#
+# Each table is an uncompressed Arrow IPC file in DIRECTORY (tmpfs under /dev/shm when
+# available) plus one manifest.json naming the current file and version of every sheet:
+#
+#   {"Users": {"file": "Users-42.arrow", "version": 42, "accounts": ["ACC-1"], "published_at": ...}}
+#
+# Readers memory-map the file and build their frame on its buffers (table_to_frame with
+# zero_copy), so the sheet lives once in the page cache rather than once per worker,
+# and notice changes by stat()ing the manifest (a new mtime is the version
+# notification). Publishing writes a new file and swaps the manifest under an
+# flock; the previous file is unlinked, which is safe for readers still mapping it.
+# "accounts" lists the AccountIDs touched by that version (null = whole sheet) so a
+# reader one version behind can invalidate only those accounts.
+#
+# A worker's publish lands before its write reaches Sheets, so the entry also keeps
+# "unsynced" ({pid: published_at} of workers whose writes Sheets may not have yet) and
+# "synced_at" (when the last of them went through). The loader only publishes a fetch
+# that started after both, so it never replaces a worker's write with an older copy.
+
+DIRECTORY = os.environ.get('FLUX_SHARED_DIR') or os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'flux-tables')
+MANIFEST = 'manifest.json'
+
+# Columns pyarrow cannot type as-is (get_all_records mixes numbers with '' for blank
+# cells) are stored with the blanks as nulls and restored on read
+_BLANKS = b'flux.blanks_as_empty'
+_TEXT = b'flux.text'
+
+
+def available():
+    return pa is not None
+
+
+def frame_to_table(df):
+    arrays, blanks, text = [], [], []
+    for col in df.columns:
+        values = df[col]
+        try:
+            arrays.append(pa.array(values, from_pandas=True))
+            continue
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+        numeric = pd.to_numeric(values.replace('', None), errors='coerce')
+        if numeric.notna().sum() == (values != '').sum():
+            if (numeric.dropna() % 1 == 0).all():
+                numeric = numeric.astype('Int64')
+            arrays.append(pa.array(numeric, from_pandas=True))
+            blanks.append(str(col))
+        else:
+            arrays.append(pa.array(values.astype(str)))
+            text.append(str(col))
+    metadata = {_BLANKS: json.dumps(blanks), _TEXT: json.dumps(text)}
+    return pa.Table.from_arrays(arrays, names=[str(c) for c in df.columns], metadata=metadata)
+
+
+def _text_dtype():
+    # Arrow-backed strings (pandas 3's default `str`), which view the table's buffers
+    try:
+        return pd.StringDtype('pyarrow', na_value=float('nan'))
+    except TypeError:  # pandas < 2.3
+        return pd.StringDtype('pyarrow')
+
+
+def table_to_frame(table, zero_copy=False):
+    # zero_copy: text columns stay Arrow strings and dictionary columns become
+    # categoricals over the dictionary indices, so a memory-mapped table is not copied
+    # into the process (numeric and datetime columns without nulls already are not)
+    metadata = table.schema.metadata or {}
+    blanks = json.loads(metadata.get(_BLANKS, b'[]'))
+    mapper = None
+    if zero_copy:
+        text = _text_dtype()
+        mapper = {pa.string(): text, pa.large_string(): text}.get
+    df = table.to_pandas(split_blocks=True, types_mapper=mapper)
+    for col in blanks:
+        restored = table.column(col).to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get).astype(object)
+        df[col] = restored.where(restored.notna(), '')
+    return df
+
+
+def read_table(path):
+    # Zero-copy: the table's buffers point straight into the mapped file
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def write_table(path, table, compression=None):
+    # compression ('zstd'/'lz4') trades the zero-copy mapping for size, for cold data
+    tmp = f"{path}.{os.getpid()}.tmp"
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    with pa.OSFile(tmp, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def _alive(pid):
+    # A worker that died with unsynced writes must not hold the loader off forever
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def directory_lock(directory):
+    # Host-wide exclusive lock, for read-modify-write of files other processes also update
+    with open(os.path.join(directory, '.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class SharedTables:
+    def __init__(self, directory=DIRECTORY):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.manifest_path = os.path.join(directory, MANIFEST)
+        self._manifest = {}
+        self._manifest_mtime = None
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def manifest(self):
+        # Re-read only when the manifest changed; a stat is the whole cost otherwise
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        if mtime != self._manifest_mtime:
+            self._manifest = self._read_manifest()
+            self._manifest_mtime = mtime
+        return self._manifest
+
+    def lookup(self, sheet_name):
+        return self.manifest().get(sheet_name)
+
+    def read(self, entry):
+        # Published frames are already typed (schemas.apply), so this is the cached frame
+        return table_to_frame(read_table(os.path.join(self.directory, entry['file'])), zero_copy=True)
+
+    def _write_manifest(self, manifest):
+        tmp = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self.manifest_path)
+
+    def publish(self, sheet_name, df, accounts=None, if_older_than=None, unsynced=False):
+        # Returns the new version, or None when skipped because a write landed after
+        # `if_older_than` (the loader's fetch start) or Sheets may still lack one.
+        # `unsynced`: a worker's write, not in Sheets until mark_synced()
+        table = frame_to_table(df)
+        with directory_lock(self.directory):
+            manifest = self._read_manifest()
+            previous = manifest.get(sheet_name) or {}
+            waiting = {pid: t for pid, t in previous.get('unsynced', {}).items() if _alive(int(pid))}
+            if previous and if_older_than is not None and (
+                    waiting or max(previous['published_at'], previous.get('synced_at', 0)) > if_older_than):
+                return None
+            now = time.time()
+            if unsynced:
+                waiting[str(os.getpid())] = now
+            version = previous.get('version', 0) + 1
+            name = f"{sheet_name}-{version}.arrow"
+            write_table(os.path.join(self.directory, name), table)
+            manifest[sheet_name] = {
+                'file': name, 'version': version, 'published_at': now,
+                'accounts': [str(a) for a in accounts] if accounts is not None else None,
+                'unsynced': waiting, 'synced_at': previous.get('synced_at', 0),
+            }
+            self._write_manifest(manifest)
+            if previous:
+                try:
+                    os.unlink(os.path.join(self.directory, previous['file']))
+                except FileNotFoundError:
+                    pass
+        return version
+
+    def mark_synced(self, sheet_name, through):
+        # This process's writes to the sheet published up to `through` are now in Sheets
+        with directory_lock(self.directory):
+            manifest = self._read_manifest()
+            entry = manifest.get(sheet_name)
+            pid = str(os.getpid())
+            if entry is None or entry.get('unsynced', {}).get(pid, float('inf')) > through:
+                return
+            del entry['unsynced'][pid]
+            entry['synced_at'] = time.time()
+            self._write_manifest(manifest)
@@ -0,0 +1,227 @@
+import os
+import threading
+import time
+import zlib
+
+import pandas as pd
+from gspread.utils import numericise_all, rowcol_to_a1
+
+import metrics
+import schemas
+import shared_tables
+import structured_log
+
+log = structured_log.get_logger('flux.mirror')
+
+# Local mirror of the spreadsheet for cloud mode, enabled with FLUX_MIRROR=1.
+#
+# The cached frames become the mirror: once a sheet is loaded it never expires, so a
+# read never waits on Google and keeps working while Sheets is unreachable. Writes go
+# into it first and reach Sheets through the scheduler's flush queue, as before. A
+# background job brings in changes made elsewhere (other hosts, edits by hand) every
+# FLUX_MIRROR_INTERVAL seconds, pulling as little as it can:
+#
+#   1. the Drive modifiedTime of the spreadsheet; unchanged since the last complete
+#      pull means nothing to do (one request per interval)
+#   2. append-only sheets: the header plus everything from the mirror's last row on, in
+#      one batch_get. If that last row is still there and unchanged, only the rows past
+#      it are new; otherwise the sheet was rewritten and is pulled whole
+#   3. other sheets are pulled whole, compared in blocks of FLUX_MIRROR_BLOCK rows
+#      against checksums of the previous pull, and only the accounts in changed blocks
+#      are invalidated for conditional GETs
+#
+# A sheet with writes of ours still queued is skipped until they have gone out.
+# With pyarrow installed every sheet is also kept on disk (<workbook>.mirror/, or
+# FLUX_MIRROR_DIR) so a restart serves reads from the last copy straight away.
+
+INTERVAL = float(os.environ.get('FLUX_MIRROR_INTERVAL', 15))
+BLOCK = int(os.environ.get('FLUX_MIRROR_BLOCK', 500))
+APPEND_ONLY = ('ActivityLogs', 'ML_Features', 'AuditLogs', 'Beneficiaries')
+
+
+def _cell(value):
+    # Cells compared the way both sides can render them: numbers as floats, blanks as ''
+    if value is None or value == '' or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _frame(header, rows):
+    # Same values and types get_all_records would have produced
+    width = len(header)
+    return pd.DataFrame([numericise_all((list(r) + [''] * width)[:width]) for r in rows], columns=header)
+
+
+def block_sums(rows, block=BLOCK):
+    return [zlib.crc32('\x1e'.join('\x1f'.join(map(str, r)) for r in rows[i:i + block]).encode())
+            for i in range(0, len(rows), block)]
+
+
+class SheetMirror:
+    def __init__(self, db, directory, sheets, interval=INTERVAL, block=BLOCK):
+        self.db = db
+        self.sheets = sheets
+        self.directory = directory if shared_tables.available() else None
+        self.interval = interval
+        self.block = block
+        self.modified = None  # Drive modifiedTime of the last complete pull
+        self.sums = {}
+        self.last_sync = None
+        self.last_error = None
+        self._dirty = set()
+        self._lock = threading.Lock()
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, sheet_name):
+        return os.path.join(self.directory, f"{sheet_name}.feather")
+
+    def load(self, sheet_name):
+        # Disk copy of the sheet, or None
+        if not self.directory:
+            return None
+        try:
+            return shared_tables.table_to_frame(shared_tables.read_table(self._path(sheet_name)))
+        except (FileNotFoundError, shared_tables.pa.ArrowInvalid):
+            return None
+
+    def touch(self, sheet_name):
+        with self._lock:
+            self._dirty.add(sheet_name)
+
+    def save(self):
+        # Write changed sheets to disk; done by the sync job, off the request path
+        if not self.directory:
+            return
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        for sheet_name in dirty:
+            df = self.db._cache.get(sheet_name)
+            if df is None:
+                continue
+            path = self._path(sheet_name)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            shared_tables.write_table(tmp, shared_tables.frame_to_table(df))
+            os.replace(tmp, path)
+
+    def status(self):
+        return {
+            'last_sync_age': None if self.last_sync is None else round(time.time() - self.last_sync, 1),
+            'last_error': self.last_error,
+            'pending_writes': self.db.sheets.backlog(),
+        }
+
+    def start(self):
+        threading.Thread(target=self._run, name='flux-mirror', daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                with self.db.sheets.background():
+                    self.sync_once()
+            except Exception as e:
+                self.last_error = str(e)
+                metrics.inc('flux_mirror_syncs_total', result='failed')
+                log.error("mirror_sync_failed", error=str(e))
+            time.sleep(self.interval)
+
+    # --- PULL ---
+    def sync_once(self):
+        db = self.db
+        modified = db._api('get_lastUpdateTime', db.sh.get_lastUpdateTime)
+        if modified == self.modified:
+            metrics.inc('flux_mirror_syncs_total', result='unchanged')
+        else:
+            # One metadata request for every worksheet handle instead of one per sheet
+            worksheets = {ws.title: ws for ws in db._api('worksheets', db.sh.worksheets)}
+            db._worksheets.update(worksheets)
+            complete = True
+            for sheet_name in self.sheets:
+                if sheet_name not in worksheets:
+                    continue
+                if db.sheets.pending(sheet_name) or not self._pull(sheet_name, worksheets[sheet_name]):
+                    complete = False
+            if complete:
+                self.modified = modified
+            metrics.inc('flux_mirror_syncs_total', result='pulled' if complete else 'partial')
+        self.save()
+        self.last_sync = time.time()
+        self.last_error = None
+
+    def _pull(self, sheet_name, ws):
+        # False when a local write landed during the pull and the sheet was left for
+        # the next round
+        db = self.db
+        current = db._cache.get(sheet_name)
+        version = db._sheet_version.get(sheet_name)
+        if sheet_name in APPEND_ONLY and current is not None and not current.empty:
+            header, tail = self._tail(sheet_name, ws, current)
+            if tail is not None:
+                if not tail:
+                    return True
+                new = _frame(header, tail)
+                accounts = set(new['AccountID'].astype(str)) if 'AccountID' in new.columns else None
+                with db._write_lock(sheet_name):
+                    if not self._unchanged_since(sheet_name, version):
+                        return False
+                    merged = db._set_cached(sheet_name, schemas.append(sheet_name, current, new), accounts, len(new),
+                                            pulled=True)
+                    if sheet_name == 'ActivityLogs':
+                        db._advance_profiles(current, merged, len(new))
+                self._applied(sheet_name, accounts, len(new))
+                return True
+        values = db._api('get_all_values', ws.get_all_values)
+        return self._apply_full(sheet_name, current, version, values)
+
+    def _tail(self, sheet_name, ws, current):
+        # (header, rows past the mirror's last row), or (None, None) when that row is
+        # not where the mirror has it
+        rows = len(current)
+        last = rowcol_to_a1(1, len(current.columns)).rstrip('0123456789')
+        header, tail = self.db._api('batch_get', ws.batch_get, [f"A1:{last}1", f"A{rows + 1}:{last}"])
+        local = schemas.to_storage(sheet_name, current.iloc[[-1]]).values.tolist()[0]
+        width = len(current.columns)
+        if (not header or list(header[0]) != list(map(str, current.columns)) or not tail
+                or [_cell(v) for v in (list(tail[0]) + [''] * width)[:width]] != [_cell(v) for v in local]):
+            return None, None
+        return list(header[0]), tail[1:]
+
+    def _apply_full(self, sheet_name, current, version, values):
+        header, rows = (list(values[0]), values[1:]) if values else ([], [])
+        sums = block_sums(rows, self.block)
+        previous = self.sums.get(sheet_name)
+        self.sums[sheet_name] = sums
+        if previous == sums and current is not None:
+            return True
+        typed = schemas.apply(sheet_name, _frame(header, rows))
+        if current is not None and current.equals(typed):
+            return True
+        accounts = None
+        if previous is not None and current is not None and list(current.columns) == header \
+                and len(current) <= len(typed) and 'AccountID' in typed.columns:
+            changed = [i for i, s in enumerate(sums) if i >= len(previous) or previous[i] != s]
+            ids = typed['AccountID'].astype(str).to_numpy()
+            accounts = {a for i in changed for a in ids[i * self.block:(i + 1) * self.block]}
+        with self.db._write_lock(sheet_name):
+            if not self._unchanged_since(sheet_name, version):
+                self.sums.pop(sheet_name, None)
+                return False
+            self.db._set_cached(sheet_name, typed, accounts, pulled=True)
+        self._applied(sheet_name, accounts, len(typed))
+        return True
+
+    def _unchanged_since(self, sheet_name, version):
+        # A local write landed while we were fetching: its flush is queued, so leave
+        # the sheet for the next round rather than overwrite it. Checked under the
+        # sheet's write lock, which the update that follows is made under too.
+        return self.db._sheet_version.get(sheet_name) == version and not self.db.sheets.pending(sheet_name)
+
+    def _applied(self, sheet_name, accounts, rows):
+        # Cached through DatabaseManager._set_cached (versions, WAL, shared store, and
+        # marked for the disk copy); this is the bookkeeping on top
+        metrics.inc('flux_mirror_rows_pulled_total', rows, sheet=sheet_name)
+        log.info("mirror_sheet_updated", sheet=sheet_name, rows=rows,
+                 accounts=None if accounts is None else len(accounts))
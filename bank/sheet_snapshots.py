@@ -0,0 +1,73 @@
+import json
+import os
+
+import shared_tables
+
+# Feather (Arrow IPC) snapshots of the offline workbook.
+#
+# Parsing flux_financial_database.xlsx through openpyxl is by far the slowest step of
+# an offline cold start, so every sheet is also kept as <workbook>.snapshots/<sheet>.feather
+# and loaded by memory-mapping it. index.json records the workbook's mtime and size the
+# snapshots were built from, plus the sheet names it contained; when the workbook changes
+# (edited by hand, or replaced) the stamp no longer matches and the next load parses the
+# workbook once and rebuilds every snapshot. DatabaseManager refreshes them itself after
+# each save, from the frames it already has in memory.
+
+INDEX = 'index.json'
+
+
+class SheetSnapshots:
+    def __init__(self, workbook):
+        self.workbook = workbook
+        self.directory = os.path.splitext(workbook)[0] + '.snapshots'
+
+    def _stamp(self):
+        st = os.stat(self.workbook)
+        return f"{st.st_mtime_ns}:{st.st_size}"
+
+    def _path(self, sheet_name):
+        return os.path.join(self.directory, f"{sheet_name}.feather")
+
+    def _fresh_index(self):
+        try:
+            with open(os.path.join(self.directory, INDEX)) as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return index if index['source'] == self._stamp() else None
+
+    def _read(self, sheet_name):
+        return shared_tables.table_to_frame(shared_tables.read_table(self._path(sheet_name)))
+
+    def load(self, sheet_name):
+        # Returns the sheet's frame, None when the snapshots are stale or missing, and
+        # raises KeyError when the workbook is known not to have this sheet
+        index = self._fresh_index()
+        if index is None:
+            return None
+        if sheet_name not in index['sheets']:
+            raise KeyError(sheet_name)
+        try:
+            return self._read(sheet_name)
+        except (FileNotFoundError, shared_tables.pa.ArrowInvalid):
+            return None
+
+    def load_all(self):
+        index = self._fresh_index()
+        if index is None:
+            return None
+        try:
+            return {name: self._read(name) for name in index['sheets']}
+        except (FileNotFoundError, shared_tables.pa.ArrowInvalid):
+            return None
+
+    def rebuild(self, all_sheets):
+        # `all_sheets` is {sheet_name: DataFrame} exactly as just read from / written to the workbook
+        os.makedirs(self.directory, exist_ok=True)
+        for name, df in all_sheets.items():
+            shared_tables.write_table(self._path(name), shared_tables.frame_to_table(df))
+        index_path = os.path.join(self.directory, INDEX)
+        tmp = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'source': self._stamp(), 'sheets': list(all_sheets)}, f)
+        os.replace(tmp, index_path)
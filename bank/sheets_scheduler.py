@@ -0,0 +1,274 @@
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import gspread
+
+import metrics
+import structured_log
+
+log = structured_log.get_logger('flux.sheets')
+
+# Rate-limit-aware front for every Google Sheets API call DatabaseManager makes.
+#
+#   token bucket  FLUX_SHEETS_QUOTA_PER_MIN calls per minute (Sheets allows 60 per user
+#                 per minute by default), with bursts of up to FLUX_SHEETS_BURST
+#   priorities    a call waiting for a token is served READ (a request is blocked on a
+#                 cache miss) before WRITE (a caller waits for its save) before FLUSH
+#                 (background writes nobody waits on)
+#   coalescing    writes are queued per worksheet and sent by one flush thread. A newer
+#                 full-sheet save replaces whatever is still queued for that worksheet,
+#                 and appends are merged into the queued save or append, so a burst of
+#                 writes to one sheet costs one round of API calls
+#   backoff       429 and 5xx responses are retried with jittered exponential backoff,
+#                 up to FLUX_SHEETS_MAX_ATTEMPTS tries; a 429 also pauses the bucket,
+#                 since the quota is shared by every caller
+#   retry         a flush that still fails goes back to the head of the queue, merged
+#                 with anything queued for that worksheet since, and is tried again after
+#                 a growing pause. The sheet stays pending() until it goes through, so
+#                 the cache is never refreshed from a Sheets copy missing that write.
+#
+# FLUX_SHEETS_ASYNC_WRITES=0 makes the writing request wait until its flush reached Sheets,
+# through any retries (the writes are still coalesced with any queued for the same
+# worksheet).
+
+QUOTA_PER_MIN = float(os.environ.get('FLUX_SHEETS_QUOTA_PER_MIN', 60))
+BURST = int(os.environ.get('FLUX_SHEETS_BURST', 10))
+BACKOFF = float(os.environ.get('FLUX_SHEETS_BACKOFF', 1.0))
+MAX_BACKOFF = 64.0
+MAX_ATTEMPTS = int(os.environ.get('FLUX_SHEETS_MAX_ATTEMPTS', 6))
+ASYNC_WRITES = os.environ.get('FLUX_SHEETS_ASYNC_WRITES', '1') == '1'
+
+READ, WRITE, FLUSH = 0, 1, 2
+RETRY_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    def __init__(self, per_minute, capacity):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self, now):
+        # 0 when a token was taken, else the seconds until one is available
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def empty(self):
+        self.tokens = min(self.tokens, 0.0)
+
+
+class Flush:
+    # Queued write for one worksheet: 'save' values are the whole sheet, header first;
+    # 'append' values are rows to add
+    def __init__(self, sheet, kind, values, seq=0):
+        self.sheet = sheet
+        self.kind = kind
+        self.values = values
+        self.seq = seq  # caller's sequence number of the latest write merged in
+        self.writes = 1
+        self.queued_at = time.time()  # latest write merged in
+        self.done = threading.Event()  # set once the flush reached Sheets
+        self.waiters = [self.done]  # plus those of failed flushes merged in
+
+
+class SheetsScheduler:
+    def __init__(self, writer, quota_per_min=QUOTA_PER_MIN, burst=BURST, backoff=BACKOFF,
+                 max_attempts=MAX_ATTEMPTS, async_writes=ASYNC_WRITES, synced=None):
+        # writer(sheet, kind, values) performs a flush; it runs on the flush thread
+        self.writer = writer
+        self.bucket = TokenBucket(quota_per_min, burst)
+        self.backoff = backoff
+        self.max_attempts = max_attempts
+        self.async_writes = async_writes
+        # Called with (sheet, queued_at, seq) after each flush that went through: the
+        # writes up to `seq` are in Sheets. queued_at is None while more writes are
+        # queued for the sheet, else every write queued up to then is in Sheets.
+        self.synced = synced
+        self._cond = threading.Condition()
+        self._waiting = []        # (priority, ticket) of callers waiting for a token
+        self._tickets = 0
+        self._paused_until = 0.0
+        self._flushes = OrderedDict()
+        self._inflight = set()
+        self._local = threading.local()
+        self._thread = None
+        self.failed = 0
+
+    # --- CALLS ---
+    def call(self, name, fn, *args, **kwargs):
+        priority = getattr(self._local, 'priority', READ)
+        attempt = 0
+        while True:
+            self._acquire(priority)
+            metrics.inc('flux_sheets_api_calls_total', call=name)
+            try:
+                return fn(*args, **kwargs)
+            except gspread.exceptions.APIError as e:
+                attempt += 1
+                if e.code not in RETRY_CODES or attempt >= self.max_attempts:
+                    raise
+                delay = self.delay(attempt)
+                metrics.inc('flux_sheets_retries_total', call=name, code=str(e.code))
+                log.warning("sheets_backoff", call=name, code=e.code, attempt=attempt, delay=round(delay, 3))
+                if e.code == 429:
+                    self._pause(delay)
+                else:
+                    time.sleep(delay)
+
+    @contextmanager
+    def background(self):
+        # Calls made by this thread inside the block yield to reads and writes
+        previous = getattr(self._local, 'priority', READ)
+        self._local.priority = FLUSH
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def delay(self, attempt):
+        # Exponential with up to one base interval of jitter, so callers that were
+        # throttled together do not all retry at the same moment
+        return min(self.backoff * 2 ** (attempt - 1) + random.uniform(0, self.backoff), MAX_BACKOFF)
+
+    def _pause(self, delay):
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self.bucket.empty()
+            self._cond.notify_all()
+
+    def _acquire(self, priority):
+        # Wait for a token; only the best-placed waiter may take one
+        started = time.monotonic()
+        with self._cond:
+            self._tickets += 1
+            me = (priority, self._tickets)
+            self._waiting.append(me)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._paused_until - now
+                    if wait <= 0 and min(self._waiting) == me:
+                        wait = self.bucket.take(now)
+                        if wait == 0:
+                            break
+                    self._cond.wait(wait if wait > 0 else None)
+            finally:
+                self._waiting.remove(me)
+                self._cond.notify_all()
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            metrics.observe('flux_sheets_throttle_seconds', waited, priority=str(priority))
+
+    # --- WRITES ---
+    def enqueue(self, sheet, kind, values, seq=0):
+        with self._cond:
+            pending = self._flushes.get(sheet)
+            if pending is None:
+                pending = self._flushes[sheet] = Flush(sheet, kind, values, seq)
+            else:
+                if kind == 'save':
+                    # The new save already holds everything queued before it
+                    pending.kind, pending.values = 'save', values
+                else:
+                    pending.values = pending.values + values
+                pending.writes += 1
+                pending.seq = max(pending.seq, seq)
+                pending.queued_at = time.time()
+                metrics.inc('flux_sheets_coalesced_total', sheet=sheet, kind=kind)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='flux-sheets-flush', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        if not self.async_writes:
+            pending.done.wait()
+        return pending
+
+    def pending(self, sheet):
+        # True while Sheets is behind our cache for this sheet
+        with self._cond:
+            return sheet in self._flushes or sheet in self._inflight
+
+    def backlog(self):
+        with self._cond:
+            return {'queued': {s: f.writes for s, f in self._flushes.items()}, 'inflight': sorted(self._inflight)}
+
+    def drain(self, timeout=None):
+        # Wait for every queued write; False if the timeout ran out first
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._flushes or self._inflight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _requeue(self, failed):
+        # Put a failed flush back at the head of the queue, ahead of (and merged with)
+        # anything queued for its worksheet since
+        with self._cond:
+            newer = self._flushes.pop(failed.sheet, None)
+            if newer is None:
+                retry = Flush(failed.sheet, failed.kind, failed.values, failed.seq)
+                retry.writes = failed.writes
+                retry.queued_at = failed.queued_at
+                retry.waiters += failed.waiters
+            else:
+                retry = newer
+                if newer.kind == 'append':
+                    retry.kind, retry.values = failed.kind, failed.values + newer.values
+                    retry.writes += failed.writes
+                retry.seq = max(retry.seq, failed.seq)
+                retry.waiters = failed.waiters + retry.waiters
+                # a newer save already holds everything the failed flush had
+            self._flushes[failed.sheet] = retry
+            self._flushes.move_to_end(failed.sheet, last=False)
+            return retry
+
+    def _run(self):
+        self._local.priority = WRITE if not self.async_writes else FLUSH
+        failures = 0
+        while True:
+            with self._cond:
+                while not self._flushes:
+                    self._cond.wait()
+                sheet, flush = self._flushes.popitem(last=False)
+                self._inflight.add(sheet)
+            synced = idle = False
+            try:
+                self.writer(sheet, flush.kind, flush.values)
+                failures = 0
+                synced = True
+            except Exception:
+                # The writer logs its own errors; requeued before the sheet leaves
+                # _inflight, so pending() never reads False in between
+                self.failed += 1
+                failures += 1
+                retry = self._requeue(flush)
+                metrics.inc('flux_sheets_flush_retries_total', sheet=sheet)
+                log.warning("sheets_flush_requeued", sheet=sheet, writes=retry.writes, failures=failures)
+            finally:
+                with self._cond:
+                    self._inflight.discard(sheet)
+                    idle = sheet not in self._flushes
+                    self._cond.notify_all()
+            if synced:
+                # A failed flush's writers keep waiting, on its retry
+                for done in flush.waiters:
+                    done.set()
+            if synced and self.synced is not None:
+                try:
+                    self.synced(sheet, flush.queued_at if idle else None, flush.seq)
+                except Exception as e:
+                    log.error("sheets_synced_hook_failed", sheet=sheet, error=str(e))
+            if failures:
+                time.sleep(self.delay(min(failures, 16)))
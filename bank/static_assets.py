@@ -0,0 +1,84 @@
+import glob
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+# In-memory, precompressed copies of the portal pages.
+#
+# Every page is read once at startup together with gzip and (if the brotli package is
+# installed) br variants, and served with a content-hash ETag, Vary: Accept-Encoding and
+# Cache-Control. Pages are linked by plain URLs, so browsers revalidate them after
+# MAX_AGE seconds, which is normally a 304.
+
+MAX_AGE = int(os.environ.get('FLUX_STATIC_MAX_AGE', 300))
+PATTERNS = ('index.html', 'user/*.html')
+
+
+class Asset:
+    def __init__(self, path, data):
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.hash = hashlib.sha256(data).hexdigest()[:16]
+        self.variants = {'identity': data, 'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.variants['br'] = brotli.compress(data, quality=11)
+
+
+class StaticAssets:
+    def __init__(self, root, patterns=PATTERNS, reload=False):
+        self.root = root
+        self.patterns = patterns
+        self.reload = reload  # re-read changed files on request (development)
+        self.assets = {}
+        self.load()
+
+    def load(self):
+        assets = {}
+        for pattern in self.patterns:
+            for path in glob.glob(os.path.join(self.root, pattern)):
+                rel = os.path.relpath(path, self.root).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    assets[rel] = Asset(path, f.read())
+        self.assets = assets
+
+    def _pick_encoding(self, asset):
+        accepted = request.accept_encodings
+        best, best_q = 'identity', 0.0
+        for encoding in ('br', 'gzip'):
+            if encoding in asset.variants:
+                q = accepted.quality(encoding)
+                if q > best_q:
+                    best, best_q = encoding, q
+        return best
+
+    def serve(self, rel_path):
+        # Returns a Response, or None when the path is not a preloaded asset
+        asset = self.assets.get(rel_path)
+        if asset is None:
+            return None
+        if self.reload and os.path.getmtime(asset.path) != asset.mtime:
+            with open(asset.path, 'rb') as f:
+                asset = self.assets[rel_path] = Asset(asset.path, f.read())
+
+        encoding = self._pick_encoding(asset)
+        etag = asset.hash if encoding == 'identity' else f"{asset.hash}-{encoding}"
+
+        if etag in request.if_none_match:
+            resp = Response(status=304)
+        else:
+            resp = Response(asset.variants[encoding], mimetype=asset.mimetype)
+            if encoding != 'identity':
+                resp.headers['Content-Encoding'] = encoding
+        resp.set_etag(etag)
+        resp.headers['Cache-Control'] = f'public, max-age={MAX_AGE}, must-revalidate'
+        resp.headers['Vary'] = 'Accept-Encoding'
+        return resp
@@ -0,0 +1,153 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+
+# Structured, non-blocking logging for the API.
+#
+#   log = structured_log.get_logger('flux.auth')
+#   log.debug("login_attempt", username=username)
+#
+# Records are put on a bounded in-memory queue and written to stdout by a background
+# QueueListener thread, so request threads never block on stdout. When the queue is
+# full the record is dropped and counted instead of stalling the request.
+#
+#   FLUX_LOG_LEVEL   DEBUG | INFO | WARNING | ERROR   (default INFO)
+#   FLUX_LOG_FORMAT  json | text                      (default json)
+#   FLUX_LOG_SAMPLE  per-logger DEBUG sampling, e.g. "flux.db=0.01,flux.auth=0.1"
+#
+# Fields whose names look like credentials are masked before they reach the queue.
+
+QUEUE_SIZE = 10000
+REDACTED = '***'
+REDACT_KEYS = {'password', 'old_password', 'new_password', 'input_pass', 'stored_pass',
+               'private_key', 'token', 'secret', 'credentials', 'creds', 'authorization'}
+
+_setup_lock = threading.Lock()
+_listener = None
+_sample_rates = {}
+dropped = 0
+
+
+def redact(value):
+    if isinstance(value, dict):
+        return {k: (REDACTED if str(k).lower() in REDACT_KEYS else redact(v)) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    return value
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    def enqueue(self, record):
+        global dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped += 1
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread; just make sure args are resolved
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z',
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        fields = ' '.join(f"{k}={v}" for k, v in getattr(record, 'fields', {}).items())
+        line = f"{record.levelname:<7} {record.name}: {record.getMessage()}" + (f" {fields}" if fields else '')
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+def _parse_samples(text):
+    rates = {}
+    for part in (text or '').split(','):
+        name, _, rate = part.partition('=')
+        if name.strip() and rate.strip():
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+def setup(level=None, fmt=None, samples=None, stream=None):
+    global _listener, _sample_rates
+    with _setup_lock:
+        if _listener is not None:
+            return
+        level = (level or os.environ.get('FLUX_LOG_LEVEL', 'INFO')).upper()
+        fmt = fmt or os.environ.get('FLUX_LOG_FORMAT', 'json')
+        _sample_rates = samples if samples is not None else _parse_samples(os.environ.get('FLUX_LOG_SAMPLE'))
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+
+        log_queue = queue.Queue(maxsize=QUEUE_SIZE)
+        root = logging.getLogger('flux')
+        root.setLevel(level)
+        root.propagate = False
+        root.handlers = [_DroppingQueueHandler(log_queue)]
+
+        _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+        _listener.start()
+        atexit.register(shutdown)
+
+
+def shutdown():
+    # Flush whatever is still queued; safe to call more than once
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+class StructuredLogger:
+    def __init__(self, name):
+        self.name = name
+        self._logger = logging.getLogger(name)
+        self._sample = _sample_rates.get(name, 1.0)
+
+    def _log(self, level, event, fields, exc_info=None):
+        if level == logging.DEBUG and self._sample < 1.0 and random.random() >= self._sample:
+            return
+        self._logger.log(level, event, exc_info=exc_info, extra={'fields': redact(fields)})
+
+    def debug(self, event, **fields):
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._log(logging.DEBUG, event, fields)
+
+    def info(self, event, **fields):
+        if self._logger.isEnabledFor(logging.INFO):
+            self._log(logging.INFO, event, fields)
+
+    def warning(self, event, **fields):
+        if self._logger.isEnabledFor(logging.WARNING):
+            self._log(logging.WARNING, event, fields)
+
+    def error(self, event, exc_info=None, **fields):
+        if self._logger.isEnabledFor(logging.ERROR):
+            self._log(logging.ERROR, event, fields, exc_info=exc_info)
+
+
+def get_logger(name):
+    setup()
+    return StructuredLogger(name)
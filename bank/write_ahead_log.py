@@ -0,0 +1,424 @@
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+import zlib
+
+import pandas as pd
+
+import metrics
+import schemas
+import shared_tables
+import structured_log
+
+log = structured_log.get_logger('flux.wal')
+
+# Write-ahead log and snapshots for the in-memory tables, enabled with FLUX_WAL=1.
+#
+# Every change DatabaseManager makes to a cached sheet is written here before the
+# request returns, as one line per change in wal-<first seq>.log:
+#
+#   <crc32 hex> {"seq": 812, "sheet": "Users", "op": "patch", ...}
+#
+#   append   rows added at the end (activity and audit logs, new users, KYC requests)
+#   patch    rows of the changed accounts by position, plus the new row count
+#            (balance updates, KYC and status changes)
+#   replace  the whole sheet: changes that remove rows, and the sheet as loaded from
+#            the backend before the first change made on top of it
+#   synced   the backend has the sheet's changes up to record `through`
+#
+# Records marked "backend" (the sheet as loaded, rows pulled by the mirror) hold what
+# the backend already has. Every other change stays unsynced until a synced record
+# covers it: DatabaseManager writes one when the scheduler's flush of that change went
+# through, or when the offline workbook was saved.
+#
+# Rows are stored as the backend holds them (schemas.to_storage). Lines are buffered and
+# written by one committer thread, which fsyncs once per batch (group commit), so
+# concurrent writers share each fsync. FLUX_WAL_SYNC picks the policy:
+#   group   writers wait until their batch is fsynced (default)
+#   always  each writer writes and fsyncs its own line
+#   async   batches are fsynced but writers do not wait; a crash can lose one batch
+#   off     batches are written without fsync; the OS decides when they reach disk
+# FLUX_WAL_COMMIT_MS is how long the committer gathers lines before writing a batch.
+#
+# After FLUX_WAL_SNAPSHOT_RECORDS lines a snapshot of every cached sheet is written
+# (Feather, so pyarrow is required) and older segments are deleted. On start, the
+# latest snapshot plus the lines after it are replayed, stopping at the first torn or
+# corrupt line. Only the unsynced changes go back to the backend, made again on top of
+# its current copy (rebase()), so writes other workers made in the meantime are kept;
+# segments holding unsynced changes outlive snapshots. A clean shutdown whose writes all
+# reached the backend empties the directory.
+#
+# A directory belongs to one process: it is flocked for the life of the log and a second
+# WriteAheadLog on it raises RuntimeError (two writers would reuse sequence numbers, and
+# one's clean shutdown would delete the other's segments). Run one worker with FLUX_WAL=1
+# or give each worker its own FLUX_WAL_DIR.
+
+SYNC = os.environ.get('FLUX_WAL_SYNC', 'group')
+COMMIT_INTERVAL = float(os.environ.get('FLUX_WAL_COMMIT_MS', 2)) / 1000.0
+SNAPSHOT_RECORDS = int(os.environ.get('FLUX_WAL_SNAPSHOT_RECORDS', 20000))
+SNAPSHOT = 'snapshot.json'
+LOCK = '.lock'
+
+
+def _rows(sheet_name, df):
+    return json.loads(schemas.to_storage(sheet_name, df).to_json(orient='values', date_format='iso'))
+
+
+def delta(sheet_name, before, after, accounts, appended):
+    # Smallest record that turns `before` into `after`, or a replace when unsure
+    columns = [str(c) for c in after.columns]
+    same = before is not None and list(before.columns) == list(after.columns)
+    if same and appended and len(after) == len(before) + appended:
+        return {'op': 'append', 'columns': columns, 'rows': _rows(sheet_name, after.iloc[len(before):])}
+    if same and accounts is not None and len(after) >= len(before) and 'AccountID' in after.columns:
+        changed = after['AccountID'].astype(str).isin([str(a) for a in accounts]).to_numpy(copy=True)
+        changed[len(before):] = True
+        positions = changed.nonzero()[0]
+        return {'op': 'patch', 'columns': columns, 'length': len(after), 'positions': positions.tolist(),
+                'rows': _rows(sheet_name, after.iloc[positions])}
+    return {'op': 'replace', 'columns': columns, 'rows': _rows(sheet_name, after)}
+
+
+def rebase(sheet_name, current, records):
+    # The unsynced `records` made again on top of `current` (the backend's copy):
+    # appended rows it already has (same id in the first column) are skipped, patched
+    # rows replace the same accounts' rows, a replace wins outright. Returns
+    # (rows to append, None) when only rows were added, else (None, whole frame).
+    columns = [str(c) for c in current.columns]
+    rows = _rows(sheet_name, current) if len(current) else []
+    added = []
+    for record in records:
+        if record['op'] == 'replace' or record['columns'] != columns:
+            columns, rows, added = record['columns'], list(record['rows']), None
+        elif record['op'] == 'append':
+            by_id = columns[0].endswith('ID')
+            seen = {str(r[0]) if by_id else str(r) for r in rows}
+            for row in record['rows']:
+                if (str(row[0]) if by_id else str(row)) not in seen:
+                    rows.append(row)
+                    if added is not None:
+                        added.append(row)
+        else:
+            at = columns.index('AccountID')
+            where = {str(r[at]): n for n, r in enumerate(rows)}
+            for row in record['rows']:
+                n = where.get(str(row[at]))
+                if n is None:
+                    rows.append(row)
+                else:
+                    rows[n] = row
+            added = None
+    if added is not None:
+        return pd.DataFrame(added, columns=columns), None
+    return None, pd.DataFrame(rows, columns=columns)
+
+
+def _encode(record):
+    body = json.dumps(record, separators=(',', ':'), default=str)
+    return f"{zlib.crc32(body.encode()):08x} {body}\n".encode()
+
+
+def _decode(line):
+    crc, _, body = line.rstrip(b'\n').partition(b' ')
+    if not line.endswith(b'\n') or int(crc, 16) != zlib.crc32(body):
+        raise ValueError("torn or corrupt record")
+    return json.loads(body)
+
+
+class WriteAheadLog:
+    def __init__(self, directory, sync=SYNC, commit_interval=COMMIT_INTERVAL,
+                 snapshot_records=SNAPSHOT_RECORDS):
+        if sync not in ('group', 'always', 'async', 'off'):
+            raise ValueError(f"FLUX_WAL_SYNC must be group, always, async or off, not {sync!r}")
+        self.directory = directory
+        self.sync = sync
+        self.commit_interval = commit_interval
+        self.snapshot_records = snapshot_records
+        os.makedirs(directory, exist_ok=True)
+        self._owner = open(os.path.join(directory, LOCK), 'a')
+        try:
+            fcntl.flock(self._owner, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._owner.close()
+            raise RuntimeError(f"write-ahead log {directory} is in use by another process")
+        # Held by DatabaseManager around a cache change and its log_change(), so a
+        # snapshot never sees a change without its record or the other way round
+        self.lock = threading.RLock()
+        self.seq = 0
+        self.durable = 0
+        self.fsyncs = 0
+        self._cond = threading.Condition()
+        self._buffer = []
+        self._since_snapshot = 0
+        self._last = {}  # sheet -> the frame its last record (or snapshot) produced
+        self._latest = {}  # sheet -> seq of its last record
+        self._synced = {}  # sheet -> seq through which the backend has its changes
+        self._unsynced = {}  # sheet -> first seq that may not be in the backend
+        self.pending = {}  # sheet -> unsynced change records found by recover()
+        self._file = None
+        self._committer = None
+        self._snapshotting = False
+
+    # --- RECOVERY ---
+    def _segments(self):
+        names = [n for n in os.listdir(self.directory) if n.startswith('wal-') and n.endswith('.log')]
+        return sorted(names, key=lambda n: int(n[4:-4]))
+
+    def recover(self):
+        # {sheet: DataFrame} as of the last intact record; {} when there is nothing to replay
+        try:
+            with open(os.path.join(self.directory, SNAPSHOT)) as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            manifest = {'seq': 0, 'directory': None, 'sheets': []}
+        self.seq = manifest['seq']
+        self._synced = dict(manifest.get('synced', {}))
+        self.pending = {}
+        tables = {}
+        for name in manifest['sheets']:
+            df = shared_tables.table_to_frame(
+                shared_tables.read_table(os.path.join(self.directory, manifest['directory'], f"{name}.feather")))
+            tables[name] = (list(map(str, df.columns)), _rows(name, df))
+
+        replayed, torn = 0, False
+        for segment in self._segments():
+            path = os.path.join(self.directory, segment)
+            if torn:
+                os.unlink(path)  # nothing after a torn record can be trusted
+                continue
+            good = 0
+            with open(path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = _decode(line)
+                    except ValueError:
+                        torn = True
+                        break
+                    good += len(line)
+                    self._track(record)
+                    if record['seq'] <= manifest['seq']:
+                        continue  # kept for its unsynced changes; the snapshot has it
+                    self._apply(tables, record)
+                    self.seq = record['seq']
+                    replayed += 1
+            if torn:
+                log.warning("wal_torn_record", segment=segment, after_seq=self.seq)
+                os.truncate(path, good)
+        self.durable = self.seq
+        self.pending = {sheet: records for sheet, records in self.pending.items() if records}
+        self._unsynced = {sheet: records[0]['seq'] for sheet, records in self.pending.items()}
+        log.info("wal_recovered", snapshot_seq=manifest['seq'], replayed=replayed, sheets=sorted(tables),
+                 unsynced=sorted(self.pending))
+        if not replayed and not manifest['sheets']:
+            return {}
+        return {name: schemas.apply(name, pd.DataFrame(rows, columns=columns))
+                for name, (columns, rows) in tables.items()}
+
+    def _track(self, record):
+        # Which changes the backend has, as of `record`
+        sheet, op = record['sheet'], record['op']
+        pending = self.pending.setdefault(sheet, [])
+        if op == 'synced':
+            self._synced[sheet] = max(self._synced.get(sheet, 0), record['through'])
+            pending[:] = [r for r in pending if r['seq'] > record['through']]
+            return
+        self._latest[sheet] = record['seq']
+        if record['seq'] <= self._synced.get(sheet, 0):
+            return
+        if record.get('backend'):
+            if not pending:
+                self._synced[sheet] = record['seq']
+        else:
+            pending.append(record)
+
+    def _apply(self, tables, record):
+        sheet, op = record['sheet'], record['op']
+        if op == 'synced':
+            return
+        if op == 'replace' or sheet not in tables:
+            tables[sheet] = (record['columns'], list(record['rows']))
+            return
+        columns, rows = tables[sheet]
+        if op == 'append':
+            rows.extend(record['rows'])
+        else:
+            rows.extend([None] * (record['length'] - len(rows)))
+            for position, row in zip(record['positions'], record['rows']):
+                rows[position] = row
+
+    # --- LOGGING ---
+    def start(self, frames):
+        # Begin logging on top of `frames` (what recover() returned, now cached)
+        self._last = dict(frames)
+        self._open_segment()
+        if self.sync != 'always':
+            self._committer = threading.Thread(target=self._run, name='flux-wal-commit', daemon=True)
+            self._committer.start()
+
+    def _open_segment(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = open(os.path.join(self.directory, f"wal-{self.seq + 1}.log"), 'ab')
+
+    def log_change(self, sheet_name, before, after, accounts=None, appended=0, pulled=False):
+        # Call with self.lock held, as `after` replaces `before` in the cache. `pulled`:
+        # the change came from the backend (the mirror), so it is already there.
+        if before is not None and self._last.get(sheet_name) is not before:
+            # Loaded from the backend since our last record: log what it holds first
+            self._log(sheet_name, {'op': 'replace', 'backend': True, 'columns': [str(c) for c in before.columns],
+                                   'rows': _rows(sheet_name, before)})
+        record = delta(sheet_name, before, after, accounts, appended)
+        if pulled:
+            record['backend'] = True
+        self._last[sheet_name] = after
+        return self._log(sheet_name, record)
+
+    def _log(self, sheet_name, record):
+        record['sheet'] = sheet_name
+        seq = self.write(record)
+        self._latest[sheet_name] = seq
+        if not record.get('backend'):
+            self._unsynced.setdefault(sheet_name, seq)
+        elif sheet_name not in self._unsynced:
+            self._synced[sheet_name] = seq
+        return seq
+
+    def last_seq(self, sheet_name):
+        # Seq of the sheet's last record, for mark_synced() once the backend has it
+        with self.lock:
+            return self._latest.get(sheet_name, 0)
+
+    def mark_synced(self, sheet_name, through):
+        # The backend has every change to the sheet up to record `through`
+        with self.lock:
+            if through <= self._synced.get(sheet_name, 0):
+                return
+            self._synced[sheet_name] = through
+            if through >= self._latest.get(sheet_name, 0):
+                self._unsynced.pop(sheet_name, None)
+            elif sheet_name in self._unsynced:
+                self._unsynced[sheet_name] = max(self._unsynced[sheet_name], through + 1)
+            self.write({'op': 'synced', 'sheet': sheet_name, 'through': through})
+
+    def write(self, record):
+        with self._cond:
+            self.seq += 1
+            record['seq'] = self.seq
+            line = _encode(record)
+            self._since_snapshot += 1
+            if self.sync == 'always':
+                self._file.write(line)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self.fsyncs += 1
+                self.durable = self.seq
+            else:
+                self._buffer.append(line)
+                self._cond.notify_all()
+            metrics.inc('flux_wal_records_total', op=record['op'])
+            return self.seq
+
+    def wait(self, seq):
+        # Block until `seq` is on disk, under the group policy
+        if self.sync != 'group':
+            return
+        with self._cond:
+            while self.durable < seq:
+                self._cond.wait()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._buffer:
+                    self._cond.wait()
+            if self.commit_interval:
+                time.sleep(self.commit_interval)
+            with self._cond:
+                self._commit()
+
+    def _commit(self):
+        # With self._cond held: write out the buffer as one batch
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        started = time.perf_counter()
+        self._file.write(b''.join(batch))
+        self._file.flush()
+        if self.sync != 'off':
+            os.fsync(self._file.fileno())
+            self.fsyncs += 1
+        self.durable = self.seq
+        self._cond.notify_all()
+        metrics.observe('flux_wal_commit_seconds', time.perf_counter() - started)
+        metrics.inc('flux_wal_batches_total')
+
+    # --- SNAPSHOTS ---
+    def maybe_snapshot(self, cache):
+        # Start a background snapshot once enough records have piled up
+        with self.lock:
+            if self._since_snapshot < self.snapshot_records or self._snapshotting:
+                return
+            self._snapshotting = True
+        threading.Thread(target=self.snapshot, args=(cache,), name='flux-wal-snapshot', daemon=True).start()
+
+    def snapshot(self, cache):
+        # Write every cached sheet as of the current seq, then drop the segments it covers
+        with self.lock:
+            frames = dict(cache)
+            synced = dict(self._synced)
+            keep = min(self._unsynced.values(), default=None)
+            with self._cond:
+                self._commit()
+                seq = self.seq
+                self._open_segment()
+            self._last = dict(frames)
+            self._since_snapshot = 0
+            self._snapshotting = True
+        try:
+            started = time.perf_counter()
+            name = f"snapshot-{seq}"
+            target = os.path.join(self.directory, name)
+            os.makedirs(target, exist_ok=True)
+            for sheet_name, df in frames.items():
+                shared_tables.write_table(os.path.join(target, f"{sheet_name}.feather"),
+                                          shared_tables.frame_to_table(df))
+            manifest = os.path.join(self.directory, SNAPSHOT)
+            with open(f"{manifest}.tmp", 'w') as f:
+                json.dump({'seq': seq, 'directory': name, 'sheets': list(frames), 'synced': synced}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(f"{manifest}.tmp", manifest)
+            # Segments the snapshot covers go, unless they hold changes still unsynced
+            firsts = [int(segment[4:-4]) for segment in self._segments()]
+            for first, after in zip(firsts, firsts[1:] + [seq + 1]):
+                if first <= seq and (keep is None or after <= keep):
+                    os.unlink(os.path.join(self.directory, f"wal-{first}.log"))
+            for entry in os.listdir(self.directory):
+                if entry.startswith('snapshot-') and entry != name:
+                    shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+            metrics.observe('flux_wal_snapshot_seconds', time.perf_counter() - started)
+            log.info("wal_snapshot", seq=seq, sheets=len(frames))
+        finally:
+            self._snapshotting = False
+
+    def close(self, clean):
+        # Flush what is buffered; `clean` (the backend has every write) also empties the log
+        if self._file is None:
+            return
+        with self.lock, self._cond:
+            self._commit()
+            if clean:
+                for entry in os.listdir(self.directory):
+                    path = os.path.join(self.directory, entry)
+                    if entry == LOCK:
+                        continue
+                    if os.path.isdir(path):
+                        shutil.rmtree(path, ignore_errors=True)
+                    else:
+                        os.unlink(path)
+                self._open_segment()
+                self._last = {}
+                self._latest, self._synced, self._unsynced = {}, {}, {}
@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+
+import pandas as pd
+import pytest
+
+# The bank modules import each other flat (`import metrics`), as they do under gunicorn
+BANK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bank')
+sys.path.insert(0, BANK)
+
+# Module-level settings are read at import: keep host-wide state (AccountID sequences,
+# the shared table store) out of /dev/shm and let the scheduler run unthrottled
+os.environ.setdefault('FLUX_SHARED_DIR', tempfile.mkdtemp(prefix='flux-test-shared-'))
+os.environ.setdefault('FLUX_SHEETS_QUOTA_PER_MIN', '1000000')
+os.environ.setdefault('FLUX_SHEETS_BURST', '100000')
+os.environ.setdefault('FLUX_SHEETS_BACKOFF', '0.01')
+os.environ.setdefault('FLUX_LOG_LEVEL', 'WARNING')
+
+
+def make_users(rows, balance=0.0):
+    return pd.DataFrame({
+        'AccountID': [f"AC{1001 + i}" for i in range(rows)],
+        'AccountNumber': [str(10000000000 + i) for i in range(rows)],
+        'IFSC': [f"FLUX0{i:06d}" for i in range(rows)],
+        'Username': [f"user{i}" for i in range(rows)],
+        'Password': 'pw',
+        'FullName': [f"User {i}" for i in range(rows)],
+        'Email': 'user@example.com',
+        'Phone': '9000000000',
+        'AccountBalance': float(balance),
+        'KYCStatus': 'Not Started',
+        'CreatedAt': '2025-01-01 00:00:00',
+        'Status': 'Active',
+    })
+
+
+@pytest.fixture
+def offline_db(tmp_path):
+    from database_manager import DatabaseManager
+    return DatabaseManager(db_file=str(tmp_path / 'db.xlsx'), connect_mode='eager')
+
+
+@pytest.fixture
+def sheets():
+    from fake_sheets import FakeSheetsClient
+    return FakeSheetsClient()
+
+
+@pytest.fixture
+def cloud_db(tmp_path, sheets):
+    from database_manager import DatabaseManager
+    db = DatabaseManager(db_file=str(tmp_path / 'db.xlsx'), sheets_client=sheets, connect_mode='eager')
+    yield db
+    db.sheets.drain(10)
@@ -0,0 +1,157 @@
+import json
+
+import pandas as pd
+import pytest
+
+from conftest import make_users
+
+
+@pytest.fixture
+def api(offline_db):
+    import app as bank_app
+    bank_app.use_database(offline_db)
+    return bank_app
+
+
+def credits(count, amount):
+    return pd.DataFrame({
+        'LogID': [f"LOG-{i + 1}" for i in range(count)],
+        'AccountID': 'AC1002',
+        'Timestamp': [str(pd.Timestamp('2024-01-01') + pd.Timedelta(minutes=i)) for i in range(count)],
+        'TransactionType': 'Credit',
+        'TransactionAmount': float(amount),
+        'Description': 'seed',
+        'CyberRiskScore': 10.0,
+    })
+
+
+def stats_events(sub):
+    out = []
+    while not sub.queue.empty():
+        message = sub.queue.get_nowait()
+        if '\nevent: stats\n' in message:
+            out.append(json.loads(message.split('data: ', 1)[1]))
+    return out
+
+
+def test_stream_volume_delta_matches_the_windowed_stat(api):
+    db = api.db
+    db._save_sheet(make_users(2), 'Users')
+    db._save_sheet(credits(1000, 1), 'ActivityLogs')
+    client = api.app.test_client()
+    start = client.get('/api/admin/stats').get_json()['transaction_volume']
+    assert start == 1000
+
+    sub, _, _ = api.broker.subscribe()
+    try:
+        api._window_start()
+        db.log_activity('AC1001', {'TransactionAmount': 100.0, 'TransactionType': 'Credit',
+                                   'Description': 'Transfer in'}, 10)
+        deltas = stats_events(sub)
+    finally:
+        sub.close()
+
+    # The new credit entered the 1000-row window and the oldest one left it
+    volume = start + sum(d.get('transaction_volume', 0) for d in deltas)
+    assert volume == client.get('/api/admin/stats').get_json()['transaction_volume'] == 1099
+
+
+def test_bad_time_filters_are_rejected(api):
+    api.db._save_sheet(make_users(1), 'Users')
+    api.db.log_audit('Blocked', 'AC1001', 'Admin (ADM-001) Blocked user AC1001')
+    client = api.app.test_client()
+    assert client.get('/api/admin/logs?since=foo').status_code == 400
+    assert client.get('/api/admin/logs?until=2025-01-01T00:00:00%2B05:30').status_code == 400
+    resp = client.get('/api/admin/logs?since=2000-01-01')
+    assert resp.status_code == 200
+    assert resp.get_json()['total'] == 1
+
+
+def test_audit_backfill_runs_at_startup(tmp_path):
+    from database_manager import DatabaseManager
+    path = str(tmp_path / 'db.xlsx')
+    first = DatabaseManager(db_file=path, connect_mode='eager')
+    first._save_sheet(credits(2, 5).assign(Description=[
+        'Admin (ADM-001) Blocked user AC1002', 'Transfer in']), 'ActivityLogs')
+
+    second = DatabaseManager(db_file=path, connect_mode='eager')
+    audit = second._peek_sheet('AuditLogs')
+    assert list(audit['Action']) == ['Blocked']
+    assert 'migrate' in second.startup['steps']
+
+
+def test_bulk_routes_need_the_admin_session(api):
+    api.db._save_sheet(make_users(2), 'Users')
+    client = api.app.test_client()
+    assert client.get('/api/admin/export/Users').status_code == 401
+    assert client.post('/api/admin/import/users', data=b'Username,Password,FullName\nx,pw,X\n').status_code == 401
+
+    assert client.post('/api/admin/login', json={'username': 'admin', 'password': 'admin123'}).status_code == 200
+    resp = client.get('/api/admin/export/Users')
+    assert resp.status_code == 200
+    header, *rows = resp.get_data(as_text=True).splitlines()
+    assert len(rows) == 2
+    assert 'Password' not in header.split(',') and 'Username' in header.split(',')
+    imported = client.post('/api/admin/import/users', data=b'Username,Password,FullName\nx,pw,X\n')
+    assert imported.get_json()['status'] == 'success'
+
+
+def test_operational_routes_need_the_admin_session(api):
+    client = api.app.test_client()
+    routes = [('get', '/api/admin/metrics'), ('get', '/api/admin/stream'), ('get', '/api/admin/profiler'),
+              ('post', '/api/admin/profiler'), ('get', '/api/admin/profiles/any.txt'),
+              ('post', '/api/admin/kyc-bulk-update')]
+    for method, path in routes:
+        assert getattr(client, method)(path, json={}).status_code == 401, path
+
+    client.post('/api/admin/login', json={'username': 'admin', 'password': 'admin123'})
+    assert client.get('/api/admin/metrics').status_code == 200
+    assert client.get('/api/admin/profiler').get_json()['status'] == 'success'
+
+
+def test_stream_updates_the_window_without_requerying_it(api, monkeypatch):
+    db = api.db
+    db._save_sheet(make_users(2), 'Users')
+    db._save_sheet(credits(300, 1).assign(CyberRiskScore=90.0), 'ActivityLogs')
+    client = api.app.test_client()
+    start = client.get('/api/admin/stats').get_json()
+    assert start['flagged_transactions'] == 200
+
+    sub, _, _ = api.broker.subscribe()
+    try:
+        api._window_start()
+        monkeypatch.setattr(db, 'get_all_transactions', lambda *a, **k: pytest.fail("window re-queried"))
+        db.log_activity('AC1001', {'TransactionAmount': 5.0, 'TransactionType': 'Credit',
+                                   'Description': 'Transfer in'}, 10)
+        db.update_user_status('AC1002', 'Blocked')
+        deltas = stats_events(sub)
+    finally:
+        sub.close()
+        monkeypatch.undo()
+
+    # The low-risk row pushed one flagged row out of the 200; blocking AC1002 drops the rest
+    now = client.get('/api/admin/stats').get_json()
+    for key in ('transaction_volume', 'flagged_transactions'):
+        assert start[key] + sum(d.get(key, 0) for d in deltas) == now[key]
+    assert now['flagged_transactions'] == 0
+
+
+def test_bulk_kyc_update_reports_accounts_it_could_not_find(api):
+    db = api.db
+    db._save_sheet(make_users(3), 'Users')
+    for account_id in ('AC1001', 'AC1002', 'AC1003'):
+        assert db.submit_kyc(account_id, 'Passport', f"P-{account_id}")[0]
+    assert db.count_kyc_requests('Pending') == 3
+
+    client = api.app.test_client()
+    client.post('/api/admin/login', json={'username': 'admin', 'password': 'admin123'})
+    resp = client.post('/api/admin/kyc-bulk-update',
+                       json={'account_ids': ['AC1001', 'AC1003', 'AC9999'], 'status': 'Approved'})
+    assert resp.get_json() == {'status': 'success', 'updated': ['AC1001', 'AC1003'], 'not_found': ['AC9999']}
+
+    # The status index moved both requests out of the pending queue without a rebuild
+    assert db.count_kyc_requests('Pending') == 1
+    assert [r['id'] for r in db.query_kyc_requests('Pending')[0]] == ['AC1002']
+    assert [r['id'] for r in db.query_kyc_requests('Approved')[0]] == ['AC1001', 'AC1003']
+    assert db.get_kyc_status('AC1003') == 'Approved' and db.get_kyc_status('AC1002') == 'Pending'
+    assert db.query_audit_logs(action='KYC Approved')[1] == 2
@@ -0,0 +1,26 @@
+import io
+
+import pandas as pd
+
+import bulk_io
+from conftest import make_users
+
+
+def test_float_like_account_numbers_are_caught_as_duplicates(offline_db):
+    offline_db._save_sheet(make_users(2), 'Users')
+    # Sheets hands numeric-looking cells back as numbers
+    offline_db._save_sheet(pd.DataFrame({
+        'AccountID': ['AC1001'], 'BeneficiaryName': ['Ravi'], 'AccountNumber': [55555555555.0],
+        'IFSC': ['FLUX0000001'], 'Nickname': ['']}), 'Beneficiaries')
+
+    users = io.BytesIO(b"AccountID,Username,Password,FullName,AccountNumber\n"
+                       b"OLD-1,newcomer,pw,New Comer,10000000001.0\n")
+    report = bulk_io.import_file(offline_db, 'users', users, keep_ids=True)
+    assert report['Users']['rejected'] == 1
+    assert report['Users']['errors'][0]['error'] == "AccountNumber already in use"
+
+    payees = io.BytesIO(b"AccountID,BeneficiaryName,AccountNumber\nAC1001,Ravi,55555555555\n")
+    report = bulk_io.import_file(offline_db, 'beneficiaries', payees)
+    assert report['Beneficiaries']['rejected'] == 1
+    assert report['Beneficiaries']['errors'][0]['error'] == "Beneficiary already exists"
+    assert len(offline_db._peek_sheet('Beneficiaries')) == 1
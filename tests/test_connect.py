@@ -0,0 +1,71 @@
+import threading
+
+from conftest import make_users
+from database_manager import DatabaseManager
+from fake_sheets import FakeSheetsClient
+
+
+class GatedClient(FakeSheetsClient):
+    # Opening the spreadsheet blocks until the test lets it through
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+        self.gate = threading.Event()
+
+    def open_by_key(self, key):
+        self.gate.wait(10)
+        return self.spreadsheet
+
+
+def seeded(cloud_db, sheets):
+    cloud_db._save_sheet(make_users(3), 'Users')
+    cloud_db._append_rows('Beneficiaries', [{'AccountID': 'AC1001', 'BeneficiaryName': 'User 1',
+                                             'AccountNumber': '10000000001', 'IFSC': 'FLUX0000001',
+                                             'Nickname': 'one'}], accounts=['AC1001'])
+    assert cloud_db.sheets.drain(10)
+    sheets.spreadsheet.calls.clear()
+    return sheets.spreadsheet
+
+
+def test_lazy_connect_waits_for_the_first_read(cloud_db, sheets, tmp_path):
+    spreadsheet = seeded(cloud_db, sheets)
+    db = DatabaseManager(db_file=str(tmp_path / 'lazy.xlsx'), sheets_client=sheets, connect_mode='lazy')
+    assert not db.ready.is_set()
+    assert spreadsheet.calls == {}
+
+    assert db.get_user_by_id('AC1002')['FullName'] == 'User 1'
+    assert db.ready.is_set()
+    assert db.startup_report()['backend'] == 'sheets'
+    assert 'connect_total' in db.startup['steps']
+
+
+def test_background_connect_returns_before_sheets_answers(cloud_db, sheets, tmp_path):
+    seeded(cloud_db, sheets)
+    client = GatedClient(sheets.spreadsheet)
+    db = DatabaseManager(db_file=str(tmp_path / 'bg.xlsx'), sheets_client=client, connect_mode='background')
+    assert not db.ready.is_set()
+
+    found = []
+    reader = threading.Thread(target=lambda: found.append(db.get_user_by_id('AC1003')))
+    reader.start()
+    reader.join(0.2)
+    # Reads wait for the connection rather than falling back to the workbook
+    assert reader.is_alive() and not found
+
+    client.gate.set()
+    reader.join(10)
+    assert found[0]['FullName'] == 'User 2'
+    assert db.ready.is_set()
+
+
+def test_prewarm_fills_every_sheet_up_front(cloud_db, sheets, tmp_path):
+    spreadsheet = seeded(cloud_db, sheets)
+    db = DatabaseManager(db_file=str(tmp_path / 'warm.xlsx'), sheets_client=sheets, connect_mode='eager')
+    db.prewarm(['Users', 'Beneficiaries'])
+    assert {'Users', 'Beneficiaries'} <= set(db._cache)
+    assert 'prewarm' in db.startup['steps']
+
+    calls = dict(spreadsheet.calls)
+    assert db.count_beneficiaries('AC1001') == 1
+    assert db.get_user_by_id('AC1001') is not None
+    # Both reads were served from the warmed cache
+    assert spreadsheet.calls == calls
@@ -0,0 +1,44 @@
+import gspread
+import pytest
+
+from fake_sheets import FakeSheetsClient
+
+
+def test_round_trip_matches_gspread_records():
+    sh = FakeSheetsClient().open_by_key('any')
+    ws = sh.add_worksheet('Users')
+    ws.update(range_name='A1', values=[['AccountID', 'AccountBalance'], ['AC1001', 12.5]])
+    ws.append_rows([['AC1002', None]])
+    assert ws.get_all_records() == [{'AccountID': 'AC1001', 'AccountBalance': 12.5},
+                                    {'AccountID': 'AC1002', 'AccountBalance': ''}]
+    assert ws.get_all_values()[2] == ['AC1002', '']
+    assert ws.batch_get(['A1:B1', 'A3:B']) == [[['AccountID', 'AccountBalance']], [['AC1002', '']]]
+
+
+def test_missing_worksheet_and_modified_time():
+    sh = FakeSheetsClient().open_by_key('any')
+    with pytest.raises(gspread.WorksheetNotFound):
+        sh.worksheet('Users')
+    before = sh.get_lastUpdateTime()
+    sh.add_worksheet('Users').append_rows([['x']])
+    assert sh.get_lastUpdateTime() != before
+
+
+def test_quota_answers_429_once_spent():
+    sh = FakeSheetsClient(quota_per_min=3).open_by_key('any')
+    for _ in range(3):
+        sh.worksheets()
+    with pytest.raises(gspread.exceptions.APIError) as raised:
+        sh.worksheets()
+    assert raised.value.code == 429
+    assert sh.errors == {429: 1}
+
+
+def test_error_rate_injects_retryable_errors():
+    sh = FakeSheetsClient(error_rate=1.0).open_by_key('any')
+    codes = set()
+    for _ in range(40):
+        with pytest.raises(gspread.exceptions.APIError) as raised:
+            sh.worksheets()
+        codes.add(raised.value.code)
+    assert codes == {429, 503}
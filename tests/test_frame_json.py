@@ -0,0 +1,40 @@
+import json
+
+import pandas as pd
+import pytest
+from flask import Flask
+
+import schemas
+from conftest import make_users
+from frame_json import frame_response
+
+
+def kyc_requests():
+    return schemas.apply('KYCRequests', pd.DataFrame({
+        'RequestID': ['KYC-1', 'KYC-2'],
+        'AccountID': ['AC1001', 'AC1002'],
+        'DocumentType': 'Passport',
+        'DocumentNumber': ['P1', 'P2'],
+        'Status': 'Pending',
+        'SubmissionDate': ['2025-03-14', ''],  # the second one is NaT once typed
+    }))
+
+
+@pytest.mark.parametrize('sheet_name, df', [
+    ('KYCRequests', kyc_requests()),
+    ('Users', schemas.apply('Users', make_users(3))),
+])
+def test_records_columnar_and_stream_render_cells_alike(sheet_name, df):
+    app = Flask(__name__)
+    app.add_url_rule('/', 'rows', lambda: frame_response('rows', df, sheet_name))
+    client = app.test_client()
+
+    records = client.get('/').get_json()['rows']
+    streamed = json.loads(client.get('/?stream=1').get_data(as_text=True))['rows']
+    columnar = client.get('/?format=columnar').get_json()['rows']
+    rebuilt = [{col: columnar['data'][col][i] for col in columnar['columns']} for i in range(columnar['length'])]
+
+    expected = json.loads(json.dumps(schemas.to_records(sheet_name, df), default=str))
+    assert records == streamed == rebuilt == expected
+    if sheet_name == 'KYCRequests':
+        assert [r['SubmissionDate'] for r in records] == ['2025-03-14', '']
@@ -0,0 +1,55 @@
+import pytest
+
+from conftest import make_users
+
+
+@pytest.fixture
+def api(offline_db):
+    import app as bank_app
+    bank_app.use_database(offline_db)
+    offline_db._save_sheet(make_users(3, balance=100.0), 'Users')
+    return bank_app
+
+
+def test_unchanged_responses_revalidate_with_304(api):
+    client = api.app.test_client()
+    first = client.get('/api/user/dashboard/AC1001')
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    again = client.get('/api/user/dashboard/AC1001', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == first.headers['ETag']
+    assert api.response_cache.not_modified >= 1
+
+
+def test_etags_follow_only_the_accounts_a_write_touched(api):
+    db = api.db
+    client = api.app.test_client()
+
+    def etag(account_id):
+        return client.get(f'/api/user/dashboard/{account_id}').headers['ETag']
+
+    first = etag('AC1001')
+
+    # A transfer between two other accounts leaves AC1001's dashboard valid
+    results, _ = db.apply_transfers('AC1002', [{'recipient_account': '10000000002',
+                                                'recipient_ifsc': 'FLUX0000002', 'amount': 5}])
+    assert results[0]['status'] == 'success'
+    assert etag('AC1001') == first
+
+    # Another account's transfer into AC1001 changes its balance, so its ETag moves
+    db.apply_transfers('AC1002', [{'recipient_account': '10000000000',
+                                   'recipient_ifsc': 'FLUX0000000', 'amount': 5}])
+    credited = etag('AC1001')
+    assert credited != first
+    resp = client.get('/api/user/dashboard/AC1001', headers={'If-None-Match': first})
+    assert resp.status_code == 200 and resp.get_json()['balance'] == 105.0
+
+    # So does an admin's KYC decision on it
+    db.submit_kyc('AC1001', 'Passport', 'P123')
+    pending = etag('AC1001')
+    assert pending != credited
+    client.post('/api/admin/kyc-update', json={'account_id': 'AC1001', 'status': 'Approved'})
+    resp = client.get('/api/user/dashboard/AC1001', headers={'If-None-Match': pending})
+    assert resp.status_code == 200 and resp.get_json()['kyc_status'] == 'Approved'
@@ -0,0 +1,44 @@
+import pandas as pd
+
+from conftest import make_users
+from database_manager import DatabaseManager
+from indexes import BeneficiaryIndex, KycIndex
+
+
+def test_kyc_index_keeps_each_status_queue_in_submission_order():
+    index = KycIndex(pd.DataFrame({'AccountID': ['AC1', 'AC2', 'AC1', 'AC3'],
+                                   'Status': ['Rejected', 'Pending', 'Pending', 'Pending']}))
+    assert index.page('Pending') == ([1, 2, 3], 3)
+    assert index.for_account('AC1', 'Pending') == [2]
+
+    index.set_status([2], 'Approved')
+    index.append('AC4', 'Pending')
+    assert index.page('Pending', offset=1, limit=2) == ([3, 4], 3)
+    assert index.count('Approved') == 1 and index.count('Missing') == 0
+    assert index.for_account('AC1') == [0, 2]
+
+
+def test_beneficiary_index_matches_numbers_sheets_returned_as_ints():
+    index = BeneficiaryIndex(pd.DataFrame({'AccountID': ['AC1', 'AC1', 'AC2'],
+                                           'AccountNumber': [10000000001, '10000000002', 10000000001]}))
+    assert index.exists('AC1', '10000000001') and not index.exists('AC2', '10000000002')
+    index.append('AC2', '10000000002')
+    assert index.for_account('AC2') == [2, 3]
+    assert index.count('AC1') == 2 and index.count('AC9') == 0
+
+
+def test_duplicate_payees_are_rejected_after_a_reload(cloud_db, sheets, tmp_path):
+    cloud_db._save_sheet(make_users(3), 'Users')
+    assert cloud_db.add_beneficiary('AC1001', 'User 1', '10000000001', 'FLUX0000001', 'one') == (True, "Beneficiary Added")
+    assert cloud_db.add_beneficiary('AC1001', 'User 1', '10000000001', 'FLUX0000001', 'again') == (
+        False, "Beneficiary already exists")
+    assert cloud_db.add_beneficiary('AC1002', 'User 1', '10000000001', 'FLUX0000001', 'one')[0]
+    assert cloud_db.sheets.drain(10)
+
+    # A fresh process builds the index from what Sheets hands back
+    reopened = DatabaseManager(db_file=str(tmp_path / 'other.xlsx'), sheets_client=sheets, connect_mode='eager')
+    assert reopened.add_beneficiary('AC1001', 'User 1', '10000000001', 'FLUX0000001', 'again') == (
+        False, "Beneficiary already exists")
+    assert reopened.add_beneficiary('AC1001', 'User 2', '10000000002', 'FLUX0000002', 'two')[0]
+    assert [b['Nickname'] for b in reopened.get_beneficiaries('AC1001')] == ['one', 'two']
+    assert reopened.count_beneficiaries('AC1002') == 1
@@ -0,0 +1,42 @@
+import random
+import threading
+import time
+
+import load_test
+
+
+def test_percentile_is_nearest_rank():
+    values = sorted(range(1, 101))
+    assert load_test.percentile(values, 50) == 50
+    assert load_test.percentile(values, 99) == 99
+    assert load_test.percentile([], 99) == 0.0
+
+
+def test_parse_mix():
+    assert load_test.parse_mix('dashboard=3,transfer') == {'dashboard': 3.0, 'transfer': 1.0}
+    assert load_test.parse_mix(None) == load_test.DEFAULT_MIX
+
+
+def test_virtual_users_against_fake_backend():
+    flask_app, client = load_test.build_fake_app(0.0, 0.0)
+    recorder = load_test.Recorder()
+    shared = {'lock': threading.Lock(), 'accounts': []}
+    users = [load_test.VirtualUser(load_test.TestClientTransport(flask_app), recorder, shared,
+                                   load_test.DEFAULT_MIX, random.Random(i)) for i in range(4)]
+
+    def work(user):
+        user.setup()
+        load_test.run_loop(user, time.perf_counter() + 1.0, 0)
+
+    threads = [threading.Thread(target=work, args=(u,)) for u in users]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    report = recorder.summary(1.0)
+    assert len(shared['accounts']) >= 4
+    assert all(code < 500 for counts in recorder.statuses.values() for code in counts)
+    # Every account a signup returned can be read back
+    assert report['GET /api/user/dashboard/<id>']['errors'] == 0
+    assert client.spreadsheet.calls.get('append_rows')
@@ -0,0 +1,99 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from conftest import make_users
+
+pytest.importorskip('pyarrow')
+
+
+def activity(rows):
+    # (account, timestamp, amount) -> ActivityLogs frame
+    return pd.DataFrame({
+        'LogID': [f"LOG-{i + 1}" for i in range(len(rows))],
+        'AccountID': [r[0] for r in rows],
+        'Timestamp': [r[1] for r in rows],
+        'TransactionType': 'Transfer',
+        'TransactionAmount': [float(r[2]) for r in rows],
+        'Description': 'seed',
+        'CyberRiskScore': 10.0,
+    })
+
+
+@pytest.fixture
+def seeded(offline_db):
+    offline_db._save_sheet(make_users(3), 'Users')
+    now = pd.Timestamp.now().floor('s')
+    offline_db._save_sheet(activity([
+        ('AC1001', '2024-01-10 10:00:00', 1),
+        ('AC1001', '2024-01-20 10:00:00', 2),
+        ('AC1002', '2024-02-05 10:00:00', 3),
+        ('AC1002', '2024-03-05 10:00:00', 4),
+        ('AC1001', str(now), 5),
+    ]), 'ActivityLogs')
+    return offline_db
+
+
+def test_rollover_fans_out_into_monthly_partitions(seeded):
+    assert seeded.roll_activity_logs(hot_days=30) == 4
+    index = seeded.archive.index()
+    assert {month: entry['rows'] for month, entry in index.items()} == {'2024-01': 2, '2024-02': 1, '2024-03': 1}
+    assert index['2024-01']['accounts'] == ['AC1001']
+    assert seeded.archive.months('AC1002') == ['2024-03', '2024-02']
+    assert len(seeded._peek_sheet('ActivityLogs')) == 1
+
+    # Reads span both tiers, newest first, and stop opening partitions once satisfied
+    history = seeded.get_user_transactions('AC1001')
+    assert [t['TransactionAmount'] for t in history] == [5, 2, 1]
+    assert [t['TransactionAmount'] for t in seeded.get_recent_activity('AC1002', limit=1)] == [4]
+    assert seeded.get_risk_features('AC1001')['transfer_count'] == 3
+
+
+def test_rollover_is_idempotent_and_ids_continue(seeded):
+    seeded.roll_activity_logs(hot_days=30)
+    assert seeded.roll_activity_logs(hot_days=30) == 0
+    row = seeded.log_system_events([('AC1003', 'after rollover', 0)])[0]
+    assert row['LogID'] == 'LOG-6'
+
+
+def test_activity_logged_during_rollover_is_kept(seeded):
+    stop = threading.Event()
+    logged = []
+
+    def writer():
+        while not stop.is_set():
+            logged.append(seeded.log_system_events([('AC1003', 'concurrent', 0)])[0]['LogID'])
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        archived = seeded.roll_activity_logs(hot_days=30)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert archived == 4
+    hot = set(seeded._peek_sheet('ActivityLogs')['LogID'])
+    assert set(logged) <= hot
+    total = len(hot) + seeded.archive.total_rows()
+    assert total == 5 + len(logged)
+
+
+def test_startup_finishes_an_interrupted_rollover(seeded):
+    from database_manager import DatabaseManager
+    df = seeded._peek_sheet('ActivityLogs')
+    cold = df['Timestamp'] < pd.Timestamp('2024-02-01')
+    seeded.archive.append(df[cold])  # crashed before the sheet was trimmed
+    assert seeded.get_risk_features('AC1001')['transfer_count'] == 5
+
+    restarted = DatabaseManager(db_file=seeded.db_file, connect_mode='eager')
+    assert list(restarted._peek_sheet('ActivityLogs')['LogID']) == ['LOG-3', 'LOG-4', 'LOG-5']
+    assert restarted.get_risk_features('AC1001')['transfer_count'] == 3
+    assert [t['TransactionAmount'] for t in restarted.get_user_transactions('AC1001')] == [5, 2, 1]
+
+
+def test_descriptions_stay_plain_text(seeded):
+    seeded.roll_activity_logs(hot_days=30)
+    for df in [seeded._peek_sheet('ActivityLogs'), *seeded.archive.frames()]:
+        assert not isinstance(df['Description'].dtype, pd.CategoricalDtype)
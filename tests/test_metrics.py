@@ -0,0 +1,24 @@
+import threading
+
+import metrics
+
+
+def test_exited_threads_fold_into_one_total():
+    before = metrics.snapshot()
+    key = ('flux_test_events_total', ())
+    hist = ('flux_test_seconds', ())
+
+    def record():
+        metrics.inc('flux_test_events_total')
+        metrics.observe('flux_test_seconds', 0.003)
+
+    for _ in range(50):
+        thread = threading.Thread(target=record)
+        thread.start()
+        thread.join()
+
+    after = metrics.snapshot()
+    assert after[key] - before.get(key, 0) == 50
+    assert after[hist][2] - before.get(hist, [None, 0, 0])[2] == 50
+    assert len(metrics._shards) == len([t for t, _ in metrics._shards if t.is_alive()])
+    assert len(metrics._shards) <= threading.active_count()
@@ -0,0 +1,66 @@
+import threading
+
+import load_test
+import schemas
+from conftest import make_users
+
+
+def rebuilt(db):
+    return db._build_profiles(db._peek_sheet('ActivityLogs'))
+
+
+def test_profiles_advance_with_every_write_path(offline_db):
+    db = offline_db
+    db._save_sheet(make_users(3), 'Users')
+    db.log_activity('AC1001', {'TransactionType': 'Transfer', 'TransactionAmount': 100.0}, 80)
+    assert db.get_user_profile('AC1001')['transfer_count'] == 1
+
+    db.log_activity('AC1001', {'TransactionType': 'Transfer', 'TransactionAmount': 50.0}, 10)
+    db.log_activities([('AC1002', {'TransactionType': 'Transfer', 'TransactionAmount': 7.0}, 90)])
+    db.log_system_events([('AC1003', 'blocked', 0)])
+
+    advanced = db._index('ActivityLogs', db._build_profiles)[1]
+    fresh = rebuilt(db)
+    for account_id in ('AC1001', 'AC1002', 'AC1003'):
+        got, want = advanced.profile(account_id), fresh.profile(account_id)
+        for key in ('activity_count', 'transfer_count', 'transfer_total', 'max_risk', 'high_risk_count'):
+            assert got[key] == want[key], (account_id, key)
+    assert advanced.profile('AC1001')['transfer_total'] == 150.0
+    assert advanced.profile('AC1001')['high_risk_count'] == 1
+
+
+def test_concurrent_logging_counts_each_row_once(offline_db):
+    db = offline_db
+    db._save_sheet(make_users(2), 'Users')
+    db.log_system_events([('AC1001', 'seed', 0)])
+    db.get_user_profile('AC1001')  # build the profiles so the writes advance them
+    barrier = threading.Barrier(6)
+
+    def run(t):
+        barrier.wait()
+        for _ in range(4):
+            db.log_activities([('AC1002', {'TransactionType': 'Transfer', 'TransactionAmount': 1.0}, 10)])
+
+    workers = [threading.Thread(target=run, args=(t,)) for t in range(6)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    assert db._index('ActivityLogs', db._build_profiles)[1].profile('AC1002')['transfer_count'] == 24
+
+
+def test_transfers_do_not_build_profiles():
+    flask_app, _ = load_test.build_fake_app(0.0, 0.0)
+    import app as bank_app
+    db = bank_app.db
+    db._save_sheet(make_users(2, balance=100), 'Users')
+    client = flask_app.test_client()
+    resp = client.post('/api/transaction/transfer', json={
+        'sender_id': 'AC1001', 'amount': 10, 'recipient_account': '10000000001', 'recipient_ifsc': 'FLUX0000001'})
+    assert resp.status_code == 200
+    resp = client.post('/api/transaction/batch-transfer', json={
+        'sender_id': 'AC1001', 'transfers': [
+            {'recipient_account': '10000000001', 'recipient_ifsc': 'FLUX0000001', 'amount': 5}]})
+    assert resp.status_code == 200
+    assert ('ActivityLogs', db._build_profiles) not in db._indexes
+    assert schemas.to_records('Users', db._peek_sheet('Users'))[1]['AccountBalance'] == 115
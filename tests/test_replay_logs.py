@@ -0,0 +1,55 @@
+import pandas as pd
+
+import load_test
+from replay_logs import Replayer, load_events
+
+SESSION = {'SessionID': 'SES-1', 'ClickRate': 1.0, 'PagesVisited': 3, 'SessionDuration': 30,
+           'DeviceTrustScore': 0.9, 'Channel': 'Web', 'NewDeviceLogin': 0, 'RapidTransactions': 0}
+
+
+def event(account, username, ts, tx_type, amount=0.0, failed=0, added=0, label=0):
+    return dict(SESSION, AccountID=account, Username=username, Password='pw', FullName=username.title(),
+                Email=f"{username}@example.com", Phone='9000000000', AccountBalance=0.0,
+                Timestamp=ts, TransactionType=tx_type, TransactionAmount=amount, FailedLoginCount=failed,
+                BeneficiaryAdded=added, BeneficiaryName='Bob Payee', RiskLabel=label)
+
+
+def test_replay_keeps_each_accounts_events_in_order(tmp_path):
+    # Listed out of order on purpose: the credit must land before the transfer that spends it
+    rows = [
+        event('AC1', 'alice', '2025-01-01 10:05:00', 'Transfer', 40.0, added=1, label=1),
+        event('AC1', 'alice', '2025-01-01 10:00:00', 'Credit', 100.0),
+        event('AC2', 'bob', '2025-01-01 10:01:00', 'Login', failed=2),
+        event('AC1', 'alice', '2025-01-01 10:06:00', 'Transfer', 10.0, added=1, label=1),
+    ]
+    path = tmp_path / 'logs.csv'
+    pd.DataFrame(rows).to_csv(path, index=False)
+    events = load_events(str(path))
+    assert list(events['TransactionType']) == ['Credit', 'Login', 'Transfer', 'Transfer']
+
+    flask_app, _ = load_test.build_fake_app(0.0, 0.0)
+    recorder = load_test.Recorder()
+    replayer = Replayer(lambda: load_test.TestClientTransport(flask_app), recorder, 2, threshold=75.0)
+    replayer.seed(events)
+    assert set(replayer.accounts) == {'AC1', 'AC2'}
+    assert replayer.labels == {'AC1': 1, 'AC2': 0}
+
+    replayer.run(events, speed=0)
+    assert len(replayer.lags) == 4
+    assert recorder.statuses['POST /api/transaction/deposit'] == {200: 1}
+    assert recorder.statuses['POST /api/auth/login (fail)'] == {401: 1}
+    # The payee is added the first time only, and both transfers are funded by the credit
+    assert recorder.statuses['POST /api/user/beneficiaries'] == {200: 1}
+    assert recorder.statuses['POST /api/transaction/transfer'] == {200: 2}
+    assert len(replayer.transfer_outcomes) == 2
+
+    bob = replayer.accounts['AC2']['account_id']
+    status, dashboard = load_test.TestClientTransport(flask_app).request('GET', f'/api/user/dashboard/{bob}')
+    assert status == 200 and dashboard['balance'] == 50.0
+
+
+def test_detection_report_scores_against_the_threshold():
+    replayer = Replayer(None, None, 1, threshold=75.0)
+    report = replayer.detection_report([(1, 80.0), (1, 10.0), (0, 90.0), (0, 5.0), (0, 20.0)])
+    assert (report['tp'], report['fn'], report['fp'], report['tn']) == (1, 1, 1, 2)
+    assert report['precision'] == report['recall'] == report['f1'] == 0.5
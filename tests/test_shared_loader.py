@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+
+import shared_loader
+from conftest import make_users
+from database_manager import DatabaseManager
+from shared_tables import SharedTables
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def pair(tmp_path, sheets):
+    # A worker and the loader over one spreadsheet and one table store
+    store = str(tmp_path / 'shared')
+    worker = DatabaseManager(db_file=str(tmp_path / 'db.xlsx'), sheets_client=sheets,
+                             connect_mode='eager', shared_role='worker')
+    loader = DatabaseManager(db_file=str(tmp_path / 'db.xlsx'), sheets_client=sheets,
+                             connect_mode='eager', shared_role='loader')
+    worker.shared, loader.shared = SharedTables(store), SharedTables(store)
+    loader.CACHE_TTL = 0
+    loader._save_sheet(make_users(2), 'Users')
+    assert loader.sheets.drain(10)
+    yield worker, loader
+    worker.sheets.drain(10)
+
+
+def test_loader_waits_for_a_slow_flush_instead_of_a_fixed_grace(pair):
+    worker, loader = pair
+    gate = threading.Event()
+    write = worker.sheets.writer
+
+    def slow(*args):
+        gate.wait(10)
+        write(*args)
+    worker.sheets.writer = slow
+
+    assert worker.update_balance('AC1001', 50)[0]
+    assert worker.sheets.pending('Users')
+    # Sheets still holds the old balance: the loader's fetch must not replace the worker's write
+    shared_loader.sync_once(loader, {'Users'})
+    assert worker.get_user_by_id('AC1001')['AccountBalance'] == 50
+
+    gate.set()
+    assert worker.sheets.drain(10)
+    assert worker.shared.lookup('Users')['unsynced'] == {}
+    pending = {'Users'}
+    shared_loader.sync_once(loader, pending)
+    assert not pending  # published again once Sheets caught up
+    assert worker.get_user_by_id('AC1001')['AccountBalance'] == 50
+
+
+def test_workers_keep_the_published_buffers(pair):
+    import pandas as pd
+    worker, loader = pair
+    shared_loader.sync_once(loader, {'Users'})
+    users = worker._peek_sheet('Users')
+    assert users['Username'].dtype.storage == 'pyarrow'  # not copied out into Python strings
+    assert isinstance(users['Status'].dtype, pd.CategoricalDtype)
+    assert worker.get_user_by_id('AC1002')['Username'] == 'user1'
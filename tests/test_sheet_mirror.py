@@ -0,0 +1,100 @@
+import pytest
+
+from conftest import make_users
+from database_manager import SHEETS
+from sheet_mirror import SheetMirror
+
+
+@pytest.fixture
+def mirrored(cloud_db, tmp_path):
+    db = cloud_db
+    db._save_sheet(make_users(4), 'Users')
+    db.log_system_events([('AC1001', 'seed', 0), ('AC1002', 'seed', 0)])
+    assert db.sheets.drain(10)
+    db.mirror = SheetMirror(db, str(tmp_path / 'mirror'), SHEETS, block=2)
+    db.mirror.sync_once()
+    return db
+
+
+def calls(db):
+    return dict(db.sh.calls)
+
+
+def test_unchanged_spreadsheet_costs_one_call(mirrored):
+    before = calls(mirrored)
+    mirrored.mirror.sync_once()
+    after = calls(mirrored)
+    assert {k: after[k] - before.get(k, 0) for k in after if after[k] != before.get(k, 0)} == {'get_lastUpdateTime': 1}
+
+
+def test_tail_sync_pulls_only_new_rows(mirrored):
+    db = mirrored
+    ws = db.sh.worksheet('ActivityLogs')
+    header = ws.row_values(1)
+    row = dict(zip(header, ws.get_all_values()[-1]), LogID='LOG-3', AccountID='AC1003', Description='elsewhere')
+    ws.append_rows([[row[c] for c in header]])
+    before = calls(db)
+
+    db.mirror.sync_once()
+    hot = db._peek_sheet('ActivityLogs')
+    assert list(hot['LogID']) == ['LOG-1', 'LOG-2', 'LOG-3']
+    assert hot['Description'].iat[-1] == 'elsewhere'
+    assert calls(db)['batch_get'] - before.get('batch_get', 0) >= 1
+    assert db.mirror.modified == db.sh.get_lastUpdateTime()
+
+
+def test_edit_elsewhere_bumps_only_the_changed_block(mirrored):
+    db = mirrored
+    ws = db.sh.worksheet('Users')
+    values = ws.get_all_values()
+    balance = values[0].index('AccountBalance')
+    values[4][balance] = '77'  # AC1004, second block of two rows
+    ws.update(range_name='A1', values=values)
+    epoch = db._sheet_epoch.get('Users')
+    versions = {a: db._account_version.get(('Users', a), 0) for a in ('AC1001', 'AC1003', 'AC1004')}
+
+    db.mirror.sync_once()
+    assert db.get_user_by_id('AC1004')['AccountBalance'] == 77
+    assert db._sheet_epoch.get('Users') == epoch
+    assert db._account_version.get(('Users', 'AC1001'), 0) == versions['AC1001']
+    assert db._account_version[('Users', 'AC1003')] > versions['AC1003']
+    assert db._account_version[('Users', 'AC1004')] > versions['AC1004']
+
+
+def test_local_write_during_pull_is_kept_and_round_left_incomplete(mirrored):
+    db = mirrored
+    ws = db.sh.worksheet('Users')
+    values = ws.get_all_values()
+    values[1][values[0].index('FullName')] = 'Renamed Elsewhere'
+    ws.update(range_name='A1', values=values)
+
+    # A deposit lands while the mirror is reading Users
+    real = ws.get_all_values
+
+    def racing():
+        result = real()
+        db.update_balance('AC1002', 25)
+        return result
+    ws.get_all_values = racing
+    modified = db.mirror.modified
+    db.mirror.sync_once()
+    ws.get_all_values = real
+
+    assert db.get_user_by_id('AC1002')['AccountBalance'] == 25
+    assert db.mirror.modified == modified  # not recorded as a complete pull
+
+    assert db.sheets.drain(10)
+    db.mirror.sync_once()
+    assert db.mirror.modified == db.sh.get_lastUpdateTime()
+    assert db.get_user_by_id('AC1002')['AccountBalance'] == 25
+
+
+def test_restart_serves_the_disk_copy(mirrored, tmp_path, sheets):
+    pytest.importorskip('pyarrow')
+    from database_manager import DatabaseManager
+    mirrored.mirror.save()
+    db = DatabaseManager(db_file=str(tmp_path / 'db.xlsx'), sheets_client=sheets, connect_mode='eager')
+    db.mirror = SheetMirror(db, str(tmp_path / 'mirror'), SHEETS)
+    sheets.spreadsheet.quota_per_min = 0  # Sheets unreachable from here on
+    assert db.get_user_by_id('AC1003')['Username'] == 'user2'
+    assert not sheets.spreadsheet.errors
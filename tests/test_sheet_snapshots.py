@@ -0,0 +1,30 @@
+import pandas as pd
+import pytest
+
+from conftest import make_users
+
+pytest.importorskip('pyarrow')
+
+from database_manager import DatabaseManager
+from sheet_snapshots import SheetSnapshots
+
+
+def test_snapshots_are_rebuilt_when_the_workbook_changes(tmp_path, monkeypatch):
+    path = str(tmp_path / 'db.xlsx')
+    DatabaseManager(db_file=path, connect_mode='eager')._save_sheet(make_users(2), 'Users')
+    snapshots = SheetSnapshots(path)
+    assert len(snapshots.load('Users')) == 2
+
+    # Edited by hand: the stamp no longer matches, so the snapshots are stale
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        make_users(3).to_excel(writer, sheet_name='Users', index=False)
+    assert snapshots.load('Users') is None
+
+    reopened = DatabaseManager(db_file=path, connect_mode='eager')
+    assert len(reopened.get_all_users()) == 3
+    assert len(snapshots.load('Users')) == 3
+
+    # Fresh again, so the next start never parses the workbook
+    monkeypatch.setattr(pd, 'read_excel', lambda *a, **k: pytest.fail("workbook parsed"))
+    again = DatabaseManager(db_file=path, connect_mode='eager')
+    assert list(again.get_all_users(as_frame=True)['AccountID']) == ['AC1001', 'AC1002', 'AC1003']
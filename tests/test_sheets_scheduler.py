@@ -0,0 +1,188 @@
+import threading
+import time
+
+import gspread
+import pytest
+
+from conftest import make_users
+from fake_sheets import _ErrorResponse
+from sheets_scheduler import SheetsScheduler, TokenBucket
+
+
+def api_error(code):
+    return gspread.exceptions.APIError(_ErrorResponse(code, 'ERROR', 'injected'))
+
+
+class Recorder:
+    # Scheduler writer that records flushes and can be held or made to fail
+    def __init__(self, fail=0):
+        self.flushes = []
+        self.fail = fail
+        self.release = threading.Event()
+        self.release.set()
+        self.started = threading.Event()
+
+    def __call__(self, sheet, kind, values):
+        self.started.set()
+        self.release.wait()
+        if self.fail:
+            self.fail -= 1
+            raise api_error(503)
+        self.flushes.append((sheet, kind, values))
+
+
+def test_token_bucket_paces_after_the_burst():
+    bucket = TokenBucket(per_minute=60, capacity=2)
+    t = bucket.updated
+    assert bucket.take(t) == 0
+    assert bucket.take(t) == 0
+    assert bucket.take(t) == pytest.approx(1.0)
+    assert bucket.take(t + 0.5) == pytest.approx(0.5)
+    assert bucket.take(t + 1.0) == 0
+    bucket.empty()
+    assert bucket.take(t + 1.0) == pytest.approx(1.0)
+
+
+def test_calls_are_held_to_the_quota():
+    scheduler = SheetsScheduler(Recorder(), quota_per_min=600, burst=1)
+    started = time.monotonic()
+    for _ in range(4):
+        scheduler.call('read', lambda: None)
+    assert time.monotonic() - started >= 0.28  # 3 calls past the burst at 10/s
+
+
+def test_queued_writes_coalesce_per_worksheet():
+    writer = Recorder()
+    scheduler = SheetsScheduler(writer)
+    writer.release.clear()
+    scheduler.enqueue('ActivityLogs', 'append', [['1']])
+    writer.started.wait(5)
+    # While the first flush is in flight the rest pile up and merge
+    scheduler.enqueue('ActivityLogs', 'append', [['2']])
+    scheduler.enqueue('ActivityLogs', 'append', [['3']])
+    scheduler.enqueue('Users', 'save', [['h'], ['old']])
+    scheduler.enqueue('Users', 'append', [['x']])
+    scheduler.enqueue('Users', 'save', [['h'], ['new']])
+    scheduler.enqueue('Users', 'append', [['y']])
+    assert scheduler.backlog()['queued'] == {'ActivityLogs': 2, 'Users': 4}
+    writer.release.set()
+    assert scheduler.drain(5)
+    assert writer.flushes == [
+        ('ActivityLogs', 'append', [['1']]),
+        ('ActivityLogs', 'append', [['2'], ['3']]),
+        ('Users', 'save', [['h'], ['new'], ['y']]),
+    ]
+
+
+def test_bursts_of_writes_cost_few_sheets_calls(cloud_db, sheets):
+    cloud_db._save_sheet(make_users(2), 'Users')
+    sheets.spreadsheet.latency = 0.2  # writes arrive faster than Sheets takes them
+    for _ in range(30):
+        cloud_db.log_system_events([('AC1001', 'burst', 0)])
+    assert cloud_db.sheets.drain(10)
+    calls = cloud_db.sh.calls
+    assert calls.get('append_rows', 0) + calls.get('update', 0) < 30
+    assert len(cloud_db.sh.worksheet('ActivityLogs').get_all_records()) == 30
+
+
+def test_reads_are_served_before_background_flushes():
+    scheduler = SheetsScheduler(Recorder(), quota_per_min=300, burst=1)
+    scheduler.call('prime', lambda: None)  # bucket now empty, next token in 0.2s
+    order = []
+
+    def background():
+        with scheduler.background():
+            scheduler.call('flush', order.append, 'flush')
+
+    flusher = threading.Thread(target=background)
+    flusher.start()
+    time.sleep(0.05)
+    reader = threading.Thread(target=scheduler.call, args=('read', order.append, 'read'))
+    reader.start()
+    flusher.join()
+    reader.join()
+    assert order == ['read', 'flush']
+
+
+def test_retryable_errors_back_off_then_succeed():
+    scheduler = SheetsScheduler(Recorder(), backoff=0.01, max_attempts=4)
+    attempts = []
+
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise api_error(429 if len(attempts) == 1 else 503)
+        return 'ok'
+
+    assert scheduler.call('flaky', flaky) == 'ok'
+    assert len(attempts) == 3
+    assert attempts[1] - attempts[0] >= 0.01
+    assert attempts[2] - attempts[1] >= 0.02
+
+
+def test_gives_up_after_max_attempts_and_on_client_errors():
+    scheduler = SheetsScheduler(Recorder(), backoff=0.001, max_attempts=3)
+    attempts = []
+
+    def failing(code):
+        attempts.append(code)
+        raise api_error(code)
+
+    with pytest.raises(gspread.exceptions.APIError):
+        scheduler.call('down', failing, 503)
+    assert attempts == [503] * 3
+    with pytest.raises(gspread.exceptions.APIError):
+        scheduler.call('bad', failing, 400)
+    assert attempts[3:] == [400]
+
+
+def test_failed_flush_is_requeued_and_stays_pending():
+    writer = Recorder(fail=2)
+    scheduler = SheetsScheduler(writer, backoff=0.05)
+    writer.release.clear()
+    scheduler.enqueue('Users', 'save', [['h'], ['a']])
+    writer.started.wait(5)
+    scheduler.enqueue('Users', 'append', [['b']])
+    writer.release.set()
+
+    deadline = time.monotonic() + 5
+    while scheduler.failed < 1 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert scheduler.pending('Users')
+    assert scheduler.drain(5)
+    assert not scheduler.pending('Users')
+    assert scheduler.failed == 2
+    # The failed save and the append queued behind it went out together
+    assert writer.flushes == [('Users', 'save', [['h'], ['a'], ['b']])]
+
+
+def test_failed_flush_reaches_sheets_once_it_recovers(cloud_db, sheets):
+    cloud_db._save_sheet(make_users(2), 'Users')
+    assert cloud_db.sheets.drain(10)
+    sheets.spreadsheet.error_rate = 1.0
+    cloud_db.update_balance('AC1001', 50)
+    time.sleep(0.2)
+    assert cloud_db.sheets.pending('Users')
+    cloud_db._cache_time['Users'] = 0  # expired: must still not be refetched
+    assert cloud_db.get_user_by_id('AC1001')['AccountBalance'] == 50
+    sheets.spreadsheet.error_rate = 0.0
+    assert cloud_db.sheets.drain(10)
+    stored = {r['AccountID']: r['AccountBalance'] for r in cloud_db.sh.worksheet('Users').get_all_records()}
+    assert stored['AC1001'] == 50
+
+
+def test_waiting_writers_are_released_only_once_sheets_has_the_write():
+    writer = Recorder(fail=1)
+    scheduler = SheetsScheduler(writer, backoff=0.05, async_writes=False)
+    writer.release.clear()
+    returned = threading.Event()
+    threading.Thread(target=lambda: (scheduler.enqueue('Users', 'save', [['h'], ['a']]), returned.set())).start()
+    writer.started.wait(5)
+    writer.release.set()
+
+    deadline = time.monotonic() + 5
+    while scheduler.failed < 1 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert not returned.is_set()  # the flush failed: the write is not in Sheets yet
+    assert returned.wait(5)
+    assert writer.flushes == [('Users', 'save', [['h'], ['a']])]
@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+from conftest import make_users
+from id_allocator import IdAllocator
+
+
+def signup_concurrently(db, threads=8, per_thread=5):
+    barrier = threading.Barrier(threads)
+    created = []
+
+    def run(t):
+        barrier.wait()
+        for i in range(per_thread):
+            ok, user = db.create_user(f"t{t}_{i}", 'pw', 'Test User', 'test@example.com', '9000000000')
+            assert ok, user
+            created.append(user['AccountID'])
+
+    workers = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return created
+
+
+@pytest.mark.parametrize('backend', ['offline_db', 'cloud_db'])
+def test_concurrent_signups_are_not_lost(backend, request):
+    db = request.getfixturevalue(backend)
+    db._save_sheet(make_users(3), 'Users')
+    created = signup_concurrently(db)
+
+    assert len(set(created)) == len(created) == 40
+    users = db.get_all_users(as_frame=True)
+    assert set(created) <= set(users['AccountID'])
+    assert users['AccountID'].is_unique
+    for account_id in created:
+        assert db.get_user_by_id(account_id) is not None
+
+    if db.use_cloud:
+        assert db.sheets.drain(10)
+        stored = db.sh.worksheet('Users').get_all_records()
+        assert {r['AccountID'] for r in stored} == set(users['AccountID'])
+
+
+def test_duplicate_username_rejected_under_concurrency(offline_db):
+    offline_db._save_sheet(make_users(1), 'Users')
+    barrier = threading.Barrier(6)
+    results = []
+
+    def run():
+        barrier.wait()
+        results.append(offline_db.create_user('same', 'pw', 'Test User', 'test@example.com', '1')[0])
+
+    workers = [threading.Thread(target=run) for _ in range(6)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    assert results.count(True) == 1
+
+
+def test_allocators_sharing_a_directory_never_repeat(tmp_path):
+    first, second = IdAllocator('db', str(tmp_path), block=3), IdAllocator('db', str(tmp_path), block=3)
+    drawn = [a.next(1001) for _ in range(10) for a in (first, second)]
+    assert len(set(drawn)) == len(drawn)
+    assert min(drawn) >= 1001
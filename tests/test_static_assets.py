@@ -0,0 +1,19 @@
+from flask import Flask
+
+from static_assets import StaticAssets
+
+
+def test_pages_are_served_compressed_and_revalidated(tmp_path):
+    (tmp_path / 'index.html').write_text('<html>' + 'flux ' * 500 + '</html>')
+    assets = StaticAssets(str(tmp_path))
+    app = Flask(__name__)
+    app.add_url_rule('/', 'index', lambda: assets.serve('index.html'))
+    client = app.test_client()
+
+    resp = client.get('/?v=anything', headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert resp.headers['Cache-Control'] == 'public, max-age=300, must-revalidate'
+    assert resp.headers['Vary'] == 'Accept-Encoding'
+
+    again = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': resp.headers['ETag']})
+    assert again.status_code == 304
@@ -0,0 +1,43 @@
+import io
+import json
+
+import pytest
+
+import structured_log
+
+
+@pytest.fixture
+def captured():
+    # Swap the process-wide listener for one writing to a buffer, then put it back
+    structured_log.shutdown()
+    stream = io.StringIO()
+    structured_log.setup(level='DEBUG', fmt='json', samples={}, stream=stream)
+    yield stream
+    structured_log.shutdown()
+    structured_log.setup()
+
+
+def test_credentials_are_masked_before_they_are_queued(captured):
+    log = structured_log.get_logger('flux.test')
+    fields = {'username': 'alice', 'password': 'hunter2', 'body': {'Token': 'abc', 'rows': [{'secret': 's'}]}}
+    log.info("login_attempt", **fields)
+    structured_log.shutdown()
+
+    entry = json.loads(captured.getvalue())
+    assert entry['event'] == 'login_attempt' and entry['username'] == 'alice'
+    assert entry['password'] == structured_log.REDACTED
+    assert entry['body'] == {'Token': structured_log.REDACTED, 'rows': [{'secret': structured_log.REDACTED}]}
+    # The caller's own objects are left alone
+    assert fields['password'] == 'hunter2'
+
+
+def test_shutdown_drains_everything_still_queued(captured):
+    log = structured_log.get_logger('flux.test')
+    dropped = structured_log.dropped
+    for i in range(500):
+        log.debug("tick", i=i)
+    structured_log.shutdown()
+
+    lines = captured.getvalue().splitlines()
+    assert [json.loads(line)['i'] for line in lines] == list(range(500))
+    assert structured_log.dropped == dropped
@@ -0,0 +1,92 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from conftest import make_users
+
+BACKENDS = ['offline_db', 'cloud_db']
+
+
+def run_threads(count, target):
+    barrier = threading.Barrier(count)
+
+    def run(t):
+        barrier.wait()
+        target(t)
+
+    workers = [threading.Thread(target=run, args=(t,)) for t in range(count)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+
+def leg(pos, amount):
+    return {"recipient_account": str(10000000000 + pos), "recipient_ifsc": f"FLUX0{pos:06d}", "amount": amount}
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_concurrent_deposits_all_land(backend, request):
+    db = request.getfixturevalue(backend)
+    db._save_sheet(make_users(2), 'Users')
+
+    def deposit(t):
+        for _ in range(5):
+            assert db.update_balance('AC1001', 10)[0]
+
+    run_threads(8, deposit)
+    assert db.get_user_by_id('AC1001')['AccountBalance'] == 400
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_batches_and_single_transfers_do_not_overwrite_each_other(backend, request):
+    db = request.getfixturevalue(backend)
+    db._save_sheet(make_users(4, balance=1000), 'Users')
+
+    def work(t):
+        for _ in range(3):
+            if t % 2:
+                results, _ = db.apply_transfers('AC1001', [leg(1, 5), leg(2, 5)])
+                assert all(r['status'] == 'success' for r in results)
+            else:
+                assert db.update_balance('AC1001', -10)[0]
+                assert db.update_balance('AC1004', 10)[0]
+
+    run_threads(8, work)
+    balances = {u['AccountID']: u['AccountBalance'] for u in db.get_all_users()}
+    # 12 batches of 2 x 5 and 12 single transfers of 10 from AC1001
+    assert balances == {'AC1001': 760, 'AC1002': 1060, 'AC1003': 1060, 'AC1004': 1120}
+
+    if db.use_cloud:
+        assert db.sheets.drain(10)
+        stored = {r['AccountID']: r['AccountBalance'] for r in db.sh.worksheet('Users').get_all_records()}
+        assert stored == balances
+
+
+def test_all_or_nothing_rejects_the_whole_batch(offline_db):
+    offline_db._save_sheet(make_users(3, balance=100), 'Users')
+    results, balance = offline_db.apply_transfers('AC1001', [leg(1, 60), leg(2, 60)])
+    assert [r['status'] for r in results] == ['error', 'error']
+    assert balance == 100
+
+    results, balance = offline_db.apply_transfers('AC1001', [leg(1, 60), leg(2, 60)], atomic=False)
+    assert [r['status'] for r in results] == ['success', 'error']
+    assert balance == 40
+    assert offline_db.get_user_by_id('AC1002')['AccountBalance'] == 160
+
+
+def test_offline_saves_of_different_sheets_keep_the_workbook_whole(offline_db):
+    offline_db._save_sheet(make_users(2), 'Users')
+
+    def work(t):
+        for i in range(3):
+            if t % 2:
+                assert offline_db.update_balance('AC1001', 10)[0]
+            else:
+                offline_db.log_system_events([('AC1002', f"event {t}/{i}", 0)])
+
+    run_threads(6, work)
+    stored = pd.read_excel(offline_db.db_file, sheet_name=None, engine='openpyxl')
+    assert stored['Users'].set_index('AccountID').at['AC1001', 'AccountBalance'] == 90
+    assert len(stored['ActivityLogs']) == 9
@@ -0,0 +1,145 @@
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import make_users
+from write_ahead_log import WriteAheadLog
+
+pytest.importorskip('pyarrow')
+
+
+def events(count, start=0):
+    return pd.DataFrame({
+        'LogID': [f"LOG-{start + i + 1}" for i in range(count)],
+        'AccountID': 'AC1001',
+        'Timestamp': '2025-01-01 10:00:00',
+        'TransactionType': 'System',
+        'TransactionAmount': 0.0,
+        'Description': 'event',
+        'CyberRiskScore': 0.0,
+    })
+
+
+def logged(directory):
+    # A log holding Users (one patched balance) and three ActivityLogs appends
+    wal = WriteAheadLog(directory, sync='always', snapshot_records=10**6)
+    wal.start({})
+    users = make_users(3)
+    wal.log_change('Users', None, users)
+    paid = users.copy()
+    paid.loc[paid['AccountID'] == 'AC1002', 'AccountBalance'] = 40.0
+    wal.log_change('Users', users, paid, accounts=['AC1002'])
+    before = None
+    for i in range(3):
+        after = events(i + 1)
+        wal.log_change('ActivityLogs', before, after, appended=1)
+        before = after
+    return wal
+
+
+def release(wal):
+    wal.close(clean=False)
+    wal._owner.close()
+
+
+def test_replay_stops_at_a_torn_record(tmp_path):
+    directory = str(tmp_path / 'wal')
+    wal = logged(directory)
+    segment = os.path.join(directory, wal._segments()[-1])
+    release(wal)
+    with open(segment, 'ab') as f:
+        f.write(b'0badc0de {"seq": 6, "sheet": "ActivityLogs", "op": "app')  # crash mid-write
+
+    recovered = WriteAheadLog(directory).recover()
+    assert list(recovered['ActivityLogs']['LogID']) == ['LOG-1', 'LOG-2', 'LOG-3']
+    assert recovered['Users'].set_index('AccountID').at['AC1002', 'AccountBalance'] == 40
+    with open(segment, 'rb') as f:
+        assert f.read().endswith(b'\n')  # torn tail cut off
+
+
+def test_snapshot_plus_later_records_recover(tmp_path):
+    directory = str(tmp_path / 'wal')
+    wal = logged(directory)
+    cache = dict(wal._last)
+    wal.snapshot(cache)
+    wal.log_change('ActivityLogs', cache['ActivityLogs'], events(4), appended=1)
+    release(wal)
+
+    recovered = WriteAheadLog(directory).recover()
+    assert list(recovered['ActivityLogs']['LogID']) == ['LOG-1', 'LOG-2', 'LOG-3', 'LOG-4']
+    assert len(recovered['Users']) == 3
+
+
+def test_a_second_log_on_the_same_directory_is_refused(tmp_path):
+    directory = str(tmp_path / 'wal')
+    wal = logged(directory)
+    with pytest.raises(RuntimeError):
+        WriteAheadLog(directory)
+
+    # A clean close empties the log but keeps it owned
+    wal.close(clean=True)
+    assert sorted(os.listdir(directory)) == ['.lock', 'wal-6.log']
+    with pytest.raises(RuntimeError):
+        WriteAheadLog(directory)
+
+
+def test_second_worker_runs_without_a_log(tmp_path, monkeypatch):
+    from database_manager import DatabaseManager
+    monkeypatch.setenv('FLUX_WAL', '1')
+    monkeypatch.setenv('FLUX_WAL_DIR', str(tmp_path / 'wal'))
+    first = DatabaseManager(db_file=str(tmp_path / 'db.xlsx'), connect_mode='eager')
+    second = DatabaseManager(db_file=str(tmp_path / 'db.xlsx'), connect_mode='eager')
+    assert first.wal is not None
+    assert second.wal is None
+
+
+def test_a_restart_replays_only_what_sheets_never_got(tmp_path, monkeypatch, sheets):
+    import threading
+
+    import schemas
+    from database_manager import DatabaseManager
+    monkeypatch.setenv('FLUX_WAL', '1')
+    monkeypatch.setenv('FLUX_WAL_DIR', str(tmp_path / 'wal'))
+    path = str(tmp_path / 'db.xlsx')
+    owner = DatabaseManager(db_file=path, sheets_client=sheets, connect_mode='eager')
+    owner._save_sheet(make_users(3, balance=100.0), 'Users')
+    owner._save_sheet(events(2), 'ActivityLogs')
+    assert owner.sheets.drain(5)
+
+    # Sheets stops taking the owner's flushes: these two writes never get there
+    gate = threading.Event()
+    owner.sheets.writer = lambda *args: gate.wait()
+    owner._append_rows('ActivityLogs', events(1, start=2))
+    users = schemas.writable(owner._peek_sheet('Users'))
+    users.loc[users['AccountID'] == 'AC1001', 'AccountBalance'] = 50.0
+    owner._save_sheet(users, 'Users', accounts=['AC1001'])
+
+    # Another worker (no log of its own) writes straight to Sheets meanwhile
+    other = DatabaseManager(db_file=path, sheets_client=sheets, connect_mode='eager')
+    assert other.wal is None
+    other._append_rows('ActivityLogs', events(1, start=10))
+    users = schemas.writable(other._peek_sheet('Users'))
+    users.loc[users['AccountID'] == 'AC1002', 'AccountBalance'] = 70.0
+    other._save_sheet(users, 'Users', accounts=['AC1002'])
+    assert other.sheets.drain(5)
+
+    # The owner is killed; its replacement replays the log
+    release(owner.wal)
+    owner.wal = None
+    restarted = DatabaseManager(db_file=path, sheets_client=sheets, connect_mode='eager')
+    assert restarted.sheets.drain(5)
+    owner.sheets.writer = lambda *args: None
+    gate.set()
+
+    spreadsheet = sheets.open_by_key('any')
+    balances = {r['AccountID']: float(r['AccountBalance']) for r in spreadsheet.worksheet('Users').get_all_records()}
+    assert balances == {'AC1001': 50.0, 'AC1002': 70.0, 'AC1003': 100.0}
+    logs = [r['LogID'] for r in spreadsheet.worksheet('ActivityLogs').get_all_records()]
+    assert logs == ['LOG-1', 'LOG-2', 'LOG-11', 'LOG-3']
+
+    # Replayed once: after the next restart there is nothing left to push
+    release(restarted.wal)
+    again = WriteAheadLog(str(tmp_path / 'wal'))
+    again.recover()
+    assert again.pending == {}